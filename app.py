@@ -4,31 +4,79 @@
 # - Zwei-Agenten-Analyse (Analyst -> Fragen; Gutachter -> Prüfbericht)
 # - Separater Schritt: strukturierte JSON-Zusammenfassung (Schema mit Fallback)
 # - Excel-Deckblatt (.xlsx) befüllen via openpyxl (Upload + Repo-Fallback)
-# - Robust gegen 429/Quota (Backoff) und 404/Not Found (Modellrotation)
-# - Eco-Modus und Caching für Quota-Schonung
+# - Robust gegen 429/Quota (gemeinsamer Rate-Limiter, Retry-After, Jitter) und 404/Not Found (Modellrotation)
+# - Modell-Discovery gecacht; Circuit-Breaker und Latenz je Modell steuern die Rotation
+# - Eco-Modus und Caching für Quota-Schonung (LLM-Cache auf Platte, LRU + TTL)
 # - NEU: Korrekturen/Ergänzungen nach der Prüfung zur gezielten Überarbeitung
+# - Inkrementelle Indexierung (Manifest pro Projekt: Hash, mtime, Chunk-IDs, Modell)
+# - Persistenter Vektorindex pro Projekt (_index/chroma) mit Startup-Check
+# - Embeddings batchweise bzw. im Prozess-Pool (Durchsatz in Chunks/s)
+# - PDF-Extraktion parallel, Seitentexte gecacht über den Datei-Hash
+# - Seitenweises Chunking mit Überlappung; Kontext mit Quelle (Datei, Seite)
+# - Retrieval: alle Fragen in einer Abfrage, doppelte Chunks zusammengeführt
+# - Bericht wird gestreamt und schrittweise angezeigt (Zeit bis zum ersten Token / gesamt)
+# - Schneller Kaltstart: schwere Bibliotheken erst bei Bedarf, Modelle laden im Hintergrund
+# - Prompts mit Token-Budget je Abschnitt; schwächste Recherche-Treffer fallen zuerst weg
+# - Prüf-Pipeline in tgacode.pipeline; Stapelverarbeitung ohne UI: python -m tgacode
+# - Benchmark mit synthetischer Akte und Fake-Gemini: python -m tgacode.bench
+# - Zeit- und Token-Aufschlüsselung je Prüfung (Spans, Log in VAULT/_metrics/metrics.jsonl)
+# - Preis-Check lokal: Positionen und Summen nachgerechnet, Stundensätze aus den Stammdaten
+# - Korrekturen überarbeiten nur betroffene Berichtsabschnitte und JSON-Felder
+# - Optional Single-Pass: Bericht + JSON in einem Schema-Aufruf (Fallback: zwei Schritte)
+# - Indexierung als Hintergrund-Job (beim Speichern eingeplant, ein Job pro Projekt)
+# - Projektkatalog (SQLite): Firmen, Projekte, Dokumente, Stammdaten-Versionen ohne Ordner-Scan je Rerun
+# - Hybrid-Recherche: BM25-Stichwortindex (OZ, §, DIN) fusioniert mit den Vektortreffern
+# - Kleine Projekte: Vektorsuche per NumPy auf quantisierter Matrix (int8, Memory-Map) statt Chroma
+# - Gemeinsamer Chunk-Speicher: Standarddokumente (VOB/B, DIN, Datenblätter) nur einmal eingebettet
+# - Embedding-Dienst: Anfragen aller Sitzungen als Micro-Batches (Warteschlange mit Gegendruck)
+# - Prüfhistorie: geändert erneut eingereichte Nachträge nur anhand des Diffs neu prüfen
 # ==============================================================================
 
+import time
+_T_START = time.perf_counter()
+
 import streamlit as st
 import os
-import time
 import json
-import hashlib
 from io import BytesIO
 
 # Bibliotheken prüfen und laden
+# (chromadb, sentence-transformers, google-generativeai und openpyxl erst bei Bedarf)
 try:
-    from PyPDF2 import PdfReader
-    import google.generativeai as genai
-    import chromadb
-    from sentence_transformers import SentenceTransformer
-    import openpyxl
+    from tgacode.catalog import Catalog
+    from tgacode.extraction import load_cached_pages
+    from tgacode.indexing import (
+        EMBEDDING_MODEL, index_dir, index_lock, index_project, load_manifest, project_id,
+    )
+    from tgacode.lexical import load_lexical
+    from tgacode.history import CheckHistory
+    from tgacode.jobs import DONE, FAILED, RUNNING, JobQueue
+    from tgacode.llm_cache import LLMCache
+    from tgacode import llm
+    from tgacode.llm import summary_json_schema
+    from tgacode.ratelimit import RPM_LIMIT, TPM_LIMIT, MAX_CONCURRENCY, configure_limiter, get_limiter
+    from tgacode.model_health import OPEN, get_health
+    from tgacode.embedding import EMBED_BATCH_SIZE, EMBED_WORKERS
+    from tgacode.embed_service import load_embed_service
+    from tgacode.vectorstore import (
+        STATUS_MISSING, STATUS_OUTDATED, STATUS_OK,
+        open_collection, open_project_store, scan_vault_status,
+    )
+    from tgacode.warmup import Warmup
+    from tgacode.prompts import usage_summary
+    from tgacode import metrics, pipeline
+    from tgacode.deckblatt import fill_deckblatt, load_template
+    from tgacode.pricecheck import apply_to_summary, euro, short_summary
+    from tgacode.report_sections import (
+        SECTION_TITLES, affected_sections, join_report, merge_sections, section_fields, split_report,
+    )
 except ImportError as e:
     st.error(
         f"Eine benötigte Bibliothek fehlt: {e}. "
         "Bitte prüfe requirements.txt (streamlit, PyPDF2, google-generativeai, chromadb, sentence-transformers, openpyxl)."
     )
     st.stop()
+_T_IMPORTS = time.perf_counter()
 
 # Seiten-Setup
 st.set_page_config(page_title="der TGAcode", layout="wide")
@@ -36,7 +84,7 @@ st.set_page_config(page_title="der TGAcode", layout="wide")
 # ==============================================================================
 # Globale Konfiguration
 # ==============================================================================
-VAULT = "vault_tgacode"
+from tgacode.config import VAULT
 try:
     os.makedirs(VAULT, exist_ok=True)
 except Exception as e:
@@ -48,236 +96,294 @@ try:
     api_key = st.secrets.get("GEMINI_API_KEY")
     if not api_key:
         raise ValueError("GEMINI_API_KEY nicht in Streamlit Secrets gefunden.")
-    genai.configure(api_key=api_key)
+    # Import/Konfiguration von google.generativeai erfolgt erst im Hintergrund-Start
+    llm.configure(api_key, endpoint=st.secrets.get("GEMINI_API_ENDPOINT"))
+    # Quota des API-Keys (gilt prozessweit für alle Sitzungen)
+    configure_limiter(
+        rpm=int(st.secrets.get("GEMINI_RPM", RPM_LIMIT)),
+        tpm=int(st.secrets.get("GEMINI_TPM", TPM_LIMIT)),
+        max_concurrency=int(st.secrets.get("GEMINI_MAX_CONCURRENCY", MAX_CONCURRENCY)),
+    )
 except Exception as e:
     st.error(f"Fehler bei der Konfiguration des Gemini API Keys: {e}")
     st.stop()
 
 # ==============================================================================
-# Dynamische Modellauswahl & Backoff
+# KI-Aufrufe (Modellauswahl, Limiter & Backoff in tgacode.llm)
 # ==============================================================================
 
-def discover_supported_models():
-    """
-    Fragt verfügbare Gemini-Modelle ab und filtert auf solche,
-    die generateContent unterstützen. Liefert sortierte Liste.
-    """
-    supported = []
-    try:
-        for m in genai.list_models():
-            name = getattr(m, "name", None)
-            methods = getattr(m, "supported_generation_methods", []) or []
-            if name and ("generateContent" in methods):
-                supported.append(name)
-    except Exception:
-        # Fallback-Liste ohne potenziell eingeschränkte Modelle
-        supported = [
-            "gemini-2.0-flash",
-            "gemini-1.5-flash",
-            "gemini-1.5-pro",
-            "gemini-1.0-pro",
-        ]
-
-    def sort_key(n: str):
-        # Bevorzuge "flash", dann "pro", grob nach Major-Version absteigend
-        tier = 0 if "flash" in n else (1 if "pro" in n else 2)
-        import re
-        m = re.search(r"gemini-(\d+)", n)
-        major = int(m.group(1)) if m else 0
-        return (tier, -major)
-
-    return sorted(set(supported), key=sort_key)
-
 @st.cache_resource
-def get_models():
-    """Instanziert nutzbare Modelle basierend auf dynamischer Discovery."""
-    names = discover_supported_models()
-    instances = []
-    for name in names:
-        try:
-            instances.append(genai.GenerativeModel(name))
-        except Exception:
-            continue
-    return instances, names
-
-def generate_with_backoff(prompt, max_output_tokens=1536, temperature=0.3, attempts_per_model=2):
-    """
-    generateContent mit Rotation bei 404/Not Found und Backoff bei 429/Quota.
-    Gibt resp.text zurück.
-    """
-    models, names = get_models()
-    if not models:
-        raise RuntimeError("Keine nutzbaren Gemini-Modelle gefunden. Prüfe API-Zugang/Billing.")
-
-    last_err = None
-    for idx, model in enumerate(models):
-        model_name = names[idx]
-        for i in range(attempts_per_model):
-            try:
-                resp = model.generate_content(
-                    prompt,
-                    generation_config={
-                        "max_output_tokens": max_output_tokens,
-                        "temperature": temperature,
-                    },
-                )
-                st.sidebar.caption(f"KI-Modell verwendet: {model_name}")
-                return resp.text
-            except Exception as e:
-                msg = str(e).lower()
-                if "404" in msg or "not found" in msg:
-                    last_err = e
-                    break  # direkt nächstes Modell
-                elif "429" in msg or "quota" in msg:
-                    delay = min(2 ** i, 8)
-                    time.sleep(delay)
-                    last_err = e
-                    continue
-                else:
-                    last_err = e
-                    break
-    raise last_err if last_err else RuntimeError("KI-Generierung fehlgeschlagen.")
-
-def summary_json_schema():
-    # Schlankes, kompatibles Schema – ohne additionalProperties
-    return {
-        "type": "object",
-        "properties": {
-            "vob_check": {"type": "string"},
-            "technische_pruefung": {"type": "string"},
-            "preis_check": {"type": "string"},
-            "gesamtsumme_korrigiert": {"type": "string"},
-            "empfehlung": {"type": "string"},
-            "naechste_schritte": {"type": "string"},
-        },
-        "required": [
-            "vob_check",
-            "technische_pruefung",
-            "preis_check",
-            "gesamtsumme_korrigiert",
-            "empfehlung",
-            "naechste_schritte",
-        ]
-    }
+def get_llm_cache():
+    """Prozessweiter LLM-Antwort-Cache (SQLite im VAULT, von allen Sitzungen geteilt)."""
+    return LLMCache()
+
+def generate_with_backoff(prompt, max_output_tokens=1536, temperature=0.3, attempts_per_model=2, use_cache=True):
+    """UI-Wrapper: Modellinfo in der Sidebar, Cache prozessweit."""
+    return llm.generate_with_backoff(
+        prompt, max_output_tokens=max_output_tokens, temperature=temperature,
+        attempts_per_model=attempts_per_model,
+        cache=get_llm_cache() if use_cache else None, notify=st.sidebar.caption,
+    )
+
+def generate_json_with_backoff(prompt, json_schema=None, attempts_per_model=2, use_cache=True):
+    """UI-Wrapper für die strukturierte JSON-Zusammenfassung."""
+    return llm.generate_json_with_backoff(
+        prompt, json_schema, attempts_per_model=attempts_per_model,
+        cache=get_llm_cache() if use_cache else None, notify=st.sidebar.caption,
+    )
 
-def generate_json_with_backoff(prompt, json_schema=None, attempts_per_model=2):
+def generate_report(prompt, max_output_tokens=1400, temperature=0.2, stream=True):
     """
-    Erzeugt JSON via response_mime_type=application/json.
-    1) Versucht Schema-Modus (wenn json_schema übergeben wird).
-    2) Bei Schema-Fehlern oder Nichtunterstützung: Fallback ohne Schema
-       + strikte Prompt-Vorgabe "Nur ein JSON-Objekt zurückgeben".
-    Gibt ein Python-Dict zurück.
+    Prüfbericht erzeugen. Mit stream=True erscheint der Text schrittweise in einer
+    Report-Box. Liefert (text, timing) mit ttft/total in Sekunden.
     """
-    models, names = get_models()
-    if not models:
-        raise RuntimeError("Keine nutzbaren Gemini-Modelle gefunden. Prüfe API-Zugang/Billing.")
-
-    def try_call(model, use_schema=True):
-        if use_schema and json_schema:
-            return model.generate_content(
-                prompt,
-                generation_config={
-                    "response_mime_type": "application/json",
-                    "response_schema": json_schema,
-                    "temperature": 0.2,
-                    "max_output_tokens": 512,
-                },
-            )
-        else:
-            strict_prompt = (
-                prompt
-                + "\n\nGib ausschließlich ein einzelnes, valides JSON-Objekt zurück – ohne Erklärtext, keine Code-Fences."
-            )
-            return model.generate_content(
-                strict_prompt,
-                generation_config={
-                    "response_mime_type": "application/json",
-                    "temperature": 0.2,
-                    "max_output_tokens": 512,
-                },
-            )
-
-    last_err = None
-    for idx, model in enumerate(models):
-        model_name = names[idx]
-        # Zweiphasig: (1) mit Schema, (2) ohne Schema
-        for phase in (True, False):
-            for i in range(attempts_per_model):
-                try:
-                    resp = try_call(model, use_schema=phase)
-                    st.sidebar.caption(f"KI (JSON): {model_name} | Schema={'on' if phase else 'off'}")
-                    return json.loads(resp.text)
-                except Exception as e:
-                    msg = str(e).lower()
-                    # 404 → direkt nächstes Modell
-                    if "404" in msg or "not found" in msg:
-                        last_err = e
-                        break
-                    # Schema nicht unterstützt → sofort in nächste Phase (ohne Schema)
-                    if phase and ("schema" in msg or "unknown field" in msg or "unsupported" in msg):
-                        last_err = e
-                        break
-                    # 429 / Quota → Backoff
-                    if "429" in msg or "quota" in msg:
-                        delay = min(2 ** i, 8)
-                        time.sleep(delay)
-                        last_err = e
-                        continue
-                    # Anderes Problem → nächster Versuch mit nächstem Modell/Phase
-                    last_err = e
-                    break
-            # Falls 404 oder Schema-Problem: Phase/Modell wechseln
-            if last_err and ("404" in str(last_err) or "schema" in str(last_err).lower() or "unknown field" in str(last_err).lower()):
-                continue
-    raise last_err if last_err else RuntimeError("Strukturierte JSON-Generierung fehlgeschlagen.")
+    if not stream:
+        t0 = time.monotonic()
+        text = generate_with_backoff(prompt, max_output_tokens=max_output_tokens, temperature=temperature)
+        total = time.monotonic() - t0
+        return text, {"mode": "blockierend", "ttft": total, "total": total}
+
+    timing = {"mode": "Streaming"}
+    placeholder = st.empty()
+    parts = []
+    try:
+        for piece in llm.stream_with_backoff(
+            prompt, max_output_tokens=max_output_tokens, temperature=temperature,
+            cache=get_llm_cache(), notify=st.sidebar.caption, timing=timing,
+        ):
+            parts.append(piece)
+            placeholder.markdown(f"<div class='report-box'>{''.join(parts)}</div>", unsafe_allow_html=True)
+    finally:
+        placeholder.empty()
+    return "".join(parts), timing
+
+SPAN_LABELS = {
+    "pdf.extract": "PDF-Extraktion", "price.check": "Preis-Check (lokal)", "embed.encode": "Embedding (Fragen)", "chroma.query": "Chroma-Abfrage",
+    "llm.cache": "LLM-Cache", "llm.generate": "Gemini (inkl. Wiederholungen)", "excel.fill": "Excel-Deckblatt",
+}
+
+def render_timing_breakdown(spans):
+    """Aufklappbare Zeit-/Token-Aufschlüsselung der letzten Prüfung bzw. Überarbeitung."""
+    if not spans:
+        return
+    rows = metrics.breakdown(spans)
+    total = sum(r["seconds"] for r in rows)
+    with st.expander(f"⏱️ Zeitaufschlüsselung ({total:.1f} s)"):
+        st.table([
+            {
+                "Schritt": SPAN_LABELS.get(r["name"], r["name"]),
+                "Aufrufe": r["calls"],
+                "Sekunden": f"{r['seconds']:.2f}",
+                "Anteil": f"{r['seconds'] / total:.0%}" if total else "–",
+                "Tokens ein/aus": f"{r['tokens_in']}/{r['tokens_out']}" if r["tokens_in"] or r["tokens_out"] else "–",
+                "Modelle": ", ".join(r["models"]) or "–",
+            }
+            for r in rows
+        ])
+        waited = sum(s.get("wait") or 0 for s in spans)
+        errors = [s for s in spans if s.get("error")]
+        st.caption(
+            f"Wartezeit im Rate-Limiter: {waited:.1f} s · fehlgeschlagene Versuche: {len(errors)}"
+            + (" (" + ", ".join(sorted({s["error"] for s in errors})) + ")" if errors else "")
+        )
+
+def render_price_check(prices):
+    """Aufklappbare Positionstabelle des lokalen Preis-Checks."""
+    if not prices or not prices["positions"]:
+        return
+    with st.expander(f"🧮 {short_summary(prices)}"):
+        st.table([
+            {
+                "OZ": p["oz"] or "–",
+                "Kurztext": p["text"][:60],
+                "Menge": f"{p['menge'].normalize():f}".replace(".", ","),
+                "Einheit": p["einheit"],
+                "EP": euro(p["ep"]),
+                "GP lt. Nachtrag": euro(p["gp"]),
+                "GP geprüft": euro(p["gp_korr"]),
+                "Hinweis": "; ".join(p["notes"]) or "–",
+            }
+            for p in prices["positions"]
+        ])
+        st.caption(
+            f"Summe lt. Nachtrag: {euro(prices['summe_angegeben'])} · "
+            f"nachgerechnet: {euro(prices['summe_nachgerechnet'])} · "
+            f"korrigiert: {euro(prices['summe_korrigiert'])}"
+        )
+        for issue in prices["issues"]:
+            st.warning(issue)
 
 # ==============================================================================
 # Helferfunktionen & Vektorindex
 # ==============================================================================
 
-@st.cache_resource
+@st.cache_resource(show_spinner=False)
+def get_warmup():
+    """Startet Embedder und Modell-Discovery einmal pro Server-Prozess im Hintergrund."""
+    warmup = Warmup()
+    warmup.start("Embedder", load_embed_service, EMBEDDING_MODEL)
+    warmup.start("Gemini-Modelle", llm.warm_up)
+    return warmup
+
 def get_embedder():
+    """Embedder aus dem Hintergrund-Start; wartet nur, wenn er noch lädt."""
+    warmup = get_warmup()
     try:
-        return SentenceTransformer("all-MiniLM-L6-v2")
+        if not warmup.ready("Embedder"):
+            with st.spinner("Modelle werden geladen…"):
+                return warmup.result("Embedder")
+        return warmup.result("Embedder")
     except Exception as e:
         st.error(f"Fehler beim Laden des Embedding-Modells: {e}")
         st.stop()
 
-def read_pdf(file):
-    """Extrahiert Text aus PDF-Datei."""
-    text = ""
+@st.cache_resource(show_spinner=False)
+def startup_timing():
+    """Zeiten des ersten Laufs in diesem Server-Prozess (Kaltstart)."""
+    return {"imports": _T_IMPORTS - _T_START, "first_render": None}
+
+def record_render_time():
+    render = time.perf_counter() - _T_START
+    st.session_state.last_render = render
+    timing = startup_timing()
+    if timing["first_render"] is None:
+        timing["first_render"] = render
+
+@st.fragment(run_every=1.0)
+def warmup_indicator():
+    """Hinweis, solange der Hintergrund-Start läuft; danach ein einmaliger Neulauf."""
+    pending = get_warmup().pending()
+    if pending:
+        st.info(f"⏳ Modelle werden geladen… ({', '.join(pending)})")
+    else:
+        st.rerun()
+
+@st.cache_resource(show_spinner=False)
+def get_chroma_client(p_path):
+    """Persistenter Vektorindex pro Projekt – wird erst beim Öffnen des Projekts geladen."""
+    return open_project_store(p_path)
+
+@st.cache_resource(show_spinner=False)
+def get_catalog():
+    """Projektkatalog (SQLite im VAULT) – Firmen, Projekte, Dokumente, Stammdaten."""
+    return Catalog()
+
+def _page_count(sha):
+    pages = load_cached_pages(sha)
+    return len(pages) if pages is not None else None
+
+@st.cache_resource(show_spinner=False)
+def get_index_queue():
+    """Prozessweite Indexierungs-Warteschlange (ein Job pro Projekt, von allen Sitzungen geteilt)."""
+    return JobQueue(workers=1)
+
+def enqueue_indexing(firma, projekt, chroma_client, batch_size=EMBED_BATCH_SIZE, workers=None):
+    """Plant die inkrementelle Indexierung des Projekts im Hintergrund ein."""
+    warmup = get_warmup()  # im Job-Thread gibt es keinen Streamlit-Kontext
+    catalog = get_catalog()
+    p_path = catalog.project_path(firma, projekt)
+    p_id = project_id(firma, projekt)
+
+    def run(progress):
+        embedder = warmup.result("Embedder")
+        with index_lock(p_path), metrics.trace("index", project=p_id):
+            stats = index_project(
+                p_path, p_id, embedder, chroma_client,
+                batch_size=batch_size, workers=workers, progress=progress,
+            )
+        catalog.update_index_state(firma, projekt, load_manifest(p_path), page_count=_page_count)
+        return stats
+
+    return get_index_queue().submit(p_id, run, label=f"{firma} / {projekt}")
+
+def index_job_caption(job):
+    p = job.progress
+    if job.state == RUNNING:
+        return (f"📚 Indexierung läuft: {p['done']}/{p['total']} Dateien · "
+                f"{p['chunks']} Chunks · {job.seconds():.0f} s")
+    return "📚 Indexierung eingeplant – wartet auf freien Platz in der Warteschlange."
+
+@st.fragment(run_every=1.0)
+def index_job_indicator(p_id):
+    """Fortschritt des Indexierungsjobs; nach Abschluss ein einmaliger Neulauf."""
+    queue = get_index_queue()
+    job = queue.running(p_id) or queue.latest(p_id)
+    if job is None or not job.active:
+        vault_index_status.clear()
+        st.rerun()
+    st.progress(job.fraction(), text=index_job_caption(job))
+    latest = queue.latest(p_id)
+    if latest is not job and latest.active:
+        st.caption("Weitere Änderungen sind für danach eingeplant.")
+
+def render_index_result(job):
+    """Ergebnis des letzten beendeten Indexierungsjobs."""
+    if job.state == FAILED:
+        st.error(f"Indexierung fehlgeschlagen: {job.error}")
+        return
+    stats = job.result
+    st.success("Projektwissen ist auf dem neuesten Stand!")
+    st.caption(
+        f"{stats['added']} neu, {stats['updated']} geändert, "
+        f"{stats['skipped']} übersprungen, {stats['removed']} entfernt "
+        f"({stats['chunks']} Chunks eingebettet)"
+    )
+    if stats["reused"]:
+        st.caption(
+            f"{stats['reused']} Dokument(e) mit {stats['reused_chunks']} Chunks aus dem "
+            "gemeinsamen Chunk-Speicher übernommen (ohne Extraktion und Embedding)"
+        )
+    if stats["chunks"]:
+        st.caption(
+            f"Embedding: {stats['chunks_per_sec']:.1f} Chunks/s "
+            f"(Batch {stats['batch_size']}, {stats['workers']} Prozess(e), "
+            f"gesamt {stats['seconds']:.1f} s)"
+        )
+        st.caption(
+            f"Stufen: Extraktion {stats['extract_seconds']:.1f} s · "
+            f"Chunking {stats['chunk_seconds']:.1f} s · Embedding {stats['embed_seconds']:.1f} s · "
+            f"Speichern {stats['store_seconds']:.1f} s · Stichwortindex {stats['lexical_seconds']:.1f} s"
+        )
+
+@st.cache_data(ttl=600, show_spinner=False)
+def vault_index_status():
+    """Startup-Check: Projekte mit fehlendem/veraltetem Index (nach Indexierung invalidiert)."""
+    return scan_vault_status(VAULT, projects=get_catalog().projekte())
+
+def format_size(size):
+    if size is None:
+        return "–"
+    return f"{size / 1024:.0f} KB" if size < 1024 * 1024 else f"{size / 1024 / 1024:.1f} MB"
+
+def document_caption(doc):
+    """Größe, Seiten und Status eines Dokuments aus dem Katalog."""
+    parts = [format_size(doc["size"])]
+    if doc["pages"]:
+        parts.append(f"{doc['pages']} Seiten")
+    if doc["name"].lower().endswith(".pdf"):
+        parts.append("indexiert" if doc["indexed"] else ("extrahiert" if doc["extracted"] else "nicht indexiert"))
+    if doc["sha256"]:
+        parts.append(f"SHA-256 {doc['sha256'][:12]}…")
+    return " · ".join(parts)
+
+def find_previous_check(p_path, nt):
+    """(frühere Prüfung eines geänderten Nachtrags oder None, Text-Embedding) – je Upload einmal."""
+    key = (p_path, tuple((f.name, f.size) for f in nt))
+    cached = st.session_state.get("nt_history")
+    if cached and cached[0] == key:
+        return cached[1], cached[2]
     try:
-        reader = PdfReader(file)
-        for page in reader.pages:
-            t = page.extract_text()
-            if t:
-                text += t + "\n"
+        match, vector = pipeline.find_previous(CheckHistory(p_path), get_embedder(), pipeline.read_nachtrag(nt))
     except Exception:
-        pass
-    return text
-
-def index_project(path, p_id, embedder, chroma_client):
-    """Zerlegt PDFs in Chunks, berechnet Embeddings und legt sie in ChromaDB ab."""
-    col = chroma_client.get_or_create_collection(p_id)
-    ids = col.get().get("ids", [])
-    if ids:
-        col.delete(ids=ids)
-    for f in os.listdir(path):
-        if f.lower().endswith(".pdf"):
-            text = read_pdf(os.path.join(path, f))
-            words = text.split()
-            chunks = [" ".join(words[i:i+400]) for i in range(0, len(words), 400)]
-            if chunks:
-                embeddings = [embedder.encode(c).tolist() for c in chunks]
-                col.add(
-                    ids=[f"{f}_{i}" for i in range(len(chunks))],
-                    documents=chunks,
-                    embeddings=embeddings,
-                )
+        match, vector = None, None
+    st.session_state.nt_history = (key, match, vector)
+    return match, vector
+
+# Modelle im Hintergrund laden (UI ist sofort bedienbar)
+get_warmup()
 
-# Modelle/Clients laden
-embedder = get_embedder()
-chroma_client = chromadb.Client()
+# Katalog mit dem Dateisystem abgleichen (gedrosselt, nur geänderte Ordner)
+get_catalog().reconcile()
 
 # ==============================================================================
 # UI-Design (CSS)
@@ -334,17 +440,106 @@ def main():
         "Eco-Modus (Quota-schonend)", value=False,
         help="Reduziert KI-Aufrufe: Fragen-Phase wird übersprungen, Kontext via Nachtragstext."
     )
+    stream_report = st.sidebar.toggle(
+        "Bericht streamen", value=True,
+        help="Zeigt den Prüfbericht Stück für Stück an, statt auf die komplette Antwort zu warten."
+    )
+    single_pass = st.sidebar.toggle(
+        "Single-Pass (Bericht + JSON in einem Aufruf)", value=False,
+        help="Spart den zweiten KI-Aufruf und dessen Eingabe-Tokens; ohne Streaming. "
+             "Lehnt das Modell das Schema ab, läuft die Prüfung wie gewohnt in zwei Schritten."
+    )
+
+    # Hintergrund-Start: Hinweis, bis Embedder und Modellliste bereit sind
+    warmup = get_warmup()
+    if warmup.pending():
+        with st.sidebar:
+            warmup_indicator()
+
+    # Startzeiten: Importe, erste Darstellung, Hintergrund-Start
+    with st.sidebar.expander("Startzeiten"):
+        timing = startup_timing()
+        st.caption(f"Importe (Kaltstart): {timing['imports']:.2f} s · dieser Lauf: {_T_IMPORTS - _T_START:.2f} s")
+        if timing["first_render"] is not None:
+            st.caption(
+                f"Erste Darstellung: {timing['first_render']:.2f} s · "
+                f"letzter Lauf: {st.session_state.get('last_render', timing['first_render']):.2f} s"
+            )
+        for name, info in warmup.stats().items():
+            if info["error"] is not None:
+                st.caption(f"{name}: Fehler – {info['error']}")
+            elif info["done"]:
+                st.caption(f"{name}: geladen in {info['seconds']:.1f} s")
+            else:
+                st.caption(f"{name}: lädt…")
+
+    # LLM-Cache: Treffer/Fehlzugriffe dieses Server-Prozesses
+    cache_stats = get_llm_cache().stats()
+    st.sidebar.caption(
+        f"LLM-Cache: {cache_stats['hits']} Treffer / {cache_stats['misses']} Fehlzugriffe · "
+        f"{cache_stats['entries']} Einträge ({cache_stats['bytes'] / 1e6:.1f} MB)"
+    )
+
+    # Gemini-Limiter: gemeinsame Drosselung aller Sitzungen
+    lim = get_limiter().stats()
+    st.sidebar.caption(
+        f"Gemini-Limiter: Parallelität {lim['limit']}/{lim['max_concurrency']} · "
+        f"429-Quote {lim['rate_429']:.0%} · {lim['throttled']}× gedrosselt"
+        + (f" · Pause {lim['blocked_for']:.0f} s" if lim["blocked_for"] > 0 else "")
+    )
+
+    # Modell-Status: Circuit-Breaker und Latenz je Modell
+    health = get_health().snapshot()
+    if health:
+        with st.sidebar.expander("Modell-Status"):
+            for h in health:
+                lat = f"{h['latency']:.1f} s" if h["latency"] is not None else "–"
+                extra = f" · wieder frei in {h['reopen_in'] / 60:.0f} min" if h["state"] == OPEN else ""
+                st.caption(f"{h['name']}: {h['state']} · Ø {lat} · {h['successes']} ok / {h['errors']} Fehler{extra}")
+
+    # Embedding-Dienst: gemeinsame Warteschlange aller Sitzungen
+    if get_warmup().ready("Embedder"):
+        emb = get_warmup().result("Embedder").stats()
+        if emb["requests"]:
+            with st.sidebar.expander("Embedding-Dienst"):
+                st.caption(
+                    f"Latenz p50 {emb['latency']['p50'] * 1000:.0f} ms · p95 {emb['latency']['p95'] * 1000:.0f} ms"
+                )
+                st.caption(
+                    f"{emb['requests']} Anfragen in {emb['batches']} Batches · "
+                    f"Ø {emb['mean_batch_texts']:.1f} Texte / {emb['mean_batch_requests']:.1f} Anfragen je Batch"
+                )
+                st.caption(f"Warteschlange {emb['queued']} Texte · {emb['throttled']}× gedrosselt")
+
+    # Indexierungs-Warteschlange: laufende und wartende Jobs aller Projekte
+    for job in get_index_queue().active():
+        st.sidebar.caption(
+            f"📚 {job.label}: {job.state}"
+            + (f" ({job.progress['done']}/{job.progress['total']} Dateien)" if job.state == RUNNING else "")
+        )
+
+    # Startup-Check: Projekte ohne bzw. mit veraltetem Index
+    flagged = {
+        k: v for k, v in vault_index_status().items()
+        if v["state"] in (STATUS_MISSING, STATUS_OUTDATED)
+    }
+    if flagged:
+        with st.sidebar.expander(f"⚠️ Index prüfen ({len(flagged)} Projekte)"):
+            for (firma, projekt), info in flagged.items():
+                label = "fehlt" if info["state"] == STATUS_MISSING else "veraltet"
+                st.caption(f"{firma} / {projekt}: Index {label}")
 
     st.header("Projektauswahl")
     c1, c2 = st.columns([1, 2])
 
+    catalog = get_catalog()
     with c1:
-        firmen = [f for f in os.listdir(VAULT) if os.path.isdir(os.path.join(VAULT, f))]
+        firmen = catalog.firmen()
         sel_f = st.selectbox("Firma auswählen", ["--"] + firmen, label_visibility="collapsed")
 
         projekte = []
         if sel_f != "--":
-            projekte = [p for p in os.listdir(os.path.join(VAULT, sel_f))]
+            projekte = catalog.projekte(sel_f)
         sel_p = st.selectbox("Projekt auswählen", ["--"] + projekte, label_visibility="collapsed")
 
     with c2:
@@ -354,21 +549,28 @@ def main():
                 nf = st.text_input("Neue Firma")
                 if st.button("Firma anlegen"):
                     if nf.strip():
-                        os.makedirs(os.path.join(VAULT, nf.strip()), exist_ok=True)
+                        catalog.add_firma(nf.strip())
                         st.rerun()
             with nc2:
                 np_firma = st.selectbox("Für Firma", ["--"] + firmen)
                 np = st.text_input("Neues Projekt")
                 if st.button("Projekt anlegen") and np_firma != "--":
                     if np.strip():
-                        os.makedirs(os.path.join(VAULT, np_firma, np.strip()), exist_ok=True)
+                        catalog.add_projekt(np_firma, np.strip())
                         st.rerun()
 
     st.markdown("---")
 
     if sel_f != "--" and sel_p != "--":
-        p_path = os.path.join(VAULT, sel_f, sel_p)
-        p_id = f"{sel_f}_{sel_p}".replace(" ", "_")
+        p_path = catalog.project_path(sel_f, sel_p)
+        p_id = project_id(sel_f, sel_p)
+        chroma_client = get_chroma_client(p_path)
+        # Index-Status aus dem Katalog (aktualisiert nach Indexierung und Abgleich)
+        idx_info = catalog.index_state(sel_f, sel_p)
+        if idx_info is None:
+            catalog.update_index_state(sel_f, sel_p, load_manifest(p_path), page_count=_page_count)
+            idx_info = catalog.index_state(sel_f, sel_p)
+        index_job = get_index_queue().latest(p_id)
 
         st.header(f"Projekt-Dashboard: {sel_p}")
         t1, t2 = st.tabs(["📁 Projekt-Akte", "🚀 Nachtrags-Prüfung"])
@@ -376,87 +578,131 @@ def main():
         # Tab 1 – Projekt-Akte
         with t1:
             st.subheader("Stammdaten & Projekt-Regeln (Gedächtnis)")
-            stammdaten_path = os.path.join(p_path, "_projekt_stammdaten.txt")
-            current_stammdaten = ""
-            if os.path.exists(stammdaten_path):
-                with open(stammdaten_path, "r", encoding="utf-8") as f:
-                    current_stammdaten = f.read()
+            current_stammdaten = catalog.stammdaten(sel_f, sel_p)
 
             stammdaten_input = st.text_area(
                 "Permanente Regeln/Absprachen (z. B. 'Stundensatz Fa. Reiter ist 48 €').",
                 value=current_stammdaten, height=150
             )
             if st.button("Stammdaten speichern"):
-                os.makedirs(p_path, exist_ok=True)
-                with open(stammdaten_path, "w", encoding="utf-8") as f:
-                    f.write(stammdaten_input)
+                catalog.save_stammdaten(sel_f, sel_p, stammdaten_input)
                 st.success("Stammdaten wurden gespeichert!")
+            versions = catalog.stammdaten_versions(sel_f, sel_p)
+            if len(versions) > 1:
+                with st.expander(f"Frühere Fassungen ({len(versions) - 1})"):
+                    for version, created, text in versions[1:]:
+                        st.caption(f"Version {version} · {time.strftime('%d.%m.%Y %H:%M', time.localtime(created))}")
+                        st.code(text or "(leer)")
 
             st.markdown("---")
             st.subheader("Dokumente verwalten")
             up = st.file_uploader("Neue Dokumente hochladen", accept_multiple_files=True, type="pdf")
             if up:
                 if st.button("In Akte speichern"):
-                    os.makedirs(p_path, exist_ok=True)
                     for f in up:
-                        with open(os.path.join(p_path, f.name), "wb") as o:
-                            o.write(f.getbuffer())
+                        catalog.save_document(sel_f, sel_p, f.name, f.getbuffer())
+                    # Neue Dokumente direkt im Hintergrund indexieren
+                    enqueue_indexing(sel_f, sel_p, chroma_client)
+                    st.toast(f"{len(up)} Dokument(e) gespeichert – Indexierung läuft im Hintergrund.")
                     st.rerun()
 
             st.markdown("---")
             col_a, col_b = st.columns([2, 1])
             with col_a:
                 st.subheader("Bestehende Dokumente")
-                docs = [d for d in os.listdir(p_path) if not d.startswith("_")] if os.path.isdir(p_path) else []
+                docs = catalog.documents(sel_f, sel_p)
                 if not docs:
                     st.info("Noch keine Dokumente in dieser Akte.")
                 else:
                     for d in docs:
-                        st.code(d)
+                        st.code(d["name"])
+                        st.caption(document_caption(d))
             with col_b:
                 st.subheader("Projekt-Wissen")
+                if index_job and index_job.active:
+                    index_job_indicator(p_id)
+                elif idx_info["state"] == STATUS_MISSING:
+                    st.warning("Noch kein Index vorhanden – bitte indexieren.")
+                elif idx_info["state"] == STATUS_OUTDATED:
+                    st.warning(
+                        f"Index veraltet ({idx_info['new']} neu, {idx_info['changed']} geändert, "
+                        f"{idx_info['removed']} entfernt)."
+                    )
+                elif idx_info["state"] == STATUS_OK:
+                    st.caption("Index ist aktuell.")
+                with st.expander("Indexierung – Einstellungen"):
+                    batch_size = st.number_input(
+                        "Batchgröße (Chunks pro Encode-Aufruf)", min_value=1, max_value=1024,
+                        value=EMBED_BATCH_SIZE, step=8
+                    )
+                    workers_opt = st.selectbox(
+                        "Prozesse", ["automatisch"] + list(range(1, EMBED_WORKERS + 1)),
+                        help="Automatisch: Prozess-Pool nur bei großen Indexierungsjobs."
+                    )
                 if st.button("📚 Wissen neu indexieren"):
-                    with st.spinner("Projektwissen wird analysiert und indexiert..."):
-                        index_project(p_path, p_id, embedder, chroma_client)
-                    st.success("Projektwissen ist auf dem neuesten Stand!")
+                    enqueue_indexing(
+                        sel_f, sel_p, chroma_client,
+                        batch_size=int(batch_size),
+                        workers=None if workers_opt == "automatisch" else int(workers_opt),
+                    )
+                    st.rerun()
+                if index_job and (index_job.state == FAILED
+                                  or (index_job.state == DONE and idx_info["state"] == STATUS_OK)):
+                    render_index_result(index_job)
 
         # Tab 2 – Nachtrags-Prüfung
         with t2:
             st.subheader("Nachtrag zur Prüfung hochladen")
             nt = st.file_uploader("Nachtrag PDF", accept_multiple_files=True, type="pdf", label_visibility="collapsed")
+            if index_job and index_job.active:
+                st.info("Die Projekt-Akte wird gerade im Hintergrund indexiert – neue Dokumente fehlen ggf. noch in der Recherche.")
+            elif idx_info["state"] in (STATUS_MISSING, STATUS_OUTDATED):
+                st.info("Der Projekt-Index fehlt oder ist veraltet – bitte zuerst in der Projekt-Akte indexieren.")
+
+            # Geändert erneut eingereicht? Frühere Prüfung als Grundlage anbieten
+            prev_match, nt_vector = find_previous_check(p_path, nt) if nt else (None, None)
+            use_previous = False
+            if prev_match:
+                prev = prev_match["record"]
+                use_previous = st.checkbox(
+                    f"Frühere Prüfung wiederverwenden: {', '.join(prev['names']) or 'Nachtrag'} vom "
+                    f"{time.strftime('%d.%m.%Y %H:%M', time.localtime(prev['created']))} "
+                    f"({prev_match['ratio']:.0%} gleich, {prev_match['changed_lines']} geänderte Zeile(n))",
+                    value=True,
+                    help="Fragen und Recherche werden übernommen; der Bericht wird nur anhand der Änderungen aktualisiert.",
+                )
+                with st.expander("Änderungen gegenüber der früheren Fassung"):
+                    st.code(prev_match["diff"] or "Keine Textänderungen erkannt.", language="diff")
+            reuse = prev_match if use_previous else None
 
             if st.button("🔥 KI-Prüfung starten", type="primary"):
                 if not nt:
                     st.warning("Bitte zuerst einen Nachtrag hochladen.")
                 else:
-                    with st.status("Starte KI-Analyse...", expanded=True) as status:
+                    with st.status("Starte KI-Analyse...", expanded=True) as status, \
+                            metrics.trace("check", project=p_id, eco=eco_mode) as tr:
+                        st.session_state.timing_spans = tr.spans
                         status.write("Vorbereitung…")
-                        nt_text = "".join([read_pdf(f) for f in nt])
-                        nt_hash = hashlib.sha256(nt_text.encode("utf-8")).hexdigest()
-
-                        # Session-Caches zur Quota-Reduzierung
-                        if "cache_questions" not in st.session_state:
-                            st.session_state.cache_questions = {}
-                        if "cache_report" not in st.session_state:
-                            st.session_state.cache_report = {}
-
-                        # Agent 1: Analyst (optional, via Eco-Modus)
+                        # Bereits geprüfte Uploads kommen aus dem Seiten-Cache (SHA-256)
+                        nt_text = pipeline.read_nachtrag(nt)
+                        stammdaten = catalog.stammdaten(sel_f, sel_p)
+                        # Positionen und Summen ohne KI nachrechnen
+                        prices = pipeline.run_price_check(nt_text, stammdaten)
+                        status.write(short_summary(prices))
+
+                        # Agent 1: Analyst (optional, via Eco-Modus; entfällt bei Wiederverwendung)
                         questions = []
-                        if not eco_mode:
+                        if reuse is not None:
+                            status.write(pipeline.reuse_summary(reuse))
+                        elif not eco_mode:
                             status.write("Agent 1 (Analyst): Untersucht den Nachtrag…")
-                            question_prompt = (
-                                "Du bist ein Analyst für TGA-Bauprojekte. Lies den Nachtrag, "
-                                "identifiziere die 3-5 Kernforderungen und formuliere für jede eine präzise Frage, "
-                                "um relevante Infos in den Projektunterlagen zu finden. Gib NUR die Liste der Fragen aus.\n\n"
-                                f"NACHTRAG:\n{nt_text[:4000]}"
-                            )
+                            question_prompt, _ = pipeline.question_prompt(nt_text)
                             try:
-                                if nt_hash in st.session_state.cache_questions:
-                                    questions = st.session_state.cache_questions[nt_hash]
-                                else:
-                                    q_text = generate_with_backoff(question_prompt, max_output_tokens=512, temperature=0.2)
-                                    questions = [q.strip() for q in q_text.strip().split("\n") if q.strip()]
-                                    st.session_state.cache_questions[nt_hash] = questions
+                                # Quota-Schonung über den LLM-Cache (gleicher Prompt → keine neue Anfrage)
+                                q_text = generate_with_backoff(
+                                    question_prompt, max_output_tokens=pipeline.QUESTION_OUTPUT_TOKENS, temperature=0.2
+                                )
+                                questions = pipeline.parse_questions(q_text)
                                 status.update(label="Agent 1 (Analyst): Rechercheplan erstellt! ✅")
                             except Exception:
                                 status.update(label="Agent 1: Fragengenerierung fehlgeschlagen – Eco-Fallback aktiv", state="error")
@@ -465,107 +711,109 @@ def main():
                         # Agent 2: Kontextbeschaffung
                         status.write("Agent 2 (Gutachter): Sucht relevante Projektdaten…")
                         final_ctx = ""
+                        hits = []
                         try:
-                            collection = chroma_client.get_or_create_collection(p_id)
-                            if questions:
-                                for q in questions:
-                                    q_vec = embedder.encode(q).tolist()
-                                    res = collection.query(query_embeddings=[q_vec], n_results=3)
-                                    docs_block = "\n".join(res.get("documents", [[]])[0]) if res.get("documents") else ""
-                                    final_ctx += f"Recherche-Ergebnis für Frage '{q}':\n{docs_block}\n\n---\n\n"
+                            # Kleine Projekte: NumPy-Speicher, sonst Chroma
+                            collection = open_collection(p_path, p_id, chroma_client)
+                            if reuse is not None:
+                                # Frühere Treffer + Recherche nur zu den geänderten Zeilen
+                                questions, hits, final_ctx = pipeline.reuse_context(
+                                    reuse, collection, get_embedder(), load_lexical(index_dir(p_path)),
+                                )
                             else:
-                                # Eco-/Fallback: nutze Nachtragstext als Query
-                                q_vec = embedder.encode(nt_text[:1000]).tolist()
-                                res = collection.query(query_embeddings=[q_vec], n_results=5)
-                                docs_block = "\n".join(res.get("documents", [[]])[0]) if res.get("documents") else ""
-                                final_ctx += f"Kontext (Eco/Fallback):\n{docs_block}\n\n---\n\n"
+                                # Ein Encode-Batch + eine Abfrage für alle Fragen (Eco: Nachtragstext als Query)
+                                # Stichworttreffer (Positionsnummern, Paragraphen) per Rangfusion dazu
+                                hits, final_ctx = pipeline.retrieve_context(
+                                    collection, get_embedder(), questions, nt_text, load_lexical(index_dir(p_path)),
+                                )
                             status.update(label="Agent 2 (Gutachter): Daten aus Projekt-Akte geladen! ✅")
                         except Exception as e:
                             final_ctx = f"Fehler bei der Datenbeschaffung: {e}"
                             status.update(label="Agent 2: Kontextbeschaffung fehlgeschlagen", state="error")
 
                         # Für spätere Überarbeitungen merken:
-                        st.session_state.current_nt_text = nt_text
-                        st.session_state.current_final_ctx = final_ctx
-                        st.session_state.current_stammdaten_text = ""
-                        if os.path.exists(os.path.join(p_path, "_projekt_stammdaten.txt")):
-                            with open(os.path.join(p_path, "_projekt_stammdaten.txt"), "r", encoding="utf-8") as f:
-                                st.session_state.current_stammdaten_text = f.read()
-
-                        # Agent 2: Finaler Bericht (Markdown)
-                        status.write("Agent 2 (Gutachter): Erstellt den finalen Bericht…")
-                        report_prompt = f"""
-                        SYSTEM: Du bist 'der TGAcode', ein KI-Gutachter für TGA-Bauprojekte (VOB).
-                        DEINE AUFGABE: Erstelle einen finalen Prüfbericht im Markdown-Format mit:
-                        - Zusammenfassung (3-4 Stichpunkte)
-                        - VOB/B-Konformitäts-Check
-                        - Technische Prüfung & Preis-Check
-                        - Empfehlung & Nächste Schritte
-
-                        PROJEKT-STAMMDATEN (höchste Priorität):
-                        ---
-                        {st.session_state.current_stammdaten_text}
-                        ---
-
-                        DER ZU PRÜFENDE NACHTRAG:
-                        ---
-                        {st.session_state.current_nt_text}
-                        ---
-
-                        RECHERCHE-ERGEBNISSE AUS DER PROJEKT-AKTE:
-                        ---
-                        {st.session_state.current_final_ctx}
-                        ---
-                        """
-                        try:
-                            if nt_hash in st.session_state.cache_report:
-                                st.session_state.report = st.session_state.cache_report[nt_hash]
-                            else:
-                                st.session_state.report = generate_with_backoff(
-                                    report_prompt, max_output_tokens=1400, temperature=0.2
-                                )
-                                st.session_state.cache_report[nt_hash] = st.session_state.report
-                        except Exception as e:
-                            status.update(label=f"Berichtserstellung fehlgeschlagen: {e}", state="error")
-                            st.session_state.report = ""
-
-                        # Separater Schritt: strukturierte JSON-Zusammenfassung
-                        status.write("Agent 2 (Gutachter): Erstellt die strukturierte Zusammenfassung (JSON)…")
-                        json_prompt = f"""
-                        Erzeuge eine komprimierte, sachliche JSON-Zusammenfassung der Prüfung
-                        mit den Feldern: vob_check, technische_pruefung, preis_check,
-                        gesamtsumme_korrigiert, empfehlung, naechste_schritte.
-
-                        Nutze ausschließlich diese Quellen:
-                        1) Projekt-Stammdaten:
-                        {st.session_state.current_stammdaten_text}
-
-                        2) Nachtrag (Volltext; ggf. gekürzt):
-                        {st.session_state.current_nt_text[:10000]}
-
-                        3) Recherchierte Projekt-Kontexte (gekürzt):
-                        {st.session_state.current_final_ctx[:10000]}
+                        check = st.session_state.current_check = {
+                            "stammdaten": stammdaten,
+                            "nt_text": nt_text,
+                            "hits": hits,
+                            "questions": questions,
+                            "final_ctx": final_ctx,
+                            "prices": prices,
+                        }
 
-                        4) Eigener Bericht (Auszug):
-                        {st.session_state.report[:4000]}
+                        # Single-Pass: Bericht und Zusammenfassung in einer Antwort
+                        single_done = False
+                        if single_pass and reuse is None:
+                            status.write("Agent 2 (Gutachter): Erstellt Bericht und Zusammenfassung (Single-Pass)…")
+                            combined_prompt, usage = pipeline.combined_prompt(check)
+                            status.write(usage_summary(usage, pipeline.SECTION_LABELS))
+                            try:
+                                t0 = time.monotonic()
+                                report, summary = pipeline.generate_combined(
+                                    combined_prompt, cache=get_llm_cache(), notify=st.sidebar.caption,
+                                )
+                                total = time.monotonic() - t0
+                                st.session_state.report = report
+                                st.session_state.summary = apply_to_summary(summary, prices)
+                                st.session_state.report_timing = {"mode": "Single-Pass", "ttft": total, "total": total}
+                                st.session_state.json_prompt = None
+                                single_done = True
+                                status.update(label="Analyse abgeschlossen!", state="complete", expanded=False)
+                            except Exception as e:
+                                status.write(f"Single-Pass nicht möglich ({e}) – Bericht und JSON getrennt.")
 
-                        Formuliere kurze, klare Werte. Keine Erläuterung, nur die reinen Feldwerte.
-                        """
-                        st.session_state.json_prompt = json_prompt  # für spätere Regeneration/Korrekturen speichern
-                        try:
-                            st.session_state.summary = generate_json_with_backoff(
-                                json_prompt, summary_json_schema()
+                        if not single_done:
+                            # Agent 2: Finaler Bericht (Markdown); bei Wiederverwendung nur anhand des Diffs
+                            status.write("Agent 2 (Gutachter): Erstellt den finalen Bericht…")
+                            report_prompt, usage = (
+                                pipeline.delta_prompt(check, reuse) if reuse is not None else pipeline.report_prompt(check)
                             )
-                            status.update(label="Analyse abgeschlossen!", state="complete", expanded=False)
-                        except Exception as e:
-                            status.update(label=f"JSON-Erstellung fehlgeschlagen: {e}", state="error")
-                            st.session_state.summary = None
+                            status.write(usage_summary(usage, pipeline.SECTION_LABELS))
+                            try:
+                                st.session_state.report, st.session_state.report_timing = generate_report(
+                                    report_prompt, max_output_tokens=pipeline.REPORT_OUTPUT_TOKENS, temperature=0.2,
+                                    stream=stream_report,
+                                )
+                            except Exception as e:
+                                status.update(label=f"Berichtserstellung fehlgeschlagen: {e}", state="error")
+                                st.session_state.report = ""
+                                st.session_state.report_timing = None
+
+                            # Separater Schritt: strukturierte JSON-Zusammenfassung
+                            status.write("Agent 2 (Gutachter): Erstellt die strukturierte Zusammenfassung (JSON)…")
+                            json_prompt, _ = pipeline.json_prompt(check, st.session_state.report)
+                            st.session_state.json_prompt = json_prompt  # für spätere Regeneration/Korrekturen speichern
+                            try:
+                                st.session_state.summary = apply_to_summary(
+                                    generate_json_with_backoff(json_prompt, summary_json_schema()), prices
+                                )
+                                status.update(label="Analyse abgeschlossen!", state="complete", expanded=False)
+                            except Exception as e:
+                                status.update(label=f"JSON-Erstellung fehlgeschlagen: {e}", state="error")
+                                st.session_state.summary = None
+
+                        # In die Prüfhistorie des Projekts (Grundlage für spätere Fassungen)
+                        if st.session_state.report and nt_vector is not None:
+                            CheckHistory(p_path).add(
+                                {**check, "report": st.session_state.report, "summary": st.session_state.summary},
+                                nt_vector, [f.name for f in nt],
+                            )
+                            st.session_state.pop("nt_history", None)
 
             # Berichtanzeige + JSON-Status
             if "report" in st.session_state:
                 st.markdown("---")
                 st.subheader("Ergebnis der KI-Prüfung")
                 st.markdown(f"<div class='report-box'>{st.session_state.report}</div>", unsafe_allow_html=True)
+                timing = st.session_state.get("report_timing")
+                if timing and timing.get("total") is not None:
+                    st.caption(
+                        f"Bericht ({timing['mode']}"
+                        + (", aus Cache" if timing.get("cached") else "")
+                        + f"): erstes Token nach {timing['ttft']:.1f} s · gesamt {timing['total']:.1f} s"
+                    )
+                render_timing_breakdown(st.session_state.get("timing_spans"))
+                render_price_check((st.session_state.get("current_check") or {}).get("prices"))
 
                 st.markdown("#### Strukturierte Zusammenfassung (JSON)")
                 if st.session_state.get("summary") is None:
@@ -573,9 +821,9 @@ def main():
                     if st.session_state.get("json_prompt"):
                         if st.button("JSON-Zusammenfassung jetzt erzeugen (erneut)"):
                             try:
-                                st.session_state.summary = generate_json_with_backoff(
-                                    st.session_state.json_prompt,
-                                    summary_json_schema()
+                                st.session_state.summary = apply_to_summary(
+                                    generate_json_with_backoff(st.session_state.json_prompt, summary_json_schema()),
+                                    (st.session_state.get("current_check") or {}).get("prices"),
                                 )
                                 st.success("JSON-Zusammenfassung erzeugt.")
                             except Exception as e:
@@ -592,60 +840,68 @@ def main():
                 )
                 if st.button("Bericht und Zusammenfassung mit Korrekturen überarbeiten"):
                     if corrections.strip():
-                        with st.spinner("Überarbeitung läuft…"):
+                        with st.spinner("Überarbeitung läuft…"), metrics.trace("refine", project=p_id) as tr:
+                            st.session_state.timing_spans = tr.spans
                             # Bericht verfeinern
-                            refine_report_prompt = f"""
-                            SYSTEM: Du bist 'der TGAcode', KI-Gutachter.
-                            Überarbeite den bestehenden Bericht sachlich und präzise anhand der Korrekturen des Nutzers.
-                            Behalte die gleiche Gliederung (Zusammenfassung, VOB-Check, Technik/Preis-Check, Empfehlung).
-
-                            Bestehender Bericht:
-                            ---
-                            {st.session_state.report[:6000]}
-                            ---
-
-                            Korrekturen des Nutzers:
-                            ---
-                            {corrections}
-                            ---
-
-                            Zusätzlicher Kontext (falls nötig):
-                            - Stammdaten: {st.session_state.get('current_stammdaten_text', '')[:2000]}
-                            - Nachtrag (Kurzfassung): {st.session_state.get('current_nt_text', '')[:3000]}
-                            - Recherche-Kontext: {st.session_state.get('current_final_ctx', '')[:3000]}
-                            """
+                            check = st.session_state.get("current_check") or {
+                                "stammdaten": "", "nt_text": "", "hits": [], "questions": [], "final_ctx": "",
+                                "prices": None,
+                            }
+                            sections = split_report(st.session_state.report)
+                            keys = affected_sections(corrections, sections)
                             try:
-                                st.session_state.report = generate_with_backoff(
-                                    refine_report_prompt, max_output_tokens=1400, temperature=0.2
-                                )
-                                # JSON anhand des neuen Berichts und Korrekturen neu erzeugen
-                                refined_json_prompt = f"""
-                                Erzeuge eine komprimierte, sachliche JSON-Zusammenfassung der Prüfung
-                                mit den Feldern: vob_check, technische_pruefung, preis_check,
-                                gesamtsumme_korrigiert, empfehlung, naechste_schritte.
-
-                                Quellen:
-                                1) Projekt-Stammdaten:
-                                {st.session_state.get('current_stammdaten_text', '')}
-
-                                2) Nachtrag (Volltext; ggf. gekürzt):
-                                {st.session_state.get('current_nt_text', '')[:10000]}
-
-                                3) Recherchierte Projekt-Kontexte (gekürzt):
-                                {st.session_state.get('current_final_ctx', '')[:10000]}
-
-                                4) Überarbeiteter Bericht (Auszug):
-                                {st.session_state.report[:4000]}
-
-                                5) Korrekturen des Nutzers:
-                                {corrections}
-
-                                Keine Erläuterung, nur reine Feldwerte im JSON-Objekt.
-                                """
-                                st.session_state.summary = generate_json_with_backoff(
-                                    refined_json_prompt, summary_json_schema()
+                                if keys is None:
+                                    # Keine erkennbare Gliederung → kompletter Bericht und komplettes JSON
+                                    refine_report_prompt, _ = pipeline.refine_prompt(check, st.session_state.report, corrections)
+                                    st.session_state.report, st.session_state.report_timing = generate_report(
+                                        refine_report_prompt, max_output_tokens=pipeline.REPORT_OUTPUT_TOKENS, temperature=0.2,
+                                        stream=stream_report,
+                                    )
+                                    refined_json_prompt, _ = pipeline.refined_json_prompt(
+                                        check, st.session_state.report, corrections
+                                    )
+                                    st.session_state.summary = generate_json_with_backoff(
+                                        refined_json_prompt, summary_json_schema()
+                                    )
+                                    st.success("Bericht und JSON-Zusammenfassung wurden überarbeitet.")
+                                else:
+                                    # Nur betroffene Abschnitte neu schreiben, der Rest bleibt wörtlich
+                                    section_prompt, _ = pipeline.section_refine_prompt(check, sections, keys, corrections)
+                                    revised, st.session_state.report_timing = generate_report(
+                                        section_prompt, max_output_tokens=pipeline.section_output_tokens(keys),
+                                        temperature=0.2, stream=stream_report,
+                                    )
+                                    sections, replaced = merge_sections(sections, keys, revised)
+                                    st.session_state.report = join_report(sections)
+                                    fields = section_fields(replaced)
+                                    if fields and isinstance(st.session_state.get("summary"), dict):
+                                        partial_prompt, _ = pipeline.partial_json_prompt(
+                                            check, sections, replaced, corrections, fields
+                                        )
+                                        update = generate_json_with_backoff(partial_prompt, summary_json_schema(fields))
+                                        st.session_state.summary = {
+                                            **st.session_state.summary,
+                                            **{f: update[f] for f in fields if f in update},
+                                        }
+                                    elif fields:
+                                        refined_json_prompt, _ = pipeline.refined_json_prompt(
+                                            check, st.session_state.report, corrections
+                                        )
+                                        st.session_state.summary = generate_json_with_backoff(
+                                            refined_json_prompt, summary_json_schema()
+                                        )
+                                    if replaced:
+                                        st.success(
+                                            "Überarbeitet: " + ", ".join(SECTION_TITLES[k] for k in replaced)
+                                            + (f" · JSON-Felder: {', '.join(fields)}" if fields else "")
+                                            + " – übrige Abschnitte unverändert übernommen."
+                                        )
+                                    else:
+                                        st.warning("Die KI-Antwort enthielt keinen der Abschnitte – Bericht unverändert.")
+                                # Summe wieder lokal nachrechnen (Stundensätze aus den Korrekturen gehen vor)
+                                st.session_state.summary = apply_to_summary(
+                                    st.session_state.summary, pipeline.recheck_prices(check, corrections)
                                 )
-                                st.success("Bericht und JSON-Zusammenfassung wurden überarbeitet.")
                             except Exception as e:
                                 st.error(f"Überarbeitung fehlgeschlagen: {e}")
                     else:
@@ -691,7 +947,7 @@ def main():
                         )
                         if template_file.name.lower().endswith(".xlsx"):
                             try:
-                                workbook = openpyxl.load_workbook(template_file)
+                                workbook = load_template(template_file)
                             except Exception as e:
                                 st.error(f"Excel konnte nicht geladen werden: {e}")
                         else:
@@ -701,7 +957,7 @@ def main():
                     if workbook is None and use_repo_template:
                         try:
                             wb_path = os.path.join(repo_templates_dir, selected_repo_template)
-                            workbook = openpyxl.load_workbook(wb_path)
+                            workbook = load_template(wb_path)
                             st.caption(f"Vorlage aus Repository geladen: {selected_repo_template}")
                         except Exception as e:
                             st.error(f"Vorlage aus Repository konnte nicht geladen werden: {e}")
@@ -710,21 +966,7 @@ def main():
                     if workbook is None:
                         st.info("Keine Excel-Vorlage verfügbar. Bitte .xlsx hochladen oder Vorlage aus Repository wählen.")
                     else:
-                        sheet = workbook.active
-                        placeholders = {
-                            "[VOB_CHECK]": str(report_data.get("vob_check", "")),
-                            "[TECHNISCHE_PRUEFUNG]": str(report_data.get("technische_pruefung", "")),
-                            "[PREIS_CHECK]": str(report_data.get("preis_check", "")),
-                            "[GESAMTSUMME_KORRIGIERT]": str(report_data.get("gesamtsumme_korrigiert", "")),
-                            "[EMPFEHLUNG]": str(report_data.get("empfehlung", "")),
-                            "[NAECHSTE_SCHRITTE]": str(report_data.get("naechste_schritte", "")),
-                        }
-
-                        for row in sheet.iter_rows():
-                            for cell in row:
-                                if cell.value and isinstance(cell.value, str):
-                                    if cell.value in placeholders:
-                                        cell.value = placeholders[cell.value]
+                        fill_deckblatt(workbook, report_data)
 
                         output_stream = BytesIO()
                         try:
@@ -744,3 +986,4 @@ def main():
 # Start
 if __name__ == "__main__":
     main()
+    record_render_time()
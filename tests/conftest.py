@@ -0,0 +1,72 @@
+import hashlib
+import warnings
+
+import pytest
+
+from tgacode import llm, model_health, ratelimit
+from tgacode.bench import write_pdf
+from tgacode.fake_gemini import start_fake_server
+from tgacode.model_health import HealthRegistry
+from tgacode.ratelimit import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def _vault_in_tmp(tmp_path, monkeypatch):
+    """VAULT und Caches sind relative Pfade – jeder Test arbeitet in einem eigenen Verzeichnis."""
+    monkeypatch.chdir(tmp_path)
+
+
+class StubEmbedder:
+    """Deterministische Embeddings aus dem Text-Hash (ohne Modell); zählt die eingebetteten Texte."""
+
+    dim = 16
+
+    def __init__(self):
+        self.texts = []
+        self.batches = []
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True, show_progress_bar=False):
+        import numpy as np
+
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        self.texts.extend(batch)
+        self.batches.append(len(batch))
+        rows = [np.frombuffer(hashlib.sha256(t.encode("utf-8")).digest()[:self.dim], dtype=np.uint8) / 255.0
+                for t in batch]
+        vecs = np.stack(rows).astype(np.float32) if rows else np.zeros((0, self.dim), dtype=np.float32)
+        return vecs[0] if single else vecs
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Fake-Gemini mit frischem Limiter, Breakern und Modellliste."""
+    warnings.simplefilter("ignore", FutureWarning)  # google.generativeai ist abgekündigt
+    server, state, url = start_fake_server(latency=0.0, retry_after=0.05)
+    monkeypatch.setattr(ratelimit, "_limiter", RateLimiter(rpm=600, max_concurrency=4))
+    monkeypatch.setattr(model_health, "_registry", HealthRegistry())
+    monkeypatch.setattr(llm, "_names", None)
+    monkeypatch.setattr(llm, "_not_found", set())
+    monkeypatch.setattr(llm, "_limits", {})
+    monkeypatch.setattr(llm, "_instances", {})
+    llm.configure("test-key", url)
+    yield state
+    server.shutdown()
+    server.server_close()
+    llm.configure(None)
+
+
+@pytest.fixture
+def embedder():
+    return StubEmbedder()
+
+
+@pytest.fixture
+def make_pdf():
+    """make_pdf(pfad, [Seitentext, …]) schreibt ein minimales Text-PDF."""
+
+    def make(path, pages):
+        write_pdf(str(path), pages)
+        return str(path)
+
+    return make
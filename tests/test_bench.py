@@ -0,0 +1,61 @@
+import json
+import os
+
+from tgacode import bench, llm, model_health, ratelimit
+from tgacode.bench import HashEmbedder, build_corpus, percentiles
+
+
+def _files(root):
+    out = {}
+    for base, _, names in os.walk(root):
+        for name in names:
+            with open(os.path.join(base, name), "rb") as f:
+                out[os.path.relpath(os.path.join(base, name), root)] = f.read()
+    return out
+
+
+def test_corpus_is_reproducible(tmp_path):
+    build_corpus(str(tmp_path / "a"), docs=2, pages=2, nachtraege=2, nt_pages=1, seed=7)
+    build_corpus(str(tmp_path / "b"), docs=2, pages=2, nachtraege=2, nt_pages=1, seed=7)
+    build_corpus(str(tmp_path / "c"), docs=2, pages=2, nachtraege=2, nt_pages=1, seed=8)
+    a = _files(tmp_path / "a")
+    assert len([k for k in a if k.endswith(".pdf")]) >= 4
+    assert a == _files(tmp_path / "b")
+    assert list(_files(tmp_path / "c").values()) != list(a.values())
+
+
+def test_hash_embedder_is_deterministic():
+    emb = HashEmbedder()
+    vecs = emb.encode(["Heizung", "Lüftung"])
+    assert vecs.shape == (2, HashEmbedder.dim)
+    assert (emb.encode("Heizung") == vecs[0]).all()
+    assert not (vecs[0] == vecs[1]).all()
+
+
+def test_percentiles_nearest_rank():
+    assert percentiles([]) == {}
+    assert percentiles(list(range(1, 101))) == {"p50": 50, "p95": 95, "p99": 99}
+    assert percentiles([3.0]) == {"p50": 3.0, "p95": 3.0, "p99": 3.0}
+
+
+def test_run_and_compare(tmp_path, monkeypatch, capsys):
+    # Der Lauf konfiguriert Gemini und den Limiter prozessweit – danach zurücksetzen
+    for mod, attr in ((llm, "_client"), (llm, "_names"), (ratelimit, "_limiter"), (model_health, "_registry")):
+        monkeypatch.setattr(mod, attr, getattr(mod, attr))
+    for attr, value in (("_client_config", {}), ("_not_found", set()), ("_instances", {})):
+        monkeypatch.setattr(llm, attr, value)
+    args = ["--embedder", "stub", "--docs", "2", "--pages", "2", "--nachtraege", "2",
+            "--queries", "4", "--latency", "0", "--out-dir", str(tmp_path / "res")]
+    assert bench.main(args) == 0
+    (name,) = os.listdir(tmp_path / "res")
+    with open(tmp_path / "res" / name, encoding="utf-8") as f:
+        result = json.load(f)
+    phases = result["results"]
+    assert set(phases) >= {"corpus", "read_pdf", "index", "retrieval", "check"}
+    assert phases["index"]["chunks"] > 0
+    assert result["meta"]["config"]["docs"] == 2
+
+    capsys.readouterr()
+    path = str(tmp_path / "res" / name)
+    assert bench.main(["--compare", path, path]) == 0
+    assert "index.chunks" in capsys.readouterr().out
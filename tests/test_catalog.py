@@ -0,0 +1,125 @@
+import os
+import shutil
+
+import pytest
+
+from tgacode.catalog import STAMMDATEN_FILE, Catalog
+from tgacode.chunking import CHUNK_OVERLAP, CHUNK_WORDS
+from tgacode.indexing import EMBEDDING_MODEL, MANIFEST_NAME, chunking_params, index_dir, save_manifest
+from tgacode.vectorstore import STATUS_MISSING, STATUS_OK, STATUS_OUTDATED
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    vault = tmp_path / "vault"
+    vault.mkdir()
+    return Catalog(str(tmp_path / "katalog.sqlite"), vault=str(vault), reconcile_seconds=3600)
+
+
+def _names(catalog, firma="Fa", projekt="P1"):
+    return [d["name"] for d in catalog.documents(firma, projekt)]
+
+
+def test_app_write_paths_update_catalog(catalog):
+    catalog.save_document("Fa", "P1", "LV.pdf", b"%PDF lv")
+    catalog.save_stammdaten("Fa", "P1", "Stundensatz 65 EUR")
+    assert catalog.firmen() == ["Fa"]
+    assert catalog.projekte("Fa") == ["P1"]
+    (doc,) = catalog.documents("Fa", "P1")
+    assert doc["name"] == "LV.pdf" and doc["size"] == 7 and len(doc["sha256"]) == 64
+    assert catalog.stammdaten("Fa", "P1") == "Stundensatz 65 EUR"
+
+
+def test_stammdaten_versions(catalog):
+    catalog.save_stammdaten("Fa", "P1", "v1")
+    catalog.save_stammdaten("Fa", "P1", "v1")  # unverändert → keine neue Version
+    catalog.save_stammdaten("Fa", "P1", "v2")
+    assert [(v, t) for v, _, t in catalog.stammdaten_versions("Fa", "P1")] == [(2, "v2"), (1, "v1")]
+
+
+def test_reconcile_is_throttled(catalog):
+    assert catalog.reconcile()
+    assert not catalog.reconcile()
+    assert catalog.reconcile(force=True)
+
+
+def test_file_added_outside_the_app(catalog):
+    catalog.save_document("Fa", "P1", "LV.pdf", b"%PDF lv")
+    catalog.reconcile(force=True)
+    with open(os.path.join(catalog.project_path("Fa", "P1"), "Nachtrag.pdf"), "wb") as f:
+        f.write(b"%PDF nachtrag")
+    catalog.reconcile(force=True)
+    assert _names(catalog) == ["LV.pdf", "Nachtrag.pdf"]
+    added = catalog.documents("Fa", "P1")[1]
+    assert added["sha256"] is None and not added["indexed"]
+
+
+def test_document_overwritten_in_place(catalog):
+    catalog.save_document("Fa", "P1", "LV.pdf", b"%PDF lv")
+    catalog.update_index_state("Fa", "P1", {"files": {"LV.pdf": {
+        "sha256": catalog.documents("Fa", "P1")[0]["sha256"], "size": 7}}})
+    catalog.reconcile(force=True)
+    p_path = catalog.project_path("Fa", "P1")
+    folder = os.stat(p_path)
+    with open(os.path.join(p_path, "LV.pdf"), "wb") as f:
+        f.write(b"%PDF neue Fassung")
+    os.utime(p_path, ns=(folder.st_atime_ns, folder.st_mtime_ns))  # Ordner-mtime unverändert
+    catalog.reconcile(force=True)
+    (doc,) = catalog.documents("Fa", "P1")
+    assert doc["size"] == 17 and doc["sha256"] is None and not doc["indexed"]
+
+
+def test_stammdaten_edited_outside_the_app(catalog):
+    catalog.save_stammdaten("Fa", "P1", "alt")
+    path = os.path.join(catalog.project_path("Fa", "P1"), STAMMDATEN_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("neu")
+    os.utime(path, (1, 1))
+    catalog.reconcile(force=True)
+    assert catalog.stammdaten("Fa", "P1") == "neu"
+
+
+def test_deleted_project_and_firma(catalog, tmp_path):
+    catalog.save_document("Fa", "P1", "LV.pdf", b"%PDF lv")
+    catalog.save_document("Fa", "P2", "LV.pdf", b"%PDF lv")
+    catalog.save_document("Fb", "P1", "LV.pdf", b"%PDF lv")
+    catalog.reconcile(force=True)
+    shutil.rmtree(catalog.project_path("Fa", "P1"))
+    shutil.rmtree(os.path.join(catalog.vault, "Fb"))
+    catalog.reconcile(force=True)
+    assert catalog.projekte() == [("Fa", "P2")]
+    assert catalog.documents("Fa", "P1") == [] and catalog.documents("Fb", "P1") == []
+
+
+def test_update_index_state_from_manifest(catalog):
+    catalog.save_document("Fa", "P1", "LV.pdf", b"%PDF lv")
+    catalog.save_document("Fa", "P1", "Alt.pdf", b"%PDF alt")
+    (alt, lv) = catalog.documents("Fa", "P1")
+    manifest = {"files": {
+        "LV.pdf": {"sha256": lv["sha256"], "size": lv["size"]},
+        "Alt.pdf": {"sha256": "0" * 64, "size": alt["size"]},  # Stand einer älteren Fassung
+    }}
+    catalog.update_index_state("Fa", "P1", manifest, page_count=lambda sha: 3)
+    docs = {d["name"]: d for d in catalog.documents("Fa", "P1")}
+    assert docs["LV.pdf"]["indexed"] and docs["LV.pdf"]["pages"] == 3
+    assert not docs["Alt.pdf"]["indexed"]
+
+
+def test_manifest_changed_outside_the_app(catalog):
+    catalog.save_document("Fa", "P1", "LV.pdf", b"%PDF lv")
+    catalog.reconcile(force=True)
+    assert catalog.index_state("Fa", "P1")["state"] == STATUS_MISSING
+    (doc,) = catalog.documents("Fa", "P1")
+    p_path = catalog.project_path("Fa", "P1")
+    manifest = {"version": 2, "embedding_model": EMBEDDING_MODEL,
+                "chunking": chunking_params(CHUNK_WORDS, CHUNK_OVERLAP),
+                "files": {"LV.pdf": {"sha256": doc["sha256"], "size": doc["size"], "chunk_ids": ["LV.pdf_0"]}}}
+    save_manifest(p_path, manifest)  # z. B. durch einen CLI-Lauf
+    catalog.reconcile(force=True)
+    assert catalog.index_state("Fa", "P1")["state"] == STATUS_OK
+    assert catalog.documents("Fa", "P1")[0]["indexed"]
+
+    save_manifest(p_path, dict(manifest, embedding_model="anderes-modell"))
+    os.utime(os.path.join(index_dir(p_path), MANIFEST_NAME), (1, 1))
+    catalog.reconcile(force=True)
+    assert catalog.index_state("Fa", "P1")["state"] == STATUS_OUTDATED
@@ -0,0 +1,48 @@
+import pytest
+
+from tgacode.chunking import iter_chunks
+
+
+def _pages(*counts):
+    """Seiten mit durchnummerierten Wörtern 'p<Seite>w<Nr>'."""
+    return [" ".join(f"p{p}w{i}" for i in range(n)) for p, n in enumerate(counts, start=1)]
+
+
+def test_windows_share_overlap():
+    chunks = list(iter_chunks(_pages(25), size=10, overlap=3))
+    words = [text.split() for text, _, _ in chunks]
+    assert [len(w) for w in words] == [10, 10, 10, 4]
+    for prev, cur in zip(words, words[1:]):
+        assert prev[-3:] == cur[:3]
+    assert words[-1][-1] == "p1w24"  # Rest landet im letzten Chunk
+
+
+def test_every_word_is_covered_once_outside_overlap():
+    chunks = list(iter_chunks(_pages(7, 8, 9), size=6, overlap=2))
+    seen = [w for i, (text, _, _) in enumerate(chunks) for w in text.split()[(2 if i else 0):]]
+    assert seen == " ".join(_pages(7, 8, 9)).split()
+
+
+def test_page_bounds_span_page_breaks():
+    chunks = list(iter_chunks(_pages(4, 4, 4), size=5, overlap=1))
+    assert [(a, b) for _, a, b in chunks] == [(1, 2), (2, 3), (3, 3)]
+    for text, a, b in chunks:
+        pages = {int(w[1:w.index("w")]) for w in text.split()}
+        assert (min(pages), max(pages)) == (a, b)
+
+
+def test_empty_pages_keep_numbering():
+    chunks = list(iter_chunks(["", None, "a b c"], size=10, overlap=2))
+    assert chunks == [("a b c", 3, 3)]
+    assert list(iter_chunks([], size=10)) == []
+
+
+def test_exact_fit_has_no_trailing_duplicate():
+    assert len(list(iter_chunks(_pages(10), size=10, overlap=3))) == 1
+
+
+def test_overlap_is_clamped_and_size_validated():
+    chunks = list(iter_chunks(_pages(5), size=3, overlap=5))  # → overlap 2
+    assert [t for t, _, _ in chunks][:2] == ["p1w0 p1w1 p1w2", "p1w1 p1w2 p1w3"]
+    with pytest.raises(ValueError):
+        list(iter_chunks(_pages(5), size=0))
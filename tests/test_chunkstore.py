@@ -0,0 +1,79 @@
+import shutil
+
+import chromadb
+import numpy as np
+
+from tgacode import indexing
+from tgacode.chunkstore import ChunkStore, chunk_key
+from tgacode.config import CHUNK_STORE_DIR
+from tgacode.indexing import collection_name, index_project, load_manifest
+from tgacode.vecstore import NumpyCollection
+from tgacode.vectorstore import open_collection
+
+
+def test_put_load_and_usage(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks"))
+    key = chunk_key("0" * 64, "modell", {"size": 400, "overlap": 60})
+    assert key != chunk_key("0" * 64, "anderes-modell", {"size": 400, "overlap": 60})
+    assert not store.has(key) and store.load(key) is None
+
+    store.put(key, ["a", "b"], [(1, 1), (1, 2)], np.ones((2, 4)))
+    store.put(key, ["x"], [(9, 9)], np.zeros((1, 4)))  # gleicher Schlüssel = gleicher Inhalt
+    texts, pages, vecs = store.load(key)
+    assert texts == ["a", "b"] and pages == [(1, 1), (1, 2)]
+    assert vecs.dtype == np.float16 and vecs.shape == (2, 4)
+    assert store.usage()["entries"] == 1
+
+
+def _index_twice(tmp_path, make_pdf, embedder):
+    words = " ".join(f"vob{i}" for i in range(900))
+    projects = []
+    for name in ("P1", "P2"):
+        path = tmp_path / name
+        path.mkdir()
+        make_pdf(path / "VOB-B.pdf", [words])
+        client = chromadb.PersistentClient(path=str(tmp_path / f"chroma-{name}"))
+        stats = index_project(str(path), name, embedder, client)
+        projects.append((str(path), name, client, stats))
+    return projects
+
+
+def _top_hit(embedder, path, name, client):
+    query = embedder.encode(["vob1 vob2"]).tolist()
+    return open_collection(path, name, client).query(query_embeddings=query, n_results=1)["ids"][0][0]
+
+
+def test_same_pdf_in_two_projects_is_stored_once(tmp_path, make_pdf, embedder):
+    projects = _index_twice(tmp_path, make_pdf, embedder)
+    (p1, _, c1, s1), (p2, _, c2, s2) = projects
+
+    assert len(embedder.texts) == s1["chunks"] > 1  # P2 übernimmt Chunks und Embeddings
+    assert s2["reused"] == 1 and s2["chunks"] == 0
+    assert ChunkStore().usage()["entries"] == 1
+    entries = [load_manifest(p)["files"]["VOB-B.pdf"] for p, _, _, _ in projects]
+    assert entries[0]["chunk_key"] == entries[1]["chunk_key"] and entries[1]["shared"]
+    # Keine Kopie im zweiten Projekt: dessen Collection bleibt leer
+    assert c2.get_or_create_collection(collection_name("P2")).count() == 0
+
+    hits = [_top_hit(embedder, p, n, c) for p, n, c, _ in projects]
+    assert hits[0] == hits[1] and hits[0].startswith("VOB-B.pdf_")
+    assert isinstance(open_collection(p2, "P2", c2), NumpyCollection)
+    assert index_project(p2, "P2", embedder, c2)["skipped"] == 1
+
+
+def test_shared_document_reindexed_when_chunk_store_cleared(tmp_path, make_pdf, embedder):
+    (_, _, _, s1), (p2, _, c2, _) = _index_twice(tmp_path, make_pdf, embedder)
+    shutil.rmtree(CHUNK_STORE_DIR)
+    stats = index_project(p2, "P2", embedder, c2)
+    assert stats["added"] == 1 and stats["chunks"] == s1["chunks"]
+    assert c2.get_or_create_collection(collection_name("P2")).count() == s1["chunks"]
+    assert _top_hit(embedder, p2, "P2", c2).startswith("VOB-B.pdf_")
+
+
+def test_shared_documents_copied_for_large_projects(tmp_path, make_pdf, embedder, monkeypatch):
+    (_, _, _, s1), (p2, _, c2, _) = _index_twice(tmp_path, make_pdf, embedder)
+    monkeypatch.setattr(indexing, "NUMPY_MAX_CHUNKS", 1)  # ohne Verweis-Speicher → Chroma fragen
+    make_pdf(tmp_path / "P2" / "Nachtrag.pdf", ["Nachtrag 1"])
+    index_project(p2, "P2", embedder, c2)
+    assert not load_manifest(p2)["files"]["VOB-B.pdf"].get("shared")
+    assert c2.get_or_create_collection(collection_name("P2")).count() == s1["chunks"] + 1
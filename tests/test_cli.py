@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+
+from tgacode import cli
+
+
+@pytest.fixture
+def batch(tmp_path, fake_llm, monkeypatch, make_pdf, embedder):
+    """VAULT mit leerem Projekt, zwei Nachträge; Gemini = Fake-Server, Embedder = Stub."""
+    (tmp_path / "vault" / "Firma" / "Projekt").mkdir(parents=True)
+    (tmp_path / "nt").mkdir()
+    for n in ("01", "02"):
+        make_pdf(tmp_path / "nt" / f"NT{n}.pdf", [f"Nachtrag {n} Mehrkosten Lüftung"])
+    monkeypatch.setattr(cli, "load_embed_service", lambda name: embedder)
+    monkeypatch.setattr(cli, "configure_gemini", lambda: None)  # fake_llm ist schon konfiguriert
+
+    def run(*extra):
+        return cli.main(["--vault", str(tmp_path / "vault"), "check", str(tmp_path / "nt"),
+                         "--projekt", "Firma/Projekt", "--out", str(tmp_path / "out"), *extra])
+
+    return run
+
+
+def _results(tmp_path):
+    root = tmp_path / "out"
+    (project,) = os.listdir(root)
+    return {name: root / project / name for name in sorted(os.listdir(root / project))}
+
+
+def test_check_writes_results(batch, tmp_path, capsys):
+    assert batch() == 0
+    results = _results(tmp_path)
+    assert sorted(results) == ["NT01", "NT02"]
+    for out in results.values():
+        assert (out / "bericht.md").read_text(encoding="utf-8").startswith("# Prüfbericht")
+        json.loads((out / "zusammenfassung.json").read_text(encoding="utf-8"))
+        status = json.loads((out / "status.json").read_text(encoding="utf-8"))
+        assert len(status["source_sha256"]) == 64
+    assert capsys.readouterr().out.count("fertig") == 2
+
+
+def test_resume_skips_checked_nachtraege(batch, tmp_path, make_pdf, capsys, fake_llm):
+    batch()
+    capsys.readouterr()
+    requests = fake_llm.stats()["requests"]
+    assert batch() == 0
+    assert capsys.readouterr().out.count("übersprungen") == 2
+    assert fake_llm.stats()["requests"] == requests
+
+    # Geänderter Inhalt → neuer Hash → wird erneut geprüft
+    make_pdf(tmp_path / "nt" / "NT02.pdf", ["Nachtrag 02 geänderte Fassung"])
+    batch()
+    out = capsys.readouterr().out
+    assert "NT01.pdf: übersprungen" in out and "NT02.pdf: fertig" in out
+
+    batch("--force")
+    assert capsys.readouterr().out.count("fertig") == 2
+
+
+def test_unfinished_check_is_repeated(batch, tmp_path, capsys):
+    batch()
+    os.remove(_results(tmp_path)["NT01"] / "status.json")  # Abbruch vor dem letzten Schreibschritt
+    capsys.readouterr()
+    batch()
+    out = capsys.readouterr().out
+    assert "NT01.pdf: fertig" in out and "NT02.pdf: übersprungen" in out
+
+
+def test_same_name_from_two_folders_gets_separate_results(batch, tmp_path, make_pdf):
+    (tmp_path / "nt2").mkdir()
+    make_pdf(tmp_path / "nt2" / "NT01.pdf", ["Nachtrag 01 anderer Bauabschnitt"])
+    assert cli.main(["--vault", str(tmp_path / "vault"), "check", str(tmp_path / "nt"), str(tmp_path / "nt2"),
+                     "--projekt", "Firma/Projekt", "--out", str(tmp_path / "out")]) == 0
+    results = _results(tmp_path)
+    assert len(results) == 3 and "NT02" in results
+    dup = [name for name in results if name.startswith("NT01_")]
+    assert len(dup) == 2
+    sources = {json.loads((results[name] / "status.json").read_text(encoding="utf-8"))["source"] for name in dup}
+    assert sources == {str(tmp_path / "nt" / "NT01.pdf"), str(tmp_path / "nt2" / "NT01.pdf")}
+
+
+def test_caches_and_metrics_follow_vault(batch, tmp_path, make_pdf, embedder, monkeypatch):
+    vault = tmp_path / "vault"
+    make_pdf(vault / "Firma" / "Projekt" / "LV.pdf", ["Leistungsverzeichnis Lüftung"])
+    monkeypatch.setattr(cli, "load_embed_service", lambda name: embedder)
+    assert cli.main(["--vault", str(vault), "index"]) == 0
+    assert batch() == 0
+    for path in ("_cache/llm_cache.sqlite3", "_cache/chunks", "_cache/pages", "_cache/models.json",
+                 "_metrics/metrics.jsonl"):
+        assert (vault / path).exists(), path
+    assert not (tmp_path / "vault_tgacode").exists()  # Standard-VAULT im Arbeitsverzeichnis unberührt
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from tgacode.bench import HashEmbedder
+from tgacode.embed_service import EmbedBusy, EmbedService
+
+
+class GatedEmbedder(HashEmbedder):
+    """Blockiert encode(), bis gate gesetzt ist; merkt sich die Batch-Größen."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.batches = []
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(len(texts))
+        self.entered.set()
+        assert self.gate.wait(5)
+        return super().encode(texts, **kwargs)
+
+
+def _run(target, *args):
+    out = {}
+
+    def run():
+        try:
+            out["result"] = target(*args)
+        except Exception as e:
+            out["error"] = e
+
+    t = threading.Thread(target=run)
+    t.start()
+    return t, out
+
+
+def test_results_match_direct_encode():
+    embedder = HashEmbedder()
+    service = EmbedService(embedder)
+    texts = ["Lüftungskanal", "Heizkörper", "§ 2 VOB/B"]
+    assert np.array_equal(service.encode(texts), embedder.encode(texts))
+    assert np.array_equal(service.encode("Heizkörper"), embedder.encode("Heizkörper"))
+    assert service.encode([]).shape[0] == 0
+
+
+def test_concurrent_requests_share_batches():
+    embedder = GatedEmbedder(call_seconds=0.02)
+    embedder.gate.set()
+    service = EmbedService(embedder, max_batch=8, max_wait=0.05)
+    results = {}
+
+    def worker(i):
+        texts = [f"Frage {i}a", f"Frage {i}b"]
+        results[i] = (texts, service.encode(texts))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for texts, vecs in results.values():
+        assert np.array_equal(vecs, embedder.encode(texts))  # jede Anfrage bekommt ihre Zeilen
+    stats = service.stats()
+    assert stats["requests"] == 12 and stats["texts"] == 24
+    assert stats["batches"] < 12 and stats["mean_batch_requests"] > 1
+    assert max(embedder.batches) <= 8
+
+
+def test_requests_are_never_split():
+    embedder = GatedEmbedder()
+    embedder.gate.set()
+    service = EmbedService(embedder, max_batch=4, max_wait=0.05)
+    threads = [_run(service.encode, [f"t{i}_{j}" for j in range(3)])[0] for i in range(4)]
+    for t in threads:
+        t.join()
+    assert embedder.batches == [3, 3, 3, 3]
+    big = service.encode([f"x{i}" for i in range(10)])  # größer als max_batch: ein eigener Batch
+    assert big.shape[0] == 10 and embedder.batches[-1] == 10
+
+
+def test_full_queue_applies_back_pressure():
+    embedder = GatedEmbedder()
+    service = EmbedService(embedder, max_batch=4, max_wait=0.0, max_queue=4, queue_timeout=0.1)
+    first, _ = _run(service.encode, ["a", "b"])
+    assert embedder.entered.wait(5)  # Batch läuft, Warteschlange wieder leer
+    queued, queued_out = _run(service.encode, ["c", "d", "e", "f"])
+    while service.stats()["queued"] < 4:
+        time.sleep(0.005)
+
+    with pytest.raises(EmbedBusy):
+        service.encode(["g"])  # kein Platz bis zum Timeout
+    service.queue_timeout = 5.0
+    waiting, waiting_out = _run(service.encode, ["h"])
+    time.sleep(0.05)
+    assert waiting.is_alive()  # wartet auf Platz
+    embedder.gate.set()
+    for t in (first, queued, waiting):
+        t.join(5)
+    assert queued_out["result"].shape[0] == 4 and waiting_out["result"].shape[0] == 1
+    stats = service.stats()
+    assert stats["throttled"] == 2 and stats["rejected"] == 1 and stats["max_queue"] == 4
+
+
+def test_errors_reach_all_callers_and_service_recovers():
+    class Failing(HashEmbedder):
+        fail = True
+
+        def encode(self, texts, **kwargs):
+            if self.fail:
+                raise RuntimeError("Modell nicht geladen")
+            return super().encode(texts, **kwargs)
+
+    embedder = Failing()
+    service = EmbedService(embedder)
+    with pytest.raises(RuntimeError, match="Modell nicht geladen"):
+        service.encode(["a"])
+    embedder.fail = False
+    assert service.encode(["a"]).shape == (1, HashEmbedder.dim)
@@ -0,0 +1,38 @@
+from tgacode.embedding import embed_stream, encode_texts
+from tgacode.indexing import index_project
+
+
+def test_encode_texts_one_call_per_batch(embedder):
+    assert encode_texts(embedder, []) == []
+    vecs = encode_texts(embedder, ["a", "b", "c"])
+    assert len(vecs) == 3 and isinstance(vecs[0], list)
+    assert embedder.batches == [3]
+
+
+def test_embed_stream_keeps_order_and_batch_size(embedder):
+    items = [(f"id{i}", f"text {i}", {"page_start": i}) for i in range(10)]
+    stats = {}
+    batches = list(embed_stream(embedder, iter(items), "stub", batch_size=4, stats=stats))
+    assert [len(ids) for ids, _, _, _ in batches] == [4, 4, 2]
+    assert [i for ids, _, _, _ in batches for i in ids] == [i for i, _, _ in items]
+    assert [d for _, docs, _, _ in batches for d in docs] == [t for _, t, _ in items]
+    assert [m for _, _, metas, _ in batches for m in metas] == [m for _, _, m in items]
+    assert all(len(ids) == len(vecs) for ids, _, _, vecs in batches)
+    assert stats["chunks"] == 10 and stats["embed_seconds"] >= 0
+    assert embedder.batches == [4, 4, 2]
+
+
+def test_index_project_embeds_in_batches(tmp_path, make_pdf, embedder):
+    import chromadb
+
+    path = tmp_path / "Projekt"
+    path.mkdir()
+    for n in range(3):
+        make_pdf(path / f"Doc{n}.pdf", [" ".join(f"d{n}w{i}" for i in range(900))])
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    stats = index_project(str(path), "projekt", embedder, client, batch_size=2, workers=1)
+    assert stats["added"] == 3 and stats["workers"] == 1
+    # Chunks mehrerer Dateien laufen durch dieselbe Pipeline, Batches nie größer als batch_size
+    assert max(embedder.batches) == 2 and sum(embedder.batches) == stats["chunks"] > 3
+    assert client.get_or_create_collection("projekt").count() == stats["chunks"]
+    assert stats["chunks_per_sec"] > 0
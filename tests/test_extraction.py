@@ -0,0 +1,60 @@
+import io
+
+from tgacode import extraction
+from tgacode.extraction import extract_pages, iter_extracted, load_cached_pages, read_pdf, source_sha256
+
+
+def test_pages_are_cached_by_content_hash(tmp_path, make_pdf, monkeypatch):
+    path = make_pdf(tmp_path / "LV.pdf", ["Seite eins", "Seite zwei"])
+    cache = str(tmp_path / "cache")
+    pages = extract_pages(path, cache_dir=cache)
+    assert [p.strip() for p in pages] == ["Seite eins", "Seite zwei"]
+    assert load_cached_pages(source_sha256(path), cache) == pages
+
+    def no_parse(*args, **kwargs):
+        raise AssertionError("PDF wurde erneut geparst")
+
+    monkeypatch.setattr(extraction, "_extract_range", no_parse)
+    # Dieselbe Datei als Upload (z. B. Nachtrag) trifft denselben Cache-Eintrag
+    with open(path, "rb") as f:
+        upload = io.BytesIO(f.read())
+    assert extract_pages(upload, cache_dir=cache) == pages
+    assert upload.tell() == 0
+
+
+def test_read_pdf_joins_page_texts(tmp_path, make_pdf):
+    path = make_pdf(tmp_path / "LV.pdf", ["eins", "zwei"])
+    assert read_pdf(path).split() == ["eins", "zwei"]
+
+
+def test_parallel_matches_serial_order(tmp_path, make_pdf, monkeypatch):
+    monkeypatch.setattr(extraction, "PAGES_PER_TASK", 2)
+    sources = [
+        make_pdf(tmp_path / f"Doc{n}.pdf", [f"doc{n} seite{i}" for i in range(n + 1)])
+        for n in range(4)
+    ]
+    serial = list(iter_extracted(sources, workers=1, cache_dir=str(tmp_path / "a")))
+    parallel = list(iter_extracted(sources, workers=2, cache_dir=str(tmp_path / "b")))
+    assert parallel == serial
+    assert [len(p) for p in parallel] == [1, 2, 3, 4]
+    assert parallel[3][3].strip() == "doc3 seite3"
+
+
+def test_broken_pdf_yields_no_pages(tmp_path):
+    path = tmp_path / "kaputt.pdf"
+    path.write_bytes(b"kein PDF")
+    assert extract_pages(str(path), cache_dir=str(tmp_path / "cache")) == []
+    assert list(iter_extracted([str(path)], workers=2, cache_dir=str(tmp_path / "cache"))) == [[]]
+
+
+def test_pool_path_does_not_parse_in_main_process(tmp_path, make_pdf, monkeypatch):
+    sources = [make_pdf(tmp_path / f"Doc{n}.pdf", [f"doc{n} seite{i}" for i in range(5)]) for n in range(2)]
+    serial = list(iter_extracted(sources, workers=1, cache_dir=str(tmp_path / "a")))
+
+    def no_parse(src):
+        raise AssertionError("PDF im Hauptprozess geöffnet")
+
+    monkeypatch.setattr(extraction, "_open_reader", no_parse)
+    monkeypatch.setattr(extraction, "INLINE_MAX_BYTES", 0)
+    monkeypatch.setattr(extraction, "PAGES_PER_TASK", 2)
+    assert list(iter_extracted(sources, workers=2, cache_dir=str(tmp_path / "b"))) == serial
@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from tgacode.bench import HashEmbedder
+from tgacode.history import CheckHistory, compare_texts, text_sha, text_vector
+
+ALT = """Nachtrag 3 – Mehrleistungen Lüftung
+01.01 Montagestunden Monteur 10 Std 58,00 € 580,00 €
+01.02 Lüftungskanal verzinkt 12,5 m 40,00 € 500,00 €
+01.03 Revisionsöffnung 4 Stück 35,00 € 140,00 €
+01.04 Brandschutzklappe DN 200 1 Stück 0,00 € 0,00 €
+01.05 Dämmung Kanal 12,5 m 0,00 € 0,00 €
+Ausführungszeitraum: KW 14 bis KW 16
+Bauvorhaben: Neubau Verwaltungsgebäude
+Auftraggeber: Stadtwerke
+Ansprechpartner: Bauleitung TGA
+Gesamtsumme netto 1.220,00 €
+Begründung: Anordnung der Bauleitung vom 12.03.
+"""
+NEU = ALT.replace("10 Std 58,00 € 580,00 €", "8 Std 52,00 € 416,00 €").replace("1.220,00", "1.056,00")
+
+
+def _check(text, report="# Bericht"):
+    return {"nt_text": text, "questions": ["Frage 1"], "hits": [], "final_ctx": "Kontext",
+            "report": report, "summary": {"empfehlung": "Freigabe"}, "mode": "voll"}
+
+
+def test_compare_texts_reports_changed_lines():
+    cmp = compare_texts(ALT, NEU)
+    assert cmp["changed_lines"] == 2
+    assert cmp["ratio"] == pytest.approx(10 / 12)
+    assert "- 01.01 Montagestunden Monteur 10 Std 58,00 € 580,00 €" in cmp["diff"]
+    assert "+ 01.01 Montagestunden Monteur 8 Std 52,00 € 416,00 €" in cmp["diff"]
+    assert cmp["added"].splitlines() == [
+        "01.01 Montagestunden Monteur 8 Std 52,00 € 416,00 €", "Gesamtsumme netto 1.056,00 €",
+    ]
+
+
+def test_compare_texts_ignores_whitespace_and_blank_lines():
+    reflowed = "\n\n".join("  ".join(line.split()) for line in ALT.splitlines())
+    cmp = compare_texts(ALT, reflowed)
+    assert cmp["ratio"] == 1.0 and cmp["diff"] == "" and cmp["changed_lines"] == 0
+
+
+def test_compare_texts_limits_diff_lines():
+    old = "\n".join(f"Zeile {i}" for i in range(50))
+    new = "\n".join(f"Zeile {i} neu" for i in range(50))
+    lines = compare_texts(old, new, max_lines=10)["diff"].splitlines()
+    assert len(lines) == 11 and lines[-1] == "[… 90 weitere Diff-Zeilen …]"
+
+
+def test_text_vector_is_normalized_and_stable():
+    embedder = HashEmbedder()
+    vec = text_vector(embedder, ALT)
+    assert sum(x * x for x in vec) == pytest.approx(1.0, abs=1e-5)
+    assert vec == text_vector(embedder, ALT)
+
+
+def test_find_similar_returns_best_changed_version(tmp_path):
+    history = CheckHistory(str(tmp_path))
+    rid = history.add(_check(ALT), [1.0, 0.0], ["NT3.pdf"])
+    history.add(_check("Ganz anderer Nachtrag\nHeizung\n"), [0.0, 1.0], ["NT9.pdf"])
+    assert rid == text_sha(ALT)[:16]
+
+    match = history.find_similar(NEU, [0.99, 0.14])
+    assert match["record"]["names"] == ["NT3.pdf"]
+    assert match["record"]["report"] == "# Bericht"
+    assert match["similarity"] == pytest.approx(0.99)
+    assert match["changed_lines"] == 2
+
+
+def test_find_similar_skips_identical_and_dissimilar(tmp_path):
+    history = CheckHistory(str(tmp_path))
+    history.add(_check(ALT), [1.0, 0.0])
+    assert history.find_similar(ALT, [1.0, 0.0]) is None  # wortgleich → LLM-Cache
+    assert history.find_similar(NEU, [0.5, 0.87]) is None  # Kosinus zu klein
+    assert history.find_similar(NEU, [1.0, 0.0], min_ratio=0.9) is None  # zu viele Zeilen geändert
+
+
+def test_add_replaces_same_text_and_caps_records(tmp_path):
+    history = CheckHistory(str(tmp_path), max_records=3)
+    history.add(_check(ALT, "# alt"), [1.0, 0.0])
+    history.add(_check(ALT, "# neu"), [1.0, 0.0])
+    assert len(history.entries()) == 1
+    assert history.load(text_sha(ALT)[:16])["report"] == "# neu"
+    for i in range(5):
+        history.add(_check(f"Nachtrag {i}"), [0.0, 1.0])
+    entries = history.entries()
+    assert len(entries) == 3
+    assert history.load(text_sha(ALT)[:16]) is None  # älteste Prüfung samt Datei entfernt
+
+
+def test_concurrent_adds_keep_all_entries(tmp_path):
+    threads = [threading.Thread(target=CheckHistory(str(tmp_path)).add, args=(_check(f"Nachtrag {i}"), [1.0]))
+               for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(CheckHistory(str(tmp_path)).entries()) == 20
@@ -0,0 +1,69 @@
+import os
+
+import chromadb
+import pytest
+
+from tgacode.indexing import index_project, load_manifest
+
+
+def _words(tag, n=30):
+    return " ".join(f"{tag}{i}" for i in range(n))
+
+
+@pytest.fixture
+def project(tmp_path, make_pdf):
+    path = tmp_path / "Firma" / "Projekt"
+    path.mkdir(parents=True)
+    make_pdf(path / "LV.pdf", [_words("lv")])
+    make_pdf(path / "Vertrag.pdf", [_words("vertrag")])
+    return str(path)
+
+
+@pytest.fixture
+def client(tmp_path):
+    return chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+
+
+def _ids(client, name="projekt"):
+    return set(client.get_or_create_collection(name).get(include=[])["ids"])
+
+
+def test_first_run_indexes_all_files(project, client, embedder):
+    stats = index_project(project, "projekt", embedder, client)
+    assert (stats["added"], stats["skipped"]) == (2, 0)
+    files = load_manifest(project)["files"]
+    assert sorted(files) == ["LV.pdf", "Vertrag.pdf"]
+    assert _ids(client) == {cid for entry in files.values() for cid in entry["chunk_ids"]}
+
+
+def test_unchanged_files_are_skipped(project, client, embedder):
+    index_project(project, "projekt", embedder, client)
+    embedded = len(embedder.texts)
+    # Nur Zeitstempel neu (z. B. erneut hochgeladen): Hash gleich, nichts einbetten
+    os.utime(os.path.join(project, "LV.pdf"), (1, 1))
+    stats = index_project(project, "projekt", embedder, client)
+    assert (stats["skipped"], stats["added"], stats["updated"]) == (2, 0, 0)
+    assert len(embedder.texts) == embedded
+    assert load_manifest(project)["files"]["LV.pdf"]["mtime"] == 1
+
+
+def test_changed_file_is_reembedded(project, client, embedder, make_pdf):
+    index_project(project, "projekt", embedder, client)
+    make_pdf(os.path.join(project, "LV.pdf"), [_words("neu")])
+    embedder.texts.clear()
+    stats = index_project(project, "projekt", embedder, client)
+    assert (stats["updated"], stats["skipped"]) == (1, 1)
+    assert embedder.texts and all("neu" in text for text in embedder.texts)
+    docs = client.get_or_create_collection("projekt").get(ids=load_manifest(project)["files"]["LV.pdf"]["chunk_ids"])
+    assert all("neu0" in doc and "lv0" not in doc for doc in docs["documents"])
+
+
+def test_deleted_file_chunks_are_removed(project, client, embedder):
+    index_project(project, "projekt", embedder, client)
+    gone = load_manifest(project)["files"]["Vertrag.pdf"]["chunk_ids"]
+    os.remove(os.path.join(project, "Vertrag.pdf"))
+    stats = index_project(project, "projekt", embedder, client)
+    assert stats["removed"] == 1
+    assert "Vertrag.pdf" not in load_manifest(project)["files"]
+    assert not _ids(client) & set(gone)
+    assert _ids(client)
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+
+import pytest
+
+from tgacode.indexing import LOCK_NAME, IndexBusy, index_dir, index_lock
+from tgacode.jobs import DONE, FAILED, JobQueue
+
+
+def _wait(job, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if not job.active:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError(f"Job {job.label} läuft noch")
+
+
+def test_requests_for_running_project_are_coalesced():
+    queue = JobQueue(workers=2)
+    gate, started = threading.Event(), threading.Event()
+    runs, running, lock = [], [0], threading.Lock()
+
+    def job_fn(name, block=False):
+        def fn(progress):
+            with lock:
+                running[0] += 1
+                runs.append((name, running[0]))
+            if block:
+                started.set()
+                gate.wait(5)
+            with lock:
+                running[0] -= 1
+            return name
+        return fn
+
+    first = queue.submit("Fa/P1", job_fn("erster", block=True))
+    assert started.wait(5)
+    second = queue.submit("Fa/P1", job_fn("zweiter"))
+    third = queue.submit("Fa/P1", job_fn("dritter"))
+    assert third is second and second.requests == 2
+    assert queue.latest("Fa/P1") is second
+    gate.set()
+    _wait(first), _wait(second)
+    # Genau zwei Läufe, nie gleichzeitig; der wartende Job führt das zuletzt übergebene fn aus
+    assert runs == [("erster", 1), ("dritter", 1)]
+    assert (first.state, second.state, second.result) == (DONE, DONE, "dritter")
+
+
+def test_other_projects_run_in_parallel_and_progress():
+    queue = JobQueue(workers=2)
+    gate = threading.Event()
+    blocked = queue.submit("Fa/P1", lambda progress: gate.wait(5))
+
+    def fn(progress):
+        progress(1, 2, chunks=10)
+        return "ok"
+
+    other = _wait(queue.submit("Fa/P2", fn))
+    assert other.state == DONE and other.progress == {"done": 1, "total": 2, "chunks": 10}
+    assert other.fraction() == 0.5
+    assert blocked.active and queue.running("Fa/P1") is blocked
+    gate.set()
+    _wait(blocked)
+    assert {j.key for j in queue.history()} == {"Fa/P1", "Fa/P2"}
+
+
+def test_failed_job_keeps_error():
+    queue = JobQueue()
+
+    def fail(progress):
+        raise RuntimeError("PDF defekt")
+
+    job = _wait(queue.submit("Fa/P1", fail))
+    assert job.state == FAILED and str(job.error) == "PDF defekt"
+    assert queue.active() == []
+
+
+def test_index_lock_is_exclusive(tmp_path):
+    with index_lock(str(tmp_path)):
+        with pytest.raises(IndexBusy):
+            with index_lock(str(tmp_path)):
+                pass
+    assert not os.path.exists(os.path.join(index_dir(str(tmp_path)), LOCK_NAME))
+
+
+@pytest.mark.skipif(os.name == "nt", reason="PID-Prüfung nur unter POSIX")
+def test_lock_of_dead_process_is_taken_over(tmp_path):
+    import socket
+    import subprocess
+    import sys
+
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                          capture_output=True, text=True, check=True)
+    os.makedirs(index_dir(str(tmp_path)))
+    with open(os.path.join(index_dir(str(tmp_path)), LOCK_NAME), "w", encoding="utf-8") as f:
+        json.dump({"pid": int(dead.stdout), "host": socket.gethostname(), "since": 0}, f)
+    with index_lock(str(tmp_path)):
+        pass
+
+
+def test_unreadable_lock_counts_as_busy(tmp_path, monkeypatch):
+    def denied(path):
+        raise PermissionError(path)
+
+    with index_lock(str(tmp_path)):
+        monkeypatch.setattr(os.path, "getmtime", denied)
+        with pytest.raises(IndexBusy):
+            with index_lock(str(tmp_path)):
+                pass
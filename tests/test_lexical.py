@@ -0,0 +1,64 @@
+import pytest
+
+from tgacode.lexical import LexicalIndex, fuse_rankings, load_lexical, tokenize
+
+CHUNKS = {
+    "a.pdf": ["Pos. 3.1.20 Lüftungskanal verzinkt nach DIN 1946-6", "Anordnung gemäß § 2 Abs. 5 VOB/B"],
+    "b.pdf": ["Lüftungskanal Lüftungskanal Lüftungskanal Revisionsöffnung", "Heizkörper Typ 22 tauschen"],
+}
+
+
+@pytest.fixture
+def index():
+    idx = LexicalIndex()
+    for name, texts in CHUNKS.items():
+        for i, text in enumerate(texts):
+            idx.add(name, f"{name}_{i}", text)
+    return idx
+
+
+def test_tokenize_keeps_identifiers():
+    assert tokenize("Pos. 3.1.20 nach DIN 1988-300 gemäß § 2 und §§13") == \
+        ["pos", "3.1.20", "din", "1988-300", "gemäß", "§2", "§§13"]
+
+
+def test_tokenize_drops_stopwords_and_trailing_dots():
+    assert tokenize("Der Kanal ist am 12.03. montiert.") == ["kanal", "12.03", "montiert"]
+
+
+def test_search_ranks_exact_identifier_first(index):
+    hits = index.search("Kanal nach OZ 3.1.20")
+    assert hits[0][0] == "a.pdf_0"
+    assert index.lookup("§ 2") == ["a.pdf_1"]
+
+
+def test_search_term_frequency_and_ties(index):
+    hits = index.search("Lüftungskanal", n_results=5)
+    assert [cid for cid, _ in hits] == ["b.pdf_0", "a.pdf_0"]
+    assert hits[0][1] > hits[1][1] > 0
+    assert index.search("Dachrinne") == []
+
+
+def test_remove_file_and_reload(index, tmp_path):
+    assert index.remove_file("b.pdf")
+    assert not index.remove_file("b.pdf")
+    assert [cid for cid, _ in index.search("Lüftungskanal")] == ["a.pdf_0"]
+    index.save(str(tmp_path))
+    loaded = load_lexical(str(tmp_path))
+    assert len(loaded) == 2
+    assert loaded.search("Lüftungskanal") == index.search("Lüftungskanal")
+
+
+def test_sync_drops_stale_and_backfills(index):
+    files = {"a.pdf": {"chunk_ids": ["a.pdf_0", "a.pdf_1"]}, "c.pdf": {"chunk_ids": ["c.pdf_0"]}}
+    assert index.sync(files, lambda entry: ["Brandschutzklappe"] * len(entry["chunk_ids"]))
+    assert sorted(index.files) == ["a.pdf", "c.pdf"]
+    assert index.lookup("Brandschutzklappe") == ["c.pdf_0"]
+    assert not index.sync(files, lambda entry: pytest.fail("nichts nachzutragen"))
+
+
+def test_fuse_rankings_rewards_agreement():
+    scores = fuse_rankings([["x", "y", "z"], ["y", "w"]], k=60)
+    assert max(scores, key=scores.get) == "y"
+    assert scores["y"] == pytest.approx(1 / 62 + 1 / 61)
+    assert scores["x"] > scores["z"] and scores["x"] > scores["w"]
@@ -0,0 +1,72 @@
+import pytest
+
+from tgacode import llm, llm_cache
+from tgacode.llm_cache import LLMCache, make_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_key_covers_prompt_and_config():
+    key = make_key("text", "Prompt", {"temperature": 0.2})
+    assert key == make_key("text", "Prompt", {"temperature": 0.2})
+    assert key != make_key("json", "Prompt", {"temperature": 0.2})
+    assert key != make_key("text", "Prompt!", {"temperature": 0.2})
+    assert key != make_key("text", "Prompt", {"temperature": 0.3})
+
+
+def test_cached_answer_survives_model_rotation(fake_llm, tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"))
+    names = llm.get_model_names()
+    text = llm.generate_with_backoff("Prüfe den Nachtrag.", cache=cache)
+    llm.mark_not_found(names[0])  # erstes Modell fällt weg, die Antwort bleibt gültig
+    seen = []
+    assert llm.generate_with_backoff("Prüfe den Nachtrag.", cache=cache, notify=seen.append) == text
+    assert fake_llm.stats()["requests"] == 1
+    assert seen == [f"KI-Antwort aus Cache ({names[0]})"]
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"))
+    assert cache.get("k") is None
+    cache.put("k", "Antwort", model="gemini-a")
+    assert cache.get("k") == ("Antwort", "gemini-a")
+    # Zweite Instanz (anderer Prozess/Kollege) sieht denselben Eintrag
+    assert LLMCache(str(tmp_path / "llm.sqlite")).get("k") == ("Antwort", "gemini-a")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] == len("Antwort")
+
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"), ttl=60)
+    cache.put("k", "alt")
+    clock[0] += 59
+    assert cache.get("k") == ("alt", None)
+    clock[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"), max_bytes=25)
+    for key in ("a", "b"):
+        cache.put(key, "x" * 10)
+        clock[0] += 1
+    assert cache.get("a") is not None  # a ist jetzt jünger als b
+    clock[0] += 1
+    cache.put("c", "y" * 10)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["bytes"] <= 25
+
+
+def test_clear(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"))
+    cache.put("k", "v")
+    cache.clear()
+    assert cache.get("k") is None
@@ -0,0 +1,45 @@
+import pytest
+
+from tgacode import llm, ratelimit
+from tgacode.llm_cache import LLMCache
+from tgacode.ratelimit import is_rate_limit
+
+PROMPT = "Prüfe den Nachtrag."
+
+
+def test_stream_delivers_pieces_and_timing(fake_llm):
+    timing = {}
+    pieces = list(llm.stream_with_backoff(PROMPT, timing=timing))
+    assert len(pieces) > 1
+    assert "".join(pieces).startswith("# Prüfbericht")
+    assert timing["model"] in llm.get_model_names()
+    assert 0 <= timing["ttft"] <= timing["total"]
+    assert timing["cached"] is False
+
+
+def test_stream_shares_cache_with_blocking_call(fake_llm, tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.sqlite"))
+    text = "".join(llm.stream_with_backoff(PROMPT, cache=cache))
+    requests = fake_llm.stats()["requests"]
+    timing = {}
+    assert list(llm.stream_with_backoff(PROMPT, cache=cache, timing=timing)) == [text]
+    assert timing["cached"] is True
+    assert llm.generate_with_backoff(PROMPT, cache=cache) == text
+    assert fake_llm.stats()["requests"] == requests
+
+
+def test_abandoned_stream_releases_slot(fake_llm):
+    stream = llm.stream_with_backoff(PROMPT)
+    assert next(stream)
+    assert ratelimit.get_limiter().stats()["in_flight"] == 1
+    stream.close()
+    assert ratelimit.get_limiter().stats()["in_flight"] == 0
+
+
+def test_rate_limit_before_first_token(fake_llm):
+    fake_llm.error_rate = 1.0
+    with pytest.raises(Exception) as err:
+        list(llm.stream_with_backoff(PROMPT, attempts_per_model=1))
+    assert is_rate_limit(err.value)
+    stats = ratelimit.get_limiter().stats()
+    assert stats["in_flight"] == 0 and stats["throttled"] == 2
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from tgacode import llm, metrics
+from tgacode.config import METRICS_PATH
+from tgacode.metrics import breakdown, record, span, timed_iter, trace
+
+
+def _lines():
+    with open(METRICS_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_trace_collects_spans_and_writes_jsonl():
+    with trace("pruefung", nachtrag="NT01.pdf") as tr:
+        with span("chroma.query", queries=3) as sp:
+            sp["hits"] = 9
+        record("index.embed", 0.25, chunks=40)
+    assert [s["name"] for s in tr.spans] == ["chroma.query", "index.embed"]
+    assert tr.spans[0]["hits"] == 9 and tr.spans[0]["seconds"] >= 0
+
+    lines = _lines()
+    assert [line["name"] for line in lines] == ["chroma.query", "index.embed", "trace"]
+    assert {line["trace"] for line in lines} == {tr.id}
+    assert lines[-1]["nachtrag"] == "NT01.pdf"
+
+
+def test_span_records_error_and_reraises():
+    with trace("pruefung") as tr:
+        with pytest.raises(ValueError):
+            with span("llm.generate", model="m1"):
+                raise ValueError("kein JSON")
+    assert tr.spans[0]["error"] == "ValueError"
+
+
+def test_spans_outside_trace_are_only_written():
+    record("pdf.extract", 0.1)
+    assert _lines()[0]["trace"] is None
+
+
+def test_disabled_writes_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "_enabled", True)
+    metrics.set_enabled(False)
+    with trace("pruefung") as tr:
+        record("pdf.extract", 0.1)
+    assert len(tr.spans) == 1
+    with pytest.raises(FileNotFoundError):
+        _lines()
+
+
+def test_timed_iter_sums_wait_time():
+    stats = {}
+    assert list(timed_iter(iter([1, 2, 3]), stats, "extract_seconds")) == [1, 2, 3]
+    assert stats["extract_seconds"] >= 0
+
+
+def test_breakdown_groups_by_name():
+    rows = breakdown([
+        {"name": "llm.generate", "seconds": 1.0, "tokens_in": 100, "tokens_out": 20, "model": "a"},
+        {"name": "chroma.query", "seconds": 0.1},
+        {"name": "llm.generate", "seconds": 2.0, "tokens_in": 50, "tokens_out": 10, "model": "b"},
+    ])
+    assert [r["name"] for r in rows] == ["llm.generate", "chroma.query"]
+    assert rows[0] == {"name": "llm.generate", "seconds": 3.0, "calls": 2,
+                       "tokens_in": 150, "tokens_out": 30, "models": ["a", "b"]}
+
+
+def test_llm_calls_report_model_and_tokens(fake_llm):
+    with trace("pruefung") as tr:
+        llm.generate_with_backoff("Prüfe den Nachtrag.")
+    (gen,) = [s for s in tr.spans if s["name"] == "llm.generate"]
+    assert gen["model"] in llm.get_model_names()
+    assert gen["tokens_in"] > 0 and gen["tokens_out"] > 0
@@ -0,0 +1,100 @@
+import pytest
+
+from tgacode import llm, model_health, ratelimit
+from tgacode.model_health import CLOSED, HALF_OPEN, OPEN, HealthRegistry
+from tgacode.ratelimit import RateLimiter
+
+
+def test_breaker_opens_half_opens_and_closes():
+    health = HealthRegistry()
+    for _ in range(model_health.BREAKER_THRESHOLD):
+        health.record_failure("m1")
+    assert health.order(["m1", "m2"]) == ["m2"]
+    h = health._get("m1")
+    assert h.state == OPEN and h.cooldown == model_health.BREAKER_COOLDOWN
+
+    h.opened_at -= h.cooldown  # Sperrzeit abgelaufen
+    assert health.order(["m1", "m2"]) == ["m2", "m1"]
+    assert h.state == HALF_OPEN
+    assert health.begin("m1") and not health.begin("m1")  # genau ein Probeaufruf
+
+    health.record_failure("m1")
+    assert h.state == OPEN and h.cooldown == 2 * model_health.BREAKER_COOLDOWN
+    h.opened_at -= h.cooldown
+    assert health.begin("m1")
+    health.record_success("m1", 0.5)
+    assert h.state == CLOSED and h.cooldown == 0.0
+
+
+def test_breaker_ignores_429_and_opens_on_404():
+    health = HealthRegistry()
+    for _ in range(5):
+        health.record_failure("m1", rate_limited=True)
+    assert health._get("m1").state == CLOSED
+    health.record_failure("m2", not_found=True)
+    assert health._get("m2").state == OPEN
+    assert health._get("m2").cooldown == model_health.NOT_FOUND_COOLDOWN
+
+
+def test_order_prefers_fastest_healthy_model():
+    health = HealthRegistry()
+    health.record_success("slow", 2.0)
+    health.record_success("fast", 0.3)
+    assert health.order(["unknown", "slow", "fast"]) == ["fast", "slow", "unknown"]
+
+
+def test_fake_404_opens_breaker_and_rotates(fake_llm):
+    names = llm.get_model_names()
+    fake_llm.models.remove(names[0])  # Modell verschwindet nach der Discovery
+    assert llm.generate_with_backoff("Prüfe den Nachtrag.").startswith("# Prüfbericht")
+    states = {h["name"]: h["state"] for h in model_health.get_health().snapshot()}
+    assert states == {names[0]: OPEN, names[1]: CLOSED}
+    assert llm.get_model_names() == names[1:]
+
+
+def test_not_found_is_not_mistaken_for_rate_limit_by_port(fake_llm):
+    from google.api_core import exceptions
+
+    names = llm.get_model_names()
+    llm._record_error(names[0], exceptions.NotFound(f"POST http://127.0.0.1:34429/v1beta/{names[0]}"))
+    llm._record_error(names[1], exceptions.TooManyRequests(f"POST http://127.0.0.1:38404/v1beta/{names[1]}"))
+    states = {h["name"]: h["state"] for h in model_health.get_health().snapshot()}
+    assert states == {names[0]: OPEN, names[1]: CLOSED}
+    assert llm.get_model_names() == names[1:]
+
+
+def _half_open(health, name):
+    for _ in range(model_health.BREAKER_THRESHOLD):
+        health.record_failure(name)
+    h = health._get(name)
+    h.opened_at -= h.cooldown
+    assert health.order([name]) == [name] and h.state == HALF_OPEN
+    return h
+
+
+def test_half_open_probe_released_after_unusable_answer(monkeypatch):
+    class Blocked:
+        def generate_content(self, *args, **kwargs):
+            raise ValueError("Antwort blockiert")
+
+    health = HealthRegistry()
+    monkeypatch.setattr(model_health, "_registry", health)
+    monkeypatch.setattr(ratelimit, "_limiter", RateLimiter(rpm=600))
+    monkeypatch.setattr(llm, "get_model_names", lambda: ["m1"])
+    monkeypatch.setattr(llm, "_model", lambda name: Blocked())
+    h = _half_open(health, "m1")
+    with pytest.raises(ValueError):
+        llm.generate_with_backoff("Prüfe den Nachtrag.")
+    assert h.state == HALF_OPEN and not h.trial
+    assert health.begin("m1")  # nächster Probeaufruf möglich
+
+
+def test_half_open_probe_released_after_schema_rejection(fake_llm):
+    fake_llm.reject_schema = True
+    health = model_health.get_health()
+    names = llm.get_model_names()
+    probes = [_half_open(health, name) for name in names]
+    with pytest.raises(Exception, match="response_schema"):
+        llm.generate_json_with_backoff("Fasse zusammen.", llm.summary_json_schema(), schema_only=True)
+    assert all(h.state == HALF_OPEN and not h.trial for h in probes)
+    assert all(health.begin(name) for name in names)
@@ -0,0 +1,50 @@
+import chromadb
+import pytest
+
+from tgacode import llm, pipeline
+
+
+@pytest.fixture
+def nachtrag(tmp_path, make_pdf):
+    return make_pdf(tmp_path / "NT01.pdf", ["Nachtrag 01\nPos. 1 Brandschutzklappe 2 Stk 450,00 900,00"])
+
+
+@pytest.fixture
+def collection(tmp_path):
+    return chromadb.PersistentClient(path=str(tmp_path / "chroma")).get_or_create_collection("projekt")
+
+
+def test_single_pass_uses_one_call(fake_llm, nachtrag, collection, embedder):
+    check = pipeline.run_check([nachtrag], collection, embedder, eco=True, single_pass=True)
+    assert check["mode"] == "single-pass"
+    assert check["report"].strip()
+    assert "bericht" not in check["summary"]
+    assert "empfehlung" in check["summary"]
+    assert fake_llm.stats()["requests"] == 1
+
+
+def test_two_step_uses_two_calls(fake_llm, nachtrag, collection, embedder):
+    check = pipeline.run_check([nachtrag], collection, embedder, eco=True)
+    assert check["mode"] == "zwei-schritt"
+    assert check["report"].startswith("# Prüfbericht")
+    assert "empfehlung" in check["summary"]
+    assert fake_llm.stats()["requests"] == 2
+
+
+def test_rejected_schema_falls_back_to_two_steps(fake_llm, nachtrag, collection, embedder):
+    fake_llm.reject_schema = True
+    messages = []
+    check = pipeline.run_check([nachtrag], collection, embedder, eco=True, single_pass=True,
+                               notify=messages.append)
+    assert check["mode"] == "zwei-schritt"
+    assert check["report"].startswith("# Prüfbericht")
+    assert any("Single-Pass nicht möglich" in m for m in messages)
+
+
+def test_rejected_schema_is_not_retried_on_every_model(fake_llm):
+    fake_llm.reject_schema = True
+    assert len(llm.get_model_names()) > 1
+    requests = fake_llm.stats()["requests"]
+    with pytest.raises(Exception, match="response_schema"):
+        pipeline.generate_combined("Prüfe den Nachtrag.")
+    assert fake_llm.stats()["requests"] == requests + 1
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from tgacode.pricecheck import apply_to_summary, check_prices, parse_number, parse_rates, parse_stated_total
+
+NACHTRAG = """Nachtrag 3 – Mehrleistungen Lüftung
+01.01 Montagestunden Monteur 10 Std 58,00 € 580,00 €
+01.02 Lüftungskanal verzinkt
+Menge: 12,5 m EP 40,00 € GP 500,00 €
+01.03 Regiestunden Helfer 4 h 45,00 € 190,00 €
+Gesamtsumme netto 1.270,00 €
+"""
+
+
+def test_parse_number_formats():
+    assert parse_number("1.234,56") == Decimal("1234.56")
+    assert parse_number("1,234.56") == Decimal("1234.56")
+    assert parse_number("12,5") == Decimal("12.5")
+    assert parse_number("1.234") == Decimal("1234")
+
+
+def test_stated_total_ignores_gross_lines():
+    text = "Nettosumme 580,00 €\nGesamtsumme inkl. USt. 690,20 €\n"
+    assert parse_stated_total(text) == Decimal("580.00")
+    assert parse_stated_total("Summe 580,00 €\nSumme brutto (19 % MwSt.) 690,20 €") == Decimal("580.00")
+    assert parse_stated_total("Gesamtbetrag inkl.USt 690,20 €") is None
+
+
+def test_stated_total_prefers_net_lines():
+    text = "Gesamtsumme netto zzgl. USt. 580,00 €\nAngebotssumme 690,20 €\n"
+    assert parse_stated_total(text) == Decimal("580.00")
+    assert parse_stated_total("Summe 100,00 €\nSumme 200,00 €") == Decimal("200.00")
+
+
+def test_check_prices_no_false_issue_for_gross_total():
+    result = check_prices(NACHTRAG + "Gesamtsumme inkl. USt. 1.511,30 €\n")
+    assert result["summe_angegeben"] == Decimal("1270.00")
+    assert not [i for i in result["issues"] if i.startswith("Summe lt. Nachtrag")]
+
+
+def test_parse_rates_labels():
+    rates = parse_rates("Stundensätze: Monteur 52,50 €/h, Helfer 41 €\nSonstiges 99 €\nStundensatz ist 48 €")
+    assert rates == [("Monteur", Decimal("52.50")), ("Helfer", Decimal("41")), ("", Decimal("48"))]
+
+
+def test_check_prices_recomputes_positions_and_totals():
+    result = check_prices(NACHTRAG)
+    assert [p["oz"] for p in result["positions"]] == ["01.01", "01.02", "01.03"]
+    gp_issue = [i for i in result["issues"] if i.startswith("01.03")]
+    assert gp_issue == ["01.03: GP 190,00 ≠ Menge × EP 180,00"]
+    assert result["summe_angegeben"] == Decimal("1270.00")
+    assert result["summe_nachgerechnet"] == Decimal("1260.00")
+    assert result["summe_korrigiert"] == Decimal("1260.00")
+
+
+def test_check_prices_caps_hourly_rates_by_label():
+    result = check_prices(NACHTRAG, "Stundensätze: Monteur 52,00 €/h, Helfer 41,00 €/h")
+    by_oz = {p["oz"]: p for p in result["positions"]}
+    assert by_oz["01.01"]["ep_korr"] == Decimal("52.00")
+    assert by_oz["01.03"]["ep_korr"] == Decimal("41.00")
+    assert by_oz["01.02"]["ep_korr"] == Decimal("40.00")  # keine Stundenposition
+    assert result["summe_korrigiert"] == Decimal("520.00") + Decimal("500.00") + Decimal("164.00")
+
+
+def test_qualified_rate_does_not_cap_unrelated_position():
+    result = check_prices(NACHTRAG, "Stundensatz Monteur 50 €")
+    helfer = result["positions"][2]
+    assert helfer["ep_korr"] == helfer["ep"]
+    assert "Stundensatz nicht eindeutig zuzuordnen" in helfer["notes"]
+
+
+def test_unqualified_rate_applies_to_all_hourly_positions():
+    result = check_prices(NACHTRAG, "Stundensatz ist 48 €")
+    assert [p["ep_korr"] for p in result["positions"]] == [Decimal("48"), Decimal("40.00"), Decimal("45.00")]
+
+
+def test_overrides_replace_rates_last_one_wins():
+    result = check_prices(NACHTRAG, "Stundensatz Monteur 50 €", "Stundensatz Monteur 55 €\nStundensatz Monteur 54 €")
+    assert result["positions"][0]["ep_korr"] == Decimal("54")
+    assert result["rates"] == [("Monteur", Decimal("54"))]
+
+
+def test_apply_to_summary_uses_local_total():
+    summary = apply_to_summary({"gesamtsumme_korrigiert": "KI-Wert"}, check_prices(NACHTRAG))
+    assert summary["gesamtsumme_korrigiert"] == "1.260,00 €"
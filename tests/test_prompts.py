@@ -0,0 +1,62 @@
+from tgacode.prompts import (
+    CHARS_PER_TOKEN, TRUNCATION_NOTE, Section, allocate, build_prompt, count_tokens, prompt_budget,
+    truncate_to_tokens,
+)
+
+
+def _text(tokens):
+    return "x" * int(tokens * CHARS_PER_TOKEN)
+
+
+def test_allocate_reserves_minimums_by_priority():
+    sections = [
+        Section("nachtrag", _text(500), priority=1, min_tokens=300),
+        Section("stammdaten", _text(100), priority=0, min_tokens=100),
+        Section("recherche", _text(800), priority=2, min_tokens=200),
+    ]
+    alloc, need = allocate(sections, 450)
+    assert need == {"nachtrag": 500, "stammdaten": 100, "recherche": 800}
+    assert alloc == {"stammdaten": 100, "nachtrag": 300, "recherche": 50}
+
+
+def test_allocate_fills_rest_by_priority_up_to_caps():
+    sections = [
+        Section("nachtrag", _text(500), priority=1, min_tokens=100, max_tokens=400),
+        Section("recherche", _text(800), priority=2, min_tokens=100),
+    ]
+    alloc, _ = allocate(sections, 1000)
+    assert alloc == {"nachtrag": 400, "recherche": 600}
+    alloc, _ = allocate(sections, 5000)
+    assert alloc == {"nachtrag": 400, "recherche": 800}  # nie über den Bedarf
+
+
+def test_truncate_keeps_head_and_tail():
+    text = "Anfang " + "Mitte " * 500 + "Gesamtsumme 1.234,00 €"
+    short = truncate_to_tokens(text, 50)
+    assert short.startswith("Anfang") and short.endswith("1.234,00 €")
+    assert TRUNCATION_NOTE in short
+    assert count_tokens(short) <= 50
+    assert truncate_to_tokens("kurz", 50) == "kurz"
+
+
+def test_build_prompt_respects_budget():
+    template = "Stammdaten:\n{stammdaten}\n\nNachtrag:\n{nachtrag}\n"
+    sections = [Section("stammdaten", _text(50), priority=0), Section("nachtrag", _text(5000), priority=1)]
+    prompt, usage = build_prompt(template, sections, 1000)
+    assert usage["tokens"] <= 1000 + 2
+    assert usage["sections"]["stammdaten"]["tokens"] == 50
+    assert usage["sections"]["nachtrag"]["need"] == 5000
+    assert prompt.startswith("Stammdaten:\n" + _text(50))
+
+
+def test_prompt_budget_respects_model_limit():
+    assert prompt_budget(12_000, 2_000, 1_000_000) == 12_000
+    assert prompt_budget(12_000, 2_000, 8_000) == 8_000 - 2_000 - 256
+    assert prompt_budget(12_000, 9_000, 8_000) == 0
+
+
+def test_budget_and_rate_limiter_share_estimator():
+    from tgacode import llm, prompts, ratelimit
+
+    assert prompts.count_tokens is ratelimit.count_tokens is llm.count_tokens
+    assert count_tokens(_text(100)) == 100
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from tgacode import llm, model_health, ratelimit
+from tgacode.model_health import CLOSED
+from tgacode.ratelimit import RateLimiter, is_rate_limit, retry_after_seconds
+
+
+class _Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class _ApiError(Exception):
+    def __init__(self, message, headers=None):
+        super().__init__(message)
+        self.response = _Response(headers or {})
+
+
+def test_retry_after_from_header_and_message():
+    assert retry_after_seconds(_ApiError("429 Too Many Requests", {"Retry-After": "7"})) == 7.0
+    assert retry_after_seconds(_ApiError("429 quota exceeded. Please retry in 2.5s.")) == 2.5
+    assert retry_after_seconds(_ApiError("429 retry_delay { seconds: 31 }")) == 31.0
+    assert retry_after_seconds(_ApiError("429 Resource has been exhausted")) is None
+
+
+def test_is_rate_limit():
+    assert is_rate_limit(_ApiError("Resource has been exhausted (e.g. check quota)."))
+    assert is_rate_limit(_ApiError("RESOURCE_EXHAUSTED"))
+    assert not is_rate_limit(_ApiError("404 model not found"))
+
+
+def test_is_rate_limit_ignores_numbers_in_url():
+    from google.api_core import exceptions
+
+    url = "POST http://127.0.0.1:34429/v1beta/models/gemini-fake-flash:generateContent"
+    assert not is_rate_limit(exceptions.NotFound(url))
+    assert not is_rate_limit(_ApiError(f"404 {url}: model not found"))
+    assert is_rate_limit(exceptions.TooManyRequests(url.replace("34429", "38404")))
+
+
+def test_aimd_halves_on_429_and_grows_on_success():
+    limiter = RateLimiter(rpm=600, max_concurrency=4)
+    for expected in (2, 1, 1):
+        limiter.acquire()
+        limiter.release(rate_limited=True, retry_after=0.0)
+        assert limiter.limit == expected
+    # +1 nach so vielen Erfolgen in Folge, wie das Limit gerade beträgt
+    for expected in (2, 2, 3, 3, 3, 4):
+        limiter.blocked_until = 0.0
+        limiter.acquire()
+        limiter.release()
+        assert limiter.limit == expected
+    assert limiter.stats()["throttled"] == 3
+
+
+def test_retry_after_blocks_all_callers():
+    limiter = RateLimiter(rpm=600, max_concurrency=4)
+    with pytest.raises(_ApiError):
+        with limiter.slot():
+            raise _ApiError("429 Please retry in 0.2s.")
+    blocked = limiter.stats()["blocked_for"]
+    assert 0.1 < blocked <= 0.2 + 0.12  # Hinweis plus Jitter
+    t0 = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - t0 >= blocked - 0.05
+    limiter.release()
+
+
+def test_non_rate_limit_error_keeps_limit():
+    limiter = RateLimiter(rpm=600, max_concurrency=2)
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("kein JSON")
+    assert limiter.stats()["limit"] == 2
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_fake_429_throttles_limiter_not_breaker(fake_llm):
+    fake_llm.error_rate = 1.0
+    with pytest.raises(Exception) as err:
+        llm.generate_with_backoff("Prüfe den Nachtrag.", attempts_per_model=2)
+    assert is_rate_limit(err.value)
+    assert retry_after_seconds(err.value) == pytest.approx(0.1)  # Retry-After des Servers (gerundet)
+    stats = ratelimit.get_limiter().stats()
+    assert stats["throttled"] == 4 and stats["limit"] == 1
+    assert {h["state"] for h in model_health.get_health().snapshot()} == {CLOSED}
+
+    fake_llm.error_rate = 0.0
+    assert llm.generate_with_backoff("Prüfe den Nachtrag.").startswith("# Prüfbericht")
+    assert ratelimit.get_limiter().stats()["limit"] == 2
@@ -0,0 +1,69 @@
+from tgacode.report_sections import (
+    affected_sections, join_report, merge_sections, section_fields, section_keys, split_report,
+)
+
+REPORT = """# Prüfbericht Nachtrag 3
+
+## Zusammenfassung
+Der Nachtrag ist dem Grunde nach berechtigt.
+
+## VOB/B-Konformitäts-Check
+Anordnung nach § 1 Abs. 4 VOB/B liegt vor.
+
+### Fristen
+Anzeige rechtzeitig.
+
+## Technische Prüfung & Preis-Check
+Stundensatz 58,00 € liegt über dem vereinbarten Satz.
+
+**Empfehlung & Nächste Schritte**
+Freigabe mit Kürzung auf 1.260,00 €.
+"""
+
+
+def test_split_report_keys_and_roundtrip():
+    sections = split_report(REPORT)
+    assert [s["key"] for s in sections] == [None, "zusammenfassung", "vob", "technik_preis", "empfehlung"]
+    assert "### Fristen" in sections[2]["text"]  # Unterüberschrift bleibt im Abschnitt
+    assert join_report(sections) == REPORT
+
+
+def test_split_report_repeated_heading_stays_in_section():
+    sections = split_report("## Zusammenfassung\nA\n## VOB\nB\n## Zusammenfassung\nC\n")
+    assert section_keys(sections) == ["zusammenfassung", "vob"]
+    assert sections[1]["text"].endswith("## Zusammenfassung\nC\n")
+
+
+def test_affected_sections_by_keyword():
+    sections = split_report(REPORT)
+    assert affected_sections("Die Anordnung kam schriftlich, siehe Bautagebuch.", sections) == ["vob"]
+    # Preisänderungen ziehen Abschnitte mit Beträgen nach
+    assert affected_sections("Der Stundensatz ist 52 €.", sections) == ["technik_preis", "empfehlung"]
+
+
+def test_affected_sections_fallbacks():
+    sections = split_report(REPORT)
+    assert affected_sections("Bitte nochmal ansehen.", sections) == section_keys(sections)
+    assert affected_sections("Preis falsch", split_report("Nur Fließtext ohne Gliederung.")) is None
+
+
+def test_section_fields():
+    assert section_fields(["vob", "empfehlung"]) == ["vob_check", "empfehlung", "naechste_schritte"]
+
+
+def test_merge_sections_replaces_only_revised():
+    sections = split_report(REPORT)
+    revised = "## VOB/B-Konformitäts-Check\nAnordnung schriftlich belegt.\n"
+    merged, replaced = merge_sections(sections, ["vob", "technik_preis"], revised)
+    assert replaced == ["vob"]
+    assert merged[2]["text"] == revised + "\n"
+    assert [s["text"] for i, s in enumerate(merged) if i != 2] == [s["text"] for i, s in enumerate(sections) if i != 2]
+
+
+def test_merge_sections_plain_answer_for_single_section():
+    sections = split_report(REPORT)
+    merged, replaced = merge_sections(sections, ["zusammenfassung"], "Neu bewertet.")
+    assert replaced == ["zusammenfassung"]
+    assert merged[1]["text"] == "## Zusammenfassung\nNeu bewertet.\n\n"
+    _, replaced = merge_sections(sections, ["zusammenfassung", "vob"], "Neu bewertet.")
+    assert replaced == []
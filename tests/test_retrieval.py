@@ -0,0 +1,52 @@
+from tgacode.retrieval import format_context, retrieve_for_questions
+
+
+class RecordingCollection:
+    """Chroma-Attrappe: merkt sich die Abfragen, liefert feste Treffer je Frage."""
+
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def query(self, query_embeddings, n_results, include):
+        self.queries.append((len(query_embeddings), n_results))
+        rows = [self.results[i] for i in range(len(query_embeddings))]
+        return {
+            "ids": [[cid for cid, _ in row] for row in rows],
+            "documents": [[f"Text {cid}" for cid, _ in row] for row in rows],
+            "metadatas": [[{"source": f"{cid}.pdf", "page_start": 1, "page_end": 1} for cid, _ in row] for row in rows],
+            "distances": [[dist for _, dist in row] for row in rows],
+        }
+
+
+def test_one_query_for_all_questions(embedder):
+    col = RecordingCollection([[("a", 0.5), ("b", 0.7)], [("c", 0.2)], [("d", 0.9)]])
+    hits = retrieve_for_questions(col, embedder, ["F1?", "F2?", "F3?"], n_results=2)
+    assert col.queries == [(3, 2)]
+    assert embedder.batches == [3]
+    assert [h["id"] for h in hits] == ["a", "b", "c", "d"]
+
+
+def test_shared_chunks_are_merged(embedder):
+    col = RecordingCollection([[("a", 0.5), ("b", 0.7)], [("b", 0.3), ("c", 0.4)]])
+    hits = {h["id"]: h for h in retrieve_for_questions(col, embedder, ["F1?", "F2?"])}
+    assert len(hits) == 3
+    assert hits["b"]["questions"] == [0, 1]
+    assert hits["b"]["distance"] == 0.3
+
+
+def test_no_questions_no_query(embedder):
+    col = RecordingCollection([])
+    assert retrieve_for_questions(col, embedder, []) == []
+    assert col.queries == [] and embedder.batches == []
+
+
+def test_format_context_lists_each_chunk_once(embedder):
+    col = RecordingCollection([[("a", 0.5)], [("a", 0.4)]])
+    questions = ["Brandschutz?", "Wartung?"]
+    text = format_context(retrieve_for_questions(col, embedder, questions), questions)
+    assert "F1: Brandschutz?\nF2: Wartung?" in text
+    assert text.count("Text a") == 1
+    assert "relevant für F1, F2" in text
+    assert "a.pdf" in text
+    assert format_context([]) == ""
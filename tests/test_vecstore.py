@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from tgacode.chunkstore import ChunkStore
+from tgacode.indexing import collection_name, index_project, load_manifest
+from tgacode.vecstore import ROW_BLOCK, load_store, sync_store, write_refs, write_store
+
+
+def _data(n=ROW_BLOCK + 1500, dim=32, queries=6, seed=0):
+    # Mehr Zeilen als ROW_BLOCK: die Abfrage läuft über mehrere Zeilenblöcke
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32), rng.normal(size=(queries, dim)).astype(np.float32)
+
+
+def _brute_force(vecs, queries, k):
+    dist = ((queries[:, None, :] - vecs[None, :, :]) ** 2).sum(axis=2)
+    top = np.argsort(dist, axis=1, kind="stable")[:, :k]
+    return top, np.take_along_axis(dist, top, axis=1)
+
+
+def _write(tmp_path, vecs, dtype):
+    ids = [f"c{i}" for i in range(len(vecs))]
+    write_store(str(tmp_path), ids, vecs, [f"Text {i}" for i in ids], [{"n": i} for i in range(len(vecs))],
+                "stamp", dtype=dtype)
+    return load_store(str(tmp_path))
+
+
+def test_float16_query_matches_brute_force(tmp_path):
+    vecs, queries = _data()
+    store = _write(tmp_path, vecs, "float16")
+    res = store.query(queries, n_results=10)
+    top, dist = _brute_force(vecs, queries, 10)
+    assert res["ids"] == [[f"c{i}" for i in row] for row in top]
+    assert np.allclose(res["distances"], dist, rtol=1e-2)
+    assert res["documents"][0][0] == f"Text c{top[0][0]}"
+    assert res["metadatas"][0][0] == {"n": int(top[0][0])}
+
+
+def test_int8_query_recall(tmp_path):
+    vecs, queries = _data()
+    store = _write(tmp_path, vecs, "int8")
+    res = store.query(queries, n_results=10, include=["distances"])
+    top, dist = _brute_force(vecs, queries, 10)
+    found = sum(len(set(r) & {f"c{i}" for i in row}) for r, row in zip(res["ids"], top))
+    assert found / top.size >= 0.9
+    assert np.allclose(res["distances"], dist, rtol=5e-2)
+    assert set(res) == {"ids", "distances"}
+
+
+def test_query_small_store_and_get(tmp_path):
+    vecs, queries = _data(n=3)
+    store = _write(tmp_path, vecs, "float16")
+    res = store.query(queries[:1], n_results=10)
+    assert sorted(res["ids"][0]) == ["c0", "c1", "c2"]
+    assert store.get(ids=["c2", "fehlt"])["documents"] == ["Text c2"]
+    assert store.count() == 3
+
+
+def test_sync_store_follows_manifest(tmp_path, make_pdf, embedder):
+    import chromadb
+
+    project = tmp_path / "Projekt"
+    project.mkdir()
+    make_pdf(project / "LV.pdf", [" ".join(f"lv{i}" for i in range(900))])
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    index_project(str(project), "p1", embedder, client)
+    col = client.get_or_create_collection(collection_name("p1"))
+    idx = str(tmp_path / "idx")
+
+    assert sync_store(idx, col, load_manifest(str(project)), dtype="float16")
+    assert not sync_store(idx, col, load_manifest(str(project)), dtype="float16")  # Stand unverändert
+    store = load_store(idx)
+    assert store.count() == col.count()
+    query = embedder.encode(["lv1 lv2 lv3"])
+    assert store.query(query, n_results=2)["ids"] == col.query(query_embeddings=query.tolist(), n_results=2)["ids"]
+
+    make_pdf(project / "Nachtrag.pdf", ["Nachtrag 1"])
+    index_project(str(project), "p1", embedder, client)
+    assert sync_store(idx, col, load_manifest(str(project)), dtype="float16")
+    assert load_store(idx).count() == col.count()
+    assert not sync_store(idx, col, load_manifest(str(project)), max_chunks=1)
+    assert load_store(idx) is None
+
+
+def test_refs_store_spans_chunk_store_entries(tmp_path):
+    vecs, queries = _data(n=ROW_BLOCK + 10)
+    chunks = ChunkStore(str(tmp_path / "chunks"))
+    parts = {"a.pdf": vecs[:100], "b.pdf": vecs[100:]}
+    files = {}
+    for name, part in parts.items():
+        chunks.put(name, [f"{name} {i}" for i in range(len(part))], [(1, 1)] * len(part), part)
+        files[name] = {"chunk_key": name, "chunk_ids": [f"{name}_{i}" for i in range(len(part))]}
+    write_refs(str(tmp_path / "idx"), files, "stamp")
+    store = load_store(str(tmp_path / "idx"), chunks)
+    assert store.count() == len(vecs)
+    res = store.query(queries, n_results=5)
+    top, _ = _brute_force(vecs, queries, 5)
+    names = [f"a.pdf_{i}" if i < 100 else f"b.pdf_{i - 100}" for i in range(len(vecs))]
+    assert res["ids"] == [[names[i] for i in row] for row in top]
+    assert res["metadatas"][0][0]["source"] == res["ids"][0][0].split("_")[0]
+
+
+def test_load_store_missing_and_bad_dtype(tmp_path):
+    assert load_store(str(tmp_path)) is None
+    write_refs(str(tmp_path), {}, "stamp")
+    assert load_store(str(tmp_path)) is None  # Verweise ohne Chunk-Speicher
+    with pytest.raises(ValueError):
+        write_store(str(tmp_path), ["x"], [[1.0]], ["t"], [{}], "s", dtype="int4")
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from tgacode.indexing import collection_name, index_project
+from tgacode.vectorstore import (
+    STATUS_EMPTY,
+    STATUS_MISSING,
+    STATUS_OK,
+    STATUS_OUTDATED,
+    index_status,
+    open_project_store,
+    scan_vault_status,
+)
+
+
+@pytest.fixture
+def project(tmp_path, make_pdf):
+    path = tmp_path / "vault" / "Firma" / "Projekt"
+    path.mkdir(parents=True)
+    make_pdf(path / "LV.pdf", [" ".join(f"wort{i}" for i in range(40))])
+    return str(path)
+
+
+def test_index_survives_reopen(project, embedder):
+    stats = index_project(project, "p1", embedder, open_project_store(project))
+    # Neuer Client = neuer Prozess: Chunks kommen von der Platte, nichts wird neu eingebettet
+    client = open_project_store(project)
+    assert client.get_or_create_collection(collection_name("p1")).count() == stats["chunks"]
+    embedder.texts.clear()
+    assert index_project(project, "p1", embedder, client)["skipped"] == 1
+    assert embedder.texts == []
+
+
+def test_status_follows_project_files(project, embedder, make_pdf):
+    assert index_status(project)["state"] == STATUS_MISSING
+    client = open_project_store(project)
+    index_project(project, "p1", embedder, client)
+    assert index_status(project, "p1", client)["state"] == STATUS_OK
+
+    make_pdf(os.path.join(project, "Nachtrag.pdf"), ["Nachtrag 1"])
+    status = index_status(project, "p1", client)
+    assert (status["state"], status["new"]) == (STATUS_OUTDATED, 1)
+
+    os.remove(os.path.join(project, "Nachtrag.pdf"))
+    os.remove(os.path.join(project, "LV.pdf"))
+    status = index_status(project, "p1", client)
+    assert (status["state"], status["removed"]) == (STATUS_OUTDATED, 1)
+
+
+def test_other_embedding_model_is_outdated(project, embedder):
+    client = open_project_store(project)
+    index_project(project, "p1", embedder, client)
+    assert index_status(project, "p1", client, model_name="anderes-modell")["state"] == STATUS_OUTDATED
+
+
+def test_scan_vault_status(tmp_path, project):
+    (tmp_path / "vault" / "Firma" / "Leer").mkdir()
+    result = scan_vault_status(str(tmp_path / "vault"))
+    assert result[("Firma", "Projekt")]["state"] == STATUS_MISSING
+    assert result[("Firma", "Leer")]["state"] == STATUS_EMPTY
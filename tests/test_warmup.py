@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from tgacode.warmup import Warmup
+
+
+def test_result_waits_for_background_task():
+    gate = threading.Event()
+    warm = Warmup()
+    warm.start("embedder", lambda: gate.wait(5) and "modell")
+    assert warm.pending() == ["embedder"] and not warm.ready("embedder")
+    gate.set()
+    assert warm.result("embedder", timeout=5) == "modell"
+    assert warm.ready("embedder") and warm.pending() == []
+    assert warm.stats()["embedder"]["seconds"] >= 0
+
+
+def test_each_task_starts_once():
+    calls = []
+    warm = Warmup()
+    warm.start("liste", calls.append, 1)
+    warm.start("liste", calls.append, 2)
+    warm.result("liste", timeout=5)
+    assert calls == [1]
+
+
+def test_errors_are_raised_on_result():
+    def fail():
+        raise RuntimeError("kein API-Key")
+
+    warm = Warmup()
+    warm.start("llm", fail)
+    with pytest.raises(RuntimeError, match="kein API-Key"):
+        warm.result("llm", timeout=5)
+    assert isinstance(warm.stats()["llm"]["error"], RuntimeError)
+
+
+def test_timeout():
+    gate = threading.Event()
+    warm = Warmup()
+    warm.start("langsam", gate.wait, 5)
+    with pytest.raises(TimeoutError):
+        warm.result("langsam", timeout=0.01)
+    gate.set()
+
+
+def test_heavy_libraries_are_imported_lazily():
+    code = (
+        "import sys\n"
+        "import tgacode.llm, tgacode.vectorstore, tgacode.warmup\n"
+        "import tgacode.llm as llm\n"
+        "llm.configure('key')\n"
+        "heavy = ('google.generativeai', 'chromadb', 'sentence_transformers')\n"
+        "print(sorted(m for m in heavy if m in sys.modules))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1 @@
+"""der TGAcode – Kernlogik ohne Streamlit-UI (Indexierung, Retrieval, KI-Aufrufe)."""
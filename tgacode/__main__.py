@@ -0,0 +1,9 @@
+# ==============================================================================
+# python -m tgacode → Stapelverarbeitung (siehe tgacode.cli)
+# ==============================================================================
+
+import sys
+
+from tgacode.cli import main
+
+sys.exit(main())
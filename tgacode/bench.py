@@ -0,0 +1,589 @@
+# ==============================================================================
+# Reproduzierbarer Benchmark (synthetische TGA-Akte + Fake-Gemini)
+# - Erzeugt Projekt-PDFs (LV-Positionen) und Nachträge mit festem Seed
+# - Misst read_pdf-Durchsatz, index_project (Chunks/s), Retrieval-Latenz
+#   (Perzentile), End-to-End-Prüfung über tgacode.fake_gemini und Spitzen-RSS
+# - Erneut eingereichte Nachträge (2. Fassung, eine Menge geändert) mit Prüfhistorie
+# - Ergebnisse als JSON (mit Commit) → Vergleich zwischen Ständen
+#
+# Start:      python -m tgacode.bench --docs 20 --pages 30 --nachtraege 10
+# Ohne torch: python -m tgacode.bench --embedder stub
+# Vergleich:  python -m tgacode.bench --compare bench_results/alt.json bench_results/neu.json
+# ==============================================================================
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import platform
+import argparse
+import tempfile
+import subprocess
+import threading
+
+from tgacode.metrics import percentiles
+
+RESULTS_DIR = "bench_results"
+
+_GEWERKE = {
+    "Heizung": ["Plattenheizkörper Typ 22", "Heizkreisverteiler", "Umwälzpumpe", "Thermostatventil",
+                "Pufferspeicher 800 l", "Fußbodenheizung Systemplatte", "Wärmepumpe Luft/Wasser"],
+    "Lüftung": ["Lüftungsgerät mit WRG", "Wickelfalzrohr DN 250", "Brandschutzklappe", "Tellerventil",
+                "Schalldämpfer", "Volumenstromregler", "Außenluftgitter"],
+    "Sanitär": ["Waschtisch", "WC-Vorwandelement", "Edelstahlrohr 28 mm", "Rohrdämmung 100 %",
+                "Trinkwasserspeicher", "Hebeanlage", "Absperrarmatur DN 50"],
+    "Elektro": ["Unterverteilung", "Kabel NYM-J 5x2,5", "Kabeltrasse 300 mm", "LED-Einbauleuchte",
+                "Fehlerstromschutzschalter", "Potentialausgleich", "Steckdose Schuko"],
+}
+_EINHEITEN = ["Stk", "m", "m²", "psch", "h"]
+_FLOSKELN = [
+    "liefern und fachgerecht montieren, inkl. Befestigungsmaterial.",
+    "gemäß DIN EN 12828 und Herstellervorgaben, betriebsfertig.",
+    "Abrechnung nach Aufmaß, Nebenleistungen nach VOB/C DIN 18380.",
+    "einschließlich Prüfung, Inbetriebnahme und Dokumentation.",
+    "Ausführung nach Abstimmung mit der Bauleitung, Stundenlohn nach Nachweis.",
+]
+
+
+# ------------------------------------------------------------------------------
+# Synthetischer Korpus
+# ------------------------------------------------------------------------------
+
+def write_pdf(path, pages):
+    """Minimaler PDF-Schreiber (Helvetica, eine Zeile je Textzeile) – ohne Zusatzpakete."""
+    objs = []
+
+    def add(data):
+        objs.append(data)
+        return len(objs)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = len(objs) + 1 + 2 * len(pages)
+    page_ids = []
+    for text in pages:
+        lines = []
+        for line in text.split("\n"):
+            raw = line.encode("cp1252", "replace")
+            lines.append(b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b") Tj T*")
+        stream = b"BT /F1 9 Tf 40 800 Td 11 TL " + b" ".join(lines) + b" ET"
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R"
+            b" /Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font)
+        ))
+    add(b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids) + b"] /Count %d >>" % len(page_ids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def _position(rng, nr):
+    gewerk = rng.choice(list(_GEWERKE))
+    item = rng.choice(_GEWERKE[gewerk])
+    menge = rng.randint(1, 250)
+    ep = round(rng.uniform(5, 4000), 2)
+    return [
+        f"Pos. {nr // 100:02d}.{nr % 100:02d}.{rng.randint(1, 99) * 10:04d} {gewerk}: {item}",
+        f"  {rng.choice(_FLOSKELN)}",
+        f"  Menge {menge} {rng.choice(_EINHEITEN)}  EP {ep:,.2f} EUR  GP {menge * ep:,.2f} EUR",
+    ]
+
+
+def synth_page(rng, page_no, lines=60):
+    out = [f"Leistungsverzeichnis – Seite {page_no}"]
+    nr = page_no * 10
+    while len(out) < lines:
+        out.extend(_position(rng, nr))
+        nr += 1
+    return "\n".join(out[:lines])
+
+
+def synth_nachtrag(rng, idx, pages=2):
+    head = [
+        f"Nachtrag Nr. {idx:03d} – Mehrkosten infolge geänderter Ausführung",
+        "Begründung: Anordnung des AG gemäß § 2 Abs. 5 VOB/B, Bauzeitverlängerung angezeigt.",
+    ]
+    body = [synth_page(rng, 900 + idx * pages + p, lines=40) for p in range(pages)]
+    body[0] = "\n".join(head) + "\n" + body[0]
+    body[-1] += f"\nSumme Nachtrag netto {rng.uniform(1_000, 90_000):,.2f} EUR"
+    return body
+
+
+def revise_nachtrag(rng, pages):
+    """Erneut eingereichte Fassung: geänderte Kopfzeile und eine geänderte Menge."""
+    pages = [p.split("\n") for p in pages]
+    pages[0][0] += " (2. Fassung)"
+    rows = [(pi, li) for pi, lines in enumerate(pages) for li, line in enumerate(lines)
+            if line.lstrip().startswith("Menge ")]
+    pi, li = rng.choice(rows)
+    pages[pi][li] = re.sub(r"Menge (\d+)", lambda m: f"Menge {int(m.group(1)) + 1}", pages[pi][li], count=1)
+    return ["\n".join(lines) for lines in pages]
+
+
+def build_corpus(root, docs, pages, nachtraege, nt_pages, seed):
+    """
+    Legt VAULT/Bench GmbH/Projekt <seed> mit `docs` PDFs sowie die Nachträge an;
+    je Nachtrag zusätzlich eine geänderte 2. Fassung (nachtraege_v2/).
+    """
+    rng = random.Random(seed)
+    firma, projekt = "Bench GmbH", f"Projekt {seed}"
+    p_path = os.path.join(root, "vault_tgacode", firma, projekt)
+    nt_dir = os.path.join(root, "nachtraege")
+    v2_dir = os.path.join(root, "nachtraege_v2")
+    os.makedirs(p_path, exist_ok=True)
+    os.makedirs(nt_dir, exist_ok=True)
+    os.makedirs(v2_dir, exist_ok=True)
+    for d in range(docs):
+        write_pdf(os.path.join(p_path, f"LV_{d:03d}.pdf"), [synth_page(rng, d * pages + p + 1) for p in range(pages)])
+    nts, revised = [], []
+    for n in range(nachtraege):
+        path = os.path.join(nt_dir, f"NT_{n:03d}.pdf")
+        nt_pages_text = synth_nachtrag(rng, n, nt_pages)
+        write_pdf(path, nt_pages_text)
+        nts.append(path)
+        path = os.path.join(v2_dir, f"NT_{n:03d}.pdf")
+        write_pdf(path, revise_nachtrag(rng, nt_pages_text))
+        revised.append(path)
+    return firma, projekt, p_path, nts, revised
+
+
+# ------------------------------------------------------------------------------
+# Messhilfen
+# ------------------------------------------------------------------------------
+
+class HashEmbedder:
+    """
+    Deterministischer Ersatz für den SentenceTransformer (misst die Pipeline ohne Modell).
+    call_seconds/text_seconds simulieren die Rechenzeit eines Modells, das nur
+    einen Aufruf gleichzeitig bearbeitet.
+    """
+
+    dim = 384
+
+    def __init__(self, call_seconds=0.0, text_seconds=0.0):
+        self.call_seconds = call_seconds
+        self.text_seconds = text_seconds
+        self._lock = threading.Lock()
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True, show_progress_bar=False):
+        import numpy as np
+
+        single = isinstance(texts, str)
+        if self.call_seconds or self.text_seconds:
+            with self._lock:
+                time.sleep(self.call_seconds + self.text_seconds * (1 if single else len(texts)))
+        rows = []
+        for text in [texts] if single else texts:
+            digest = hashlib.sha256(text.encode("utf-8")).digest() * (self.dim // 32)
+            rows.append(np.frombuffer(digest, dtype=np.uint8).astype("float32") / 255.0)
+        vecs = np.stack(rows) if rows else np.zeros((0, self.dim), dtype="float32")
+        return vecs[0] if single else vecs
+
+
+def peak_rss_mb():
+    """Spitzen-RSS des Prozesses und seiner beendeten Kindprozesse (Linux/macOS)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    per_mb = 1024 * 1024 if sys.platform == "darwin" else 1024  # macOS: Bytes, Linux: KiB
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / per_mb
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / per_mb
+    return {"self": round(own, 1), "children": round(children, 1)}
+
+
+def git_commit(path):
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path,
+                             capture_output=True, text=True, timeout=10)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=path,
+                               capture_output=True, text=True, timeout=30).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "") if out.returncode == 0 else None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ------------------------------------------------------------------------------
+# Phasen
+# ------------------------------------------------------------------------------
+
+def bench_read_pdf(paths):
+    """Kalt (leerer Seiten-Cache) und warm (aus dem Cache)."""
+    from tgacode.extraction import read_pdf
+
+    size = sum(os.path.getsize(p) for p in paths)
+    result = {"files": len(paths), "mb": round(size / 1e6, 2)}
+    for label in ("cold", "warm"):
+        t0 = time.perf_counter()
+        chars = sum(len(read_pdf(p)) for p in paths)
+        dt = time.perf_counter() - t0
+        result[label] = {"seconds": round(dt, 3), "mb_per_sec": round(size / 1e6 / dt, 2),
+                         "chars": chars}
+    return result
+
+
+def bench_index(p_path, p_id, embedder, model_name, batch_size, workers):
+    from tgacode.indexing import index_project
+    from tgacode.vectorstore import open_project_store
+
+    client = open_project_store(p_path)
+    stats = index_project(p_path, p_id, embedder, client, model_name=model_name,
+                          batch_size=batch_size, workers=workers)
+    rerun = index_project(p_path, p_id, embedder, client, model_name=model_name,
+                          batch_size=batch_size, workers=workers)
+
+    # Dieselben Dokumente in einem zweiten Projekt: kommen aus dem Chunk-Speicher
+    import shutil
+
+    copy_path = p_path + "_Kopie"
+    shutil.copytree(p_path, copy_path, ignore=shutil.ignore_patterns("_*"))
+    copy = index_project(copy_path, p_id + "_Kopie", embedder, open_project_store(copy_path),
+                         model_name=model_name, batch_size=batch_size, workers=workers)
+    shutil.rmtree(copy_path, ignore_errors=True)
+    return client, {
+        "chunks": stats["chunks"],
+        "seconds": round(stats["seconds"], 3),
+        "chunks_per_sec": round(stats["chunks_per_sec"], 1),
+        "embed_seconds": round(stats["embed_seconds"], 3),
+        "batch_size": stats["batch_size"],
+        "workers": stats["workers"],
+        "noop_seconds": round(rerun["seconds"], 3),  # zweiter Lauf: alles übersprungen
+        "shared_copy_seconds": round(copy["seconds"], 3),  # zweites Projekt, gleiche Dokumente
+        "shared_copy_embedded": copy["chunks"],
+        "shared_copy_reused": copy["reused_chunks"],
+    }
+
+
+def bench_retrieval(collection, embedder, queries, seed, lexical=None):
+    from tgacode.retrieval import retrieve_for_questions
+
+    rng = random.Random(seed + 1)
+    latencies = []
+    hybrid = []
+    lookups = []
+    for _ in range(queries):
+        questions = [
+            f"Welche Vereinbarung gilt für {rng.choice(items)}?"
+            for items in rng.sample(list(_GEWERKE.values()), k=rng.randint(3, 4))
+        ]
+        t0 = time.perf_counter()
+        retrieve_for_questions(collection, embedder, questions, n_results=3)
+        latencies.append(time.perf_counter() - t0)
+        if lexical is not None:
+            t0 = time.perf_counter()
+            retrieve_for_questions(collection, embedder, questions, n_results=3, lexical=lexical)
+            hybrid.append(time.perf_counter() - t0)
+            oz = f"{rng.randint(1, 9)}.{rng.randint(1, 9)}.{rng.randint(10, 90)}"
+            t0 = time.perf_counter()
+            lexical.lookup(oz)
+            lookups.append(time.perf_counter() - t0)
+    result = {"queries": queries, "seconds": percentiles(latencies)}
+    if lexical is not None:
+        result["hybrid_seconds"] = percentiles(hybrid)
+        result["lookup_seconds"] = percentiles(lookups, digits=7)
+        result["lexical_terms"] = len(lexical.postings)
+    return result
+
+
+def bench_embed_service(embedder, clients, per_client, seed):
+    """
+    Gleichzeitige Einzelanfragen (wie mehrere Sitzungen): direkt am Modell gegen
+    den Micro-Batching-Dienst. Latenz je Anfrage, Durchsatz und Batch-Größen.
+    """
+    from tgacode.embed_service import EmbedService
+
+    rng = random.Random(seed + 3)
+    texts = [f"Welche Vereinbarung gilt für {rng.choice(items)}?"
+             for items in _GEWERKE.values() for _ in range(per_client)]
+
+    def run(encode):
+        latencies = []
+        lock = threading.Lock()
+
+        def client(i):
+            for j in range(per_client):
+                t0 = time.perf_counter()
+                encode([texts[(i * per_client + j) % len(texts)]])
+                with lock:
+                    latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        total = time.perf_counter() - t0
+        return {"seconds": percentiles(latencies), "requests_per_sec": round(len(latencies) / total, 1)}
+
+    service = EmbedService(embedder)
+    result = {"clients": clients, "requests": clients * per_client,
+              "direct": run(lambda t: embedder.encode(t, convert_to_numpy=True, show_progress_bar=False)),
+              "service": run(service.encode)}
+    stats = service.stats()
+    result["service"].update(batches=stats["batches"], mean_batch_texts=round(stats["mean_batch_texts"], 2))
+    return result
+
+
+def _dir_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return round(total / 1024 / 1024, 3)
+
+
+def bench_vector_backends(chroma_col, embedder, queries, seed, n_results=6):
+    """
+    Chroma gegen NumPy-Speicher (int8 und float16): reine Abfragezeit für einen
+    Fragen-Batch, Übereinstimmung der Top-k mit Chroma und Speicherbedarf.
+    """
+    from tgacode.embedding import encode_texts
+    from tgacode.vecstore import load_store, write_store
+
+    got = chroma_col.get(include=["embeddings", "documents", "metadatas"])
+    rng = random.Random(seed + 2)
+    batches = [
+        encode_texts(embedder, [f"Welche Vereinbarung gilt für {rng.choice(items)}?"
+                                for items in rng.sample(list(_GEWERKE.values()), k=3)])
+        for _ in range(queries)
+    ]
+
+    def run(col):
+        latencies, results = [], []
+        for vecs in batches:
+            t0 = time.perf_counter()
+            results.append(col.query(query_embeddings=vecs, n_results=n_results,
+                                     include=["documents", "metadatas", "distances"])["ids"])
+            latencies.append(time.perf_counter() - t0)
+        return latencies, results
+
+    latencies, reference = run(chroma_col)
+    result = {"chunks": len(got["ids"]), "chroma": {"seconds": percentiles(latencies, digits=6)}}
+    float32_mb = len(got["ids"]) * len(got["embeddings"][0]) * 4 / 1024 / 1024 if got["ids"] else 0.0
+    result["float32_mb"] = round(float32_mb, 3)
+    with tempfile.TemporaryDirectory(prefix="tgacode-vec-") as tmp:
+        for dtype in ("int8", "float16"):
+            d = os.path.join(tmp, dtype)
+            write_store(d, got["ids"], got["embeddings"], got["documents"], got["metadatas"], "bench", dtype)
+            store = load_store(d)
+            latencies, results = run(store)
+            overlap = [len(set(a) & set(b)) / max(1, len(a))
+                       for ref, res in zip(reference, results) for a, b in zip(ref, res)]
+            result[dtype] = {
+                "seconds": percentiles(latencies, digits=6),
+                "recall_vs_chroma": round(sum(overlap) / max(1, len(overlap)), 4),
+                "matrix_mb": round(store.nbytes() / 1024 / 1024, 3),
+                "disk_mb": _dir_mb(d),
+            }
+    return result
+
+
+def bench_checks(nachtraege, collection, embedder, eco, single_pass=False, lexical=None, history=None):
+    from tgacode import metrics
+    from tgacode.pipeline import run_check
+
+    latencies = []
+    prompt_tokens = []
+    llm_tokens_in = []
+    llm_calls = []
+    modes = set()
+    reused = 0
+    t0 = time.perf_counter()
+    for path in nachtraege:
+        t = time.perf_counter()
+        with metrics.trace("bench.check") as tr:
+            result = run_check([path], collection, embedder, eco=eco, single_pass=single_pass, lexical=lexical,
+                               history=history, names=[os.path.basename(path)])
+        latencies.append(time.perf_counter() - t)
+        prompt_tokens.append(result["usage"]["tokens"])
+        calls = [s for s in tr.spans if s["name"] == "llm.generate"]
+        llm_calls.append(len(calls))
+        llm_tokens_in.append(sum(s.get("tokens_in") or 0 for s in calls))
+        modes.add(result["mode"])
+        reused += result.get("reused") is not None
+    return {
+        "nachtraege": len(nachtraege),
+        "mode": "/".join(sorted(modes)),
+        "reused": reused,
+        "total_seconds": round(time.perf_counter() - t0, 3),
+        "seconds": percentiles(latencies),
+        "report_prompt_tokens": percentiles(prompt_tokens),
+        "llm_calls": percentiles(llm_calls),
+        "llm_tokens_in": percentiles(llm_tokens_in),
+    }
+
+
+def run(args):
+    from tgacode import llm
+    from tgacode.fake_gemini import start_fake_server
+    from tgacode.history import CheckHistory
+    from tgacode.indexing import EMBEDDING_MODEL, collection_name, index_dir, project_id
+    from tgacode.lexical import load_lexical
+    from tgacode.ratelimit import configure_limiter
+    from tgacode.vectorstore import open_collection, store_path
+
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    started = time.strftime("%Y-%m-%dT%H:%M:%S")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="tgacode-bench-") as root:
+        # Eigener VAULT (relative Pfade aus tgacode.config) → kalte Caches bei jedem Lauf
+        os.chdir(root)
+        try:
+            phases = {}
+            t0 = time.perf_counter()
+            firma, projekt, p_path, nachtraege, revised = build_corpus(
+                root, args.docs, args.pages, args.nachtraege, args.nt_pages, args.seed,
+            )
+            phases["corpus"] = {"seconds": round(time.perf_counter() - t0, 3)}
+
+            if args.embedder == "stub":
+                embedder, model_name, workers = HashEmbedder(), "bench-hash-384", 1
+            else:
+                from tgacode.embedding import load_embedder
+                embedder, model_name, workers = load_embedder(EMBEDDING_MODEL), EMBEDDING_MODEL, args.workers
+
+            pdfs = sorted(os.path.join(p_path, f) for f in os.listdir(p_path) if f.endswith(".pdf"))
+            phases["read_pdf"] = bench_read_pdf(pdfs)
+            phases["read_pdf"]["peak_rss_mb"] = peak_rss_mb()
+
+            # Seiten-Cache leeren, damit die Indexierung die Extraktion mitmisst
+            import shutil
+            from tgacode.config import PAGE_CACHE_DIR
+            shutil.rmtree(PAGE_CACHE_DIR, ignore_errors=True)
+
+            p_id = project_id(firma, projekt)
+            client, phases["index"] = bench_index(p_path, p_id, embedder, model_name, args.batch_size, workers)
+            phases["index"]["peak_rss_mb"] = peak_rss_mb()
+
+            chroma_col = client.get_or_create_collection(collection_name(p_id))
+            phases["vectors"] = bench_vector_backends(chroma_col, embedder, args.queries, args.seed)
+            # Stub ohne Rechenzeit: Modellkosten (4 ms je Aufruf + 0,2 ms je Text) simulieren
+            service_embedder = HashEmbedder(0.004, 0.0002) if args.embedder == "stub" else embedder
+            phases["embed_service"] = bench_embed_service(service_embedder, args.embed_clients, 20, args.seed)
+            phases["vectors"]["chroma"]["disk_mb"] = _dir_mb(store_path(p_path))
+
+            # Wie in der App: kleine Projekte fragen den NumPy-Speicher
+            collection = open_collection(p_path, p_id, client)
+            phases["vectors"]["backend"] = type(collection).__name__
+            lexical = load_lexical(index_dir(p_path))
+            phases["retrieval"] = bench_retrieval(collection, embedder, args.queries, args.seed, lexical)
+
+            server, state, url = start_fake_server(
+                latency=args.latency, rpm=args.rpm, error_rate=args.error_rate, retry_after=args.retry_after,
+            )
+            try:
+                llm.configure("bench", endpoint=url)
+                configure_limiter(rpm=args.client_rpm, max_concurrency=args.concurrency)
+                phases["check"] = bench_checks(nachtraege, collection, embedder, args.eco, args.single_pass, lexical)
+                phases["check"]["stub"] = state.stats()
+                # 1. Fassungen in die Prüfhistorie, dann die geänderten 2. Fassungen messen
+                history = CheckHistory(p_path)
+                bench_checks(nachtraege, collection, embedder, args.eco, args.single_pass, lexical, history)
+                before = state.stats()["requests"]
+                phases["resubmit"] = bench_checks(
+                    revised, collection, embedder, args.eco, args.single_pass, lexical, history,
+                )
+                phases["resubmit"]["stub_requests"] = state.stats()["requests"] - before
+            finally:
+                server.shutdown()
+            phases["check"]["peak_rss_mb"] = peak_rss_mb()
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "meta": {
+            "started": started,
+            "commit": git_commit(repo),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out_dir")},
+        },
+        "results": phases,
+    }
+
+
+# ------------------------------------------------------------------------------
+# Vergleich
+# ------------------------------------------------------------------------------
+
+def _flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old_path, new_path):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    a, b = _flatten(old["results"]), _flatten(new["results"])
+    print(f"{'Messwert':48} {old['meta'].get('commit') or 'alt':>12} {new['meta'].get('commit') or 'neu':>12}   Δ")
+    for key in sorted(set(a) | set(b)):
+        va, vb = a.get(key), b.get(key)
+        delta = f"{(vb - va) / va:+.1%}" if va and vb is not None else ""
+        print(f"{key:48} {va if va is not None else '–':>12} {vb if vb is not None else '–':>12}   {delta}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark: Extraktion, Indexierung, Retrieval, Prüfung")
+    ap.add_argument("--docs", type=int, default=10, help="Projekt-PDFs")
+    ap.add_argument("--pages", type=int, default=20, help="Seiten je Projekt-PDF")
+    ap.add_argument("--nachtraege", type=int, default=5)
+    ap.add_argument("--nt-pages", type=int, default=2, help="Seiten je Nachtrag")
+    ap.add_argument("--queries", type=int, default=50, help="Retrieval-Abfragen")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--embedder", choices=("model", "stub"), default="model",
+                    help="model = SentenceTransformer, stub = Hash-Embedding ohne torch")
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--workers", type=int, default=None, help="Embedding-Prozesse (Standard: automatisch)")
+    ap.add_argument("--eco", action="store_true", help="Prüfung ohne Fragen-Agent")
+    ap.add_argument("--single-pass", action="store_true", help="Bericht und JSON in einem Aufruf")
+    ap.add_argument("--latency", type=float, default=0.2, help="Antwortzeit des Fake-Gemini in s")
+    ap.add_argument("--rpm", type=int, default=0, help="Server-Quota des Fake-Gemini (0 = unbegrenzt)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Anteil zufälliger 429")
+    ap.add_argument("--retry-after", type=float, default=1.0)
+    ap.add_argument("--client-rpm", type=int, default=600, help="Limiter der App (Requests/Minute)")
+    ap.add_argument("--concurrency", type=int, default=4, help="Limiter der App (Parallelität)")
+    ap.add_argument("--embed-clients", type=int, default=8, help="gleichzeitige Sitzungen im Embedding-Test")
+    ap.add_argument("--out-dir", default=RESULTS_DIR)
+    ap.add_argument("--compare", nargs=2, metavar=("ALT", "NEU"), help="zwei Ergebnisdateien vergleichen")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    random.seed(args.seed)  # Jitter im Limiter/Fake-Server reproduzierbar
+    result = run(args)
+    os.makedirs(args.out_dir, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}_{result['meta']['commit'] or 'nocommit'}.json"
+    path = os.path.join(args.out_dir, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(json.dumps(result["results"], ensure_ascii=False, indent=2))
+    print(f"Ergebnis: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+# ==============================================================================
+# Projektkatalog (SQLite im VAULT)
+# - Firmen, Projekte, Dokumente (Größe, Hash, Seiten, Extraktions-/Indexstatus)
+#   und Stammdaten-Versionen – das Dashboard liest nur noch hier
+# - Die Schreibpfade der App (Anlegen, Hochladen, Stammdaten, Indexierung)
+#   aktualisieren den Katalog direkt
+# - Index-Status je Projekt aus Manifest-Dateiliste + Dokumentstatus; aktualisiert
+#   nach der Indexierung und beim Abgleich (Manifest-mtime)
+# - Abgleich mit dem Dateisystem gedrosselt und über Verzeichnis-mtimes:
+#   nur geänderte Ordner werden neu gelistet (Änderungen außerhalb der App);
+#   bekannte Dokumente werden zusätzlich per stat geprüft (überschriebene Dateien)
+# ==============================================================================
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from tgacode.config import CATALOG_PATH, VAULT
+from tgacode.indexing import MANIFEST_NAME, index_dir, load_manifest
+from tgacode.vectorstore import STATUS_EMPTY, STATUS_MISSING, STATUS_OK, STATUS_OUTDATED, manifest_stale
+
+STAMMDATEN_FILE = "_projekt_stammdaten.txt"
+RECONCILE_SECONDS = 30.0
+
+
+def _visible(name):
+    return not name.startswith(("_", "."))
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class Catalog:
+    """Katalog über den VAULT. Fehlende Einträge holt der nächste Abgleich nach."""
+
+    def __init__(self, path=CATALOG_PATH, vault=VAULT, reconcile_seconds=RECONCILE_SECONDS):
+        self.path = path
+        self.vault = vault
+        self.reconcile_seconds = reconcile_seconds
+        self._last_reconcile = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._db() as con:
+            con.executescript(
+                "CREATE TABLE IF NOT EXISTS firmen (name TEXT PRIMARY KEY, created REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS projekte ("
+                " firma TEXT NOT NULL, projekt TEXT NOT NULL, created REAL NOT NULL,"
+                " PRIMARY KEY (firma, projekt));"
+                "CREATE TABLE IF NOT EXISTS dokumente ("
+                " firma TEXT NOT NULL, projekt TEXT NOT NULL, name TEXT NOT NULL,"
+                " size INTEGER, mtime REAL, sha256 TEXT, pages INTEGER,"
+                " extracted INTEGER NOT NULL DEFAULT 0, indexed INTEGER NOT NULL DEFAULT 0,"
+                " updated REAL NOT NULL, PRIMARY KEY (firma, projekt, name));"
+                "CREATE TABLE IF NOT EXISTS stammdaten ("
+                " firma TEXT NOT NULL, projekt TEXT NOT NULL, version INTEGER NOT NULL,"
+                " text TEXT NOT NULL, mtime REAL, created REAL NOT NULL,"
+                " PRIMARY KEY (firma, projekt, version));"
+                # Indexstand je Projekt: Dateinamen im Manifest (NULL = kein Index)
+                "CREATE TABLE IF NOT EXISTS indexstand ("
+                " firma TEXT NOT NULL, projekt TEXT NOT NULL, files TEXT, stale INTEGER NOT NULL,"
+                " updated REAL NOT NULL, PRIMARY KEY (firma, projekt));"
+                # Zuletzt gesehene mtime je Ordner ('' = VAULT, 'Firma', 'Firma/Projekt')
+                # bzw. je Manifest ('Firma/Projekt/manifest')
+                "CREATE TABLE IF NOT EXISTS ordner (key TEXT PRIMARY KEY, mtime REAL);"
+            )
+
+    @contextmanager
+    def _db(self):
+        # Kein WAL: der VAULT kann auf einem Netzlaufwerk liegen
+        con = sqlite3.connect(self.path, timeout=10)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def project_path(self, firma, projekt):
+        return os.path.join(self.vault, firma, projekt)
+
+    # --------------------------------------------------------------------------
+    # Lesen (Dashboard)
+    # --------------------------------------------------------------------------
+
+    def firmen(self):
+        with self._db() as con:
+            return [r[0] for r in con.execute("SELECT name FROM firmen ORDER BY name")]
+
+    def projekte(self, firma=None):
+        """Projektnamen einer Firma bzw. (Firma, Projekt) aller Projekte."""
+        with self._db() as con:
+            if firma is None:
+                return con.execute("SELECT firma, projekt FROM projekte ORDER BY firma, projekt").fetchall()
+            return [r[0] for r in con.execute(
+                "SELECT projekt FROM projekte WHERE firma = ? ORDER BY projekt", (firma,)
+            )]
+
+    def documents(self, firma, projekt):
+        with self._db() as con:
+            con.row_factory = sqlite3.Row
+            return [dict(r) for r in con.execute(
+                "SELECT name, size, mtime, sha256, pages, extracted, indexed FROM dokumente"
+                " WHERE firma = ? AND projekt = ? ORDER BY name", (firma, projekt),
+            )]
+
+    def stammdaten(self, firma, projekt):
+        """Aktuelle Stammdaten (leer, wenn keine vorhanden)."""
+        with self._db() as con:
+            row = con.execute(
+                "SELECT text FROM stammdaten WHERE firma = ? AND projekt = ? ORDER BY version DESC LIMIT 1",
+                (firma, projekt),
+            ).fetchone()
+        return row[0] if row else ""
+
+    def index_state(self, firma, projekt):
+        """
+        Index-Status wie vectorstore.index_status ({"state", "new", "changed", "removed"}),
+        aber ohne Dateisystem: aus dem Indexstand und dem Dokumentstatus. None, solange
+        für das Projekt noch kein Indexstand übernommen wurde.
+        """
+        with self._db() as con:
+            row = con.execute(
+                "SELECT files, stale FROM indexstand WHERE firma = ? AND projekt = ?", (firma, projekt)
+            ).fetchone()
+            if row is None:
+                return None
+            pdfs = {name: indexed for name, indexed in con.execute(
+                "SELECT name, indexed FROM dokumente WHERE firma = ? AND projekt = ?", (firma, projekt)
+            ) if name.lower().endswith(".pdf")}
+        result = {"state": STATUS_OK, "new": 0, "changed": 0, "removed": 0}
+        if row[0] is None:
+            result["state"] = STATUS_MISSING if pdfs else STATUS_EMPTY
+            result["new"] = len(pdfs)
+            return result
+        files = set(json.loads(row[0]))
+        result["new"] = sum(1 for name in pdfs if name not in files)
+        result["changed"] = sum(1 for name, indexed in pdfs.items() if name in files and not indexed)
+        result["removed"] = sum(1 for name in files if name not in pdfs)
+        if row[1] or result["new"] or result["changed"] or result["removed"]:
+            result["state"] = STATUS_OUTDATED
+        elif not pdfs:
+            result["state"] = STATUS_EMPTY
+        return result
+
+    def stammdaten_versions(self, firma, projekt):
+        """[(version, created, text)] – neueste zuerst."""
+        with self._db() as con:
+            return con.execute(
+                "SELECT version, created, text FROM stammdaten WHERE firma = ? AND projekt = ?"
+                " ORDER BY version DESC", (firma, projekt),
+            ).fetchall()
+
+    # --------------------------------------------------------------------------
+    # Schreibpfade der App (Dateisystem + Katalog)
+    # --------------------------------------------------------------------------
+
+    def add_firma(self, firma):
+        os.makedirs(os.path.join(self.vault, firma), exist_ok=True)
+        with self._db() as con:
+            con.execute("INSERT OR IGNORE INTO firmen (name, created) VALUES (?, ?)", (firma, time.time()))
+
+    def add_projekt(self, firma, projekt):
+        self.add_firma(firma)
+        os.makedirs(self.project_path(firma, projekt), exist_ok=True)
+        with self._db() as con:
+            con.execute(
+                "INSERT OR IGNORE INTO projekte (firma, projekt, created) VALUES (?, ?, ?)",
+                (firma, projekt, time.time()),
+            )
+
+    def save_document(self, firma, projekt, name, data):
+        """Speichert ein hochgeladenes Dokument und trägt Größe und Hash ein."""
+        self.add_projekt(firma, projekt)
+        path = os.path.join(self.project_path(firma, projekt), name)
+        with open(path, "wb") as f:
+            f.write(data)
+        st_ = os.stat(path)
+        with self._db() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO dokumente"
+                " (firma, projekt, name, size, mtime, sha256, pages, extracted, indexed, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, NULL, 0, 0, ?)",
+                (firma, projekt, name, st_.st_size, st_.st_mtime, hashlib.sha256(data).hexdigest(), time.time()),
+            )
+
+    def save_stammdaten(self, firma, projekt, text):
+        """Schreibt die Stammdaten-Datei und legt bei Änderung eine neue Version an."""
+        self.add_projekt(firma, projekt)
+        path = os.path.join(self.project_path(firma, projekt), STAMMDATEN_FILE)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        self._add_stammdaten_version(firma, projekt, text, _mtime(path))
+
+    def _add_stammdaten_version(self, firma, projekt, text, mtime, con=None):
+        if con is None:
+            with self._db() as con:
+                return self._add_stammdaten_version(firma, projekt, text, mtime, con)
+        last = con.execute(
+            "SELECT version, text FROM stammdaten WHERE firma = ? AND projekt = ? ORDER BY version DESC LIMIT 1",
+            (firma, projekt),
+        ).fetchone()
+        if last and last[1] == text:
+            con.execute(
+                "UPDATE stammdaten SET mtime = ? WHERE firma = ? AND projekt = ? AND version = ?",
+                (mtime, firma, projekt, last[0]),
+            )
+            return
+        con.execute(
+            "INSERT INTO stammdaten (firma, projekt, version, text, mtime, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (firma, projekt, (last[0] if last else 0) + 1, text, mtime, time.time()),
+        )
+
+    def update_index_state(self, firma, projekt, manifest, page_count=None, con=None):
+        """
+        Übernimmt den Indexstand aus dem Manifest: indexiert ist, wessen Größe und
+        Hash (bzw. mtime, solange der Hash unbekannt ist) zum Manifest passen.
+        page_count(sha256) → Seiten oder None ergänzt fehlende Seitenzahlen
+        (z. B. aus dem Seiten-Cache) und den Extraktionsstatus.
+        """
+        if con is None:
+            with self._db() as con:
+                return self.update_index_state(firma, projekt, manifest, page_count, con)
+        files = (manifest or {}).get("files", {})
+        con.execute(
+            "INSERT OR REPLACE INTO indexstand (firma, projekt, files, stale, updated) VALUES (?, ?, ?, ?, ?)",
+            (firma, projekt, json.dumps(sorted(files)) if manifest is not None else None,
+             int(manifest is not None and manifest_stale(manifest)), time.time()),
+        )
+        for name, sha, size, mtime, pages in con.execute(
+            "SELECT name, sha256, size, mtime, pages FROM dokumente WHERE firma = ? AND projekt = ?",
+            (firma, projekt),
+        ).fetchall():
+            entry = files.get(name)
+            indexed = bool(entry) and entry.get("size") == size and (
+                entry.get("sha256") == sha if sha else entry.get("mtime") == mtime)
+            sha = entry.get("sha256") if indexed else sha
+            if pages is None and sha and page_count is not None:
+                pages = page_count(sha)
+            con.execute(
+                "UPDATE dokumente SET indexed = ?, sha256 = ?,"
+                " pages = COALESCE(?, pages), extracted = MAX(extracted, ?), updated = ?"
+                " WHERE firma = ? AND projekt = ? AND name = ?",
+                (int(indexed), sha, pages, int(indexed or pages is not None), time.time(),
+                 firma, projekt, name),
+            )
+
+    # --------------------------------------------------------------------------
+    # Abgleich mit dem Dateisystem
+    # --------------------------------------------------------------------------
+
+    def reconcile(self, force=False):
+        """
+        Gleicht den Katalog mit dem VAULT ab – höchstens alle reconcile_seconds.
+        Gelistet werden nur Ordner, deren mtime sich geändert hat. Ein an Ort und
+        Stelle überschriebenes Dokument ändert die Ordner-mtime nicht: bei
+        unverändertem Projektordner werden daher die bekannten Dokumente und die
+        Stammdaten-Datei per stat geprüft; bei geändertem Manifest (z. B. CLI)
+        wird der Indexstand neu übernommen. Liefert True, wenn abgeglichen wurde.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_reconcile is not None and now - self._last_reconcile < self.reconcile_seconds:
+                return False
+            self._last_reconcile = now
+        with self._db() as con:
+            seen = dict(con.execute("SELECT key, mtime FROM ordner"))
+
+            def changed(key, path):
+                m = _mtime(path)
+                if seen.get(key) == m and key in seen:
+                    return False
+                con.execute("INSERT OR REPLACE INTO ordner (key, mtime) VALUES (?, ?)", (key, m))
+                return True
+
+            if changed("", self.vault):
+                self._sync_firmen(con)
+            for (firma,) in con.execute("SELECT name FROM firmen").fetchall():
+                if changed(firma, os.path.join(self.vault, firma)):
+                    self._sync_projekte(con, firma)
+            for firma, projekt in con.execute("SELECT firma, projekt FROM projekte").fetchall():
+                p_path = self.project_path(firma, projekt)
+                if changed(f"{firma}/{projekt}", p_path):
+                    self._sync_documents(con, firma, projekt)
+                else:
+                    self._check_documents(con, firma, projekt)
+                self._sync_stammdaten(con, firma, projekt)
+                if changed(f"{firma}/{projekt}/manifest", os.path.join(index_dir(p_path), MANIFEST_NAME)):
+                    self.update_index_state(firma, projekt, load_manifest(p_path), con=con)
+        return True
+
+    def _sync_firmen(self, con):
+        names = []
+        if os.path.isdir(self.vault):
+            names = [f for f in os.listdir(self.vault)
+                     if _visible(f) and os.path.isdir(os.path.join(self.vault, f))]
+        con.executemany("INSERT OR IGNORE INTO firmen (name, created) VALUES (?, ?)",
+                        [(n, time.time()) for n in names])
+        for (gone,) in con.execute("SELECT name FROM firmen").fetchall():
+            if gone not in names:
+                for table, col in (("firmen", "name"), ("projekte", "firma"), ("dokumente", "firma"),
+                                   ("stammdaten", "firma"), ("indexstand", "firma")):
+                    con.execute(f"DELETE FROM {table} WHERE {col} = ?", (gone,))
+
+    def _sync_projekte(self, con, firma):
+        f_path = os.path.join(self.vault, firma)
+        names = [p for p in os.listdir(f_path) if os.path.isdir(os.path.join(f_path, p))] \
+            if os.path.isdir(f_path) else []
+        con.executemany("INSERT OR IGNORE INTO projekte (firma, projekt, created) VALUES (?, ?, ?)",
+                        [(firma, n, time.time()) for n in names])
+        for (gone,) in con.execute("SELECT projekt FROM projekte WHERE firma = ?", (firma,)).fetchall():
+            if gone not in names:
+                for table in ("projekte", "dokumente", "stammdaten", "indexstand"):
+                    con.execute(f"DELETE FROM {table} WHERE firma = ? AND projekt = ?", (firma, gone))
+
+    def _known_documents(self, con, firma, projekt):
+        return {r[0]: (r[1], r[2]) for r in con.execute(
+            "SELECT name, size, mtime FROM dokumente WHERE firma = ? AND projekt = ?", (firma, projekt)
+        )}
+
+    def _sync_document(self, con, firma, projekt, name, st_, known):
+        if known.get(name) == (st_.st_size, st_.st_mtime):
+            return
+        # Außerhalb der App geändert: Hash und Indexstand erst mit der nächsten Indexierung
+        con.execute(
+            "INSERT OR REPLACE INTO dokumente"
+            " (firma, projekt, name, size, mtime, sha256, pages, extracted, indexed, updated)"
+            " VALUES (?, ?, ?, ?, ?, NULL, NULL, 0, 0, ?)",
+            (firma, projekt, name, st_.st_size, st_.st_mtime, time.time()),
+        )
+
+    def _check_documents(self, con, firma, projekt):
+        """Nur die bekannten Dokumente per stat prüfen (Ordner selbst unverändert)."""
+        p_path = self.project_path(firma, projekt)
+        known = self._known_documents(con, firma, projekt)
+        gone = []
+        for name in known:
+            try:
+                st_ = os.stat(os.path.join(p_path, name))
+            except OSError:
+                gone.append(name)
+                continue
+            self._sync_document(con, firma, projekt, name, st_, known)
+        con.executemany(
+            "DELETE FROM dokumente WHERE firma = ? AND projekt = ? AND name = ?",
+            [(firma, projekt, n) for n in gone],
+        )
+
+    def _sync_documents(self, con, firma, projekt):
+        p_path = self.project_path(firma, projekt)
+        known = self._known_documents(con, firma, projekt)
+        present = set()
+        for name in (os.listdir(p_path) if os.path.isdir(p_path) else []):
+            path = os.path.join(p_path, name)
+            if not _visible(name) or not os.path.isfile(path):
+                continue
+            present.add(name)
+            self._sync_document(con, firma, projekt, name, os.stat(path), known)
+        con.executemany(
+            "DELETE FROM dokumente WHERE firma = ? AND projekt = ? AND name = ?",
+            [(firma, projekt, n) for n in known if n not in present],
+        )
+
+    def _sync_stammdaten(self, con, firma, projekt):
+        path = os.path.join(self.project_path(firma, projekt), STAMMDATEN_FILE)
+        m = _mtime(path)
+        if m is None:
+            return
+        row = con.execute(
+            "SELECT mtime FROM stammdaten WHERE firma = ? AND projekt = ? ORDER BY version DESC LIMIT 1",
+            (firma, projekt),
+        ).fetchone()
+        if row and row[0] == m:
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return
+        self._add_stammdaten_version(firma, projekt, text, m, con)
@@ -0,0 +1,58 @@
+# ==============================================================================
+# Chunking mit Seitenbezug
+# - Seitenweise, als Generator (kein Gesamtstring, keine globale Wortliste)
+# - Feste Fenstergröße mit Überlappung, damit Positionen an Fenstergrenzen
+#   vollständig in mindestens einem Chunk landen
+# - Jeder Chunk kennt Quelle und Seitenbereich (Metadaten in Chroma)
+# ==============================================================================
+
+from collections import deque
+
+CHUNK_WORDS = 400
+CHUNK_OVERLAP = 60
+
+
+def iter_chunks(pages, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """
+    Liefert (text, seite_von, seite_bis) für Wortfenster über alle Seiten.
+    Seiten sind 1-basiert; aufeinanderfolgende Fenster teilen sich `overlap` Wörter.
+    Im Speicher liegt nur das aktuelle Fenster und die aktuelle Seite.
+    """
+    if size <= 0:
+        raise ValueError("Chunk-Größe muss positiv sein.")
+    overlap = max(0, min(overlap, size - 1))
+    words, page_of = deque(), deque()
+    fresh = 0  # Wörter seit dem letzten ausgegebenen Chunk
+
+    for page_no, text in enumerate(pages, start=1):
+        if not text:
+            continue
+        for w in text.split():
+            words.append(w)
+            page_of.append(page_no)
+            fresh += 1
+            if len(words) == size:
+                yield " ".join(words), page_of[0], page_of[-1]
+                for _ in range(size - overlap):
+                    words.popleft()
+                    page_of.popleft()
+                fresh = 0
+
+    if fresh:
+        yield " ".join(words), page_of[0], page_of[-1]
+
+
+def chunk_metadata(source, page_start, page_end):
+    return {"source": source, "page_start": page_start, "page_end": page_end}
+
+
+def cite(meta):
+    """Quellenangabe für einen Chunk, z. B. 'Datei LV.pdf, Seite 12'."""
+    if not meta or not meta.get("source"):
+        return "unbekannte Quelle"
+    a, b = meta.get("page_start"), meta.get("page_end")
+    if not a:
+        return f"Datei {meta['source']}"
+    if b and b != a:
+        return f"Datei {meta['source']}, Seiten {a}–{b}"
+    return f"Datei {meta['source']}, Seite {a}"
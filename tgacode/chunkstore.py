@@ -0,0 +1,108 @@
+# ==============================================================================
+# Inhaltsadressierter Chunk-Speicher (projektübergreifend)
+# - Chunk-Texte, Seitenbereiche und Embeddings je Dokumentinhalt genau einmal
+#   unter VAULT/_cache/chunks, Schlüssel = SHA-256 aus Datei-Hash, Modell, Chunking
+# - VOB/B, DIN-Normen, Datenblätter, Rahmen-LVs in vielen Akten: die Indexierung
+#   übernimmt Chunks und Embeddings, statt neu zu extrahieren und einzubetten
+# - Einträge sind unveränderlich (gleicher Schlüssel = gleicher Inhalt) und werden
+#   im Prozess gecacht bzw. per Memory-Map von allen Projekten gemeinsam gelesen
+# ==============================================================================
+
+import os
+import gzip
+import json
+import hashlib
+import threading
+from functools import lru_cache
+
+from tgacode.config import CHUNK_STORE_DIR
+
+# Halbe Größe von float32; Treffer im Benchmark identisch zu Chroma
+CHUNK_DTYPE = "float16"
+
+
+def chunk_key(sha256, model_name, chunking):
+    """Inhaltsschlüssel eines Dokuments für ein Embedding-Modell und Chunk-Parameter."""
+    raw = json.dumps([sha256, model_name, chunking], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=512)
+def _read_texts(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["texts"], [tuple(p) for p in data["pages"]]
+
+
+@lru_cache(maxsize=512)
+def _read_vectors(path):
+    import numpy as np
+
+    return np.load(path, mmap_mode="r")
+
+
+class ChunkStore:
+    def __init__(self, root=CHUNK_STORE_DIR):
+        self.root = root
+
+    def _paths(self, key):
+        base = os.path.join(self.root, key[:2], key)
+        return base + ".npy", base + ".json.gz"
+
+    def has(self, key):
+        # Die Textdatei wird zuletzt geschrieben und markiert den Eintrag als vollständig
+        return os.path.exists(self._paths(key)[1])
+
+    def put(self, key, texts, pages, vectors):
+        """Legt einen Eintrag an (bestehende bleiben unverändert). Fehler schlucken: Speicher ist optional."""
+        import numpy as np
+
+        if self.has(key):
+            return
+        vec_path, text_path = self._paths(key)
+        try:
+            os.makedirs(os.path.dirname(vec_path), exist_ok=True)
+            tmp = f"{vec_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, np.asarray(vectors, dtype=np.float32).astype(CHUNK_DTYPE))
+            os.replace(tmp, vec_path)
+            tmp = f"{text_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump({"texts": list(texts), "pages": [list(p) for p in pages]}, f, ensure_ascii=False)
+            os.replace(tmp, text_path)
+        except OSError:
+            pass
+
+    def texts(self, key):
+        """(Chunk-Texte, [(Seite von, Seite bis)]) oder None."""
+        if not self.has(key):
+            return None  # gelöscht (Speicher geleert) – der Prozess-Cache gilt nicht mehr
+        try:
+            return _read_texts(self._paths(key)[1])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def vectors(self, key):
+        """Embedding-Matrix (float16, Memory-Map) oder None."""
+        if not self.has(key):
+            return None
+        try:
+            return _read_vectors(self._paths(key)[0])
+        except (OSError, ValueError):
+            return None
+
+    def load(self, key):
+        """(Texte, Seitenbereiche, Embeddings) eines vollständigen Eintrags oder None."""
+        entry, vecs = self.texts(key), self.vectors(key)
+        if entry is None or vecs is None or len(entry[0]) != vecs.shape[0]:
+            return None
+        return entry[0], entry[1], vecs
+
+    def usage(self):
+        """{"entries", "mb"} – Platzbedarf des gemeinsamen Speichers."""
+        entries, size = 0, 0
+        for root, _, files in os.walk(self.root):
+            for f in files:
+                size += os.path.getsize(os.path.join(root, f))
+                entries += f.endswith(".json.gz")
+        return {"entries": entries, "mb": round(size / 1024 / 1024, 3)}
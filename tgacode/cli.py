@@ -0,0 +1,308 @@
+# ==============================================================================
+# Stapelverarbeitung ohne UI
+# - index: alle (oder ausgewählte) Projekte im VAULT inkrementell indexieren
+# - check: Analyst → Gutachter → JSON für viele Nachträge, Ergebnisse als
+#   bericht.md, zusammenfassung.json und optional deckblatt.xlsx
+# - Fortsetzen nach Abbruch: Indexierung über das Manifest, Prüfungen über
+#   status.json je Nachtrag (gleicher Datei-Hash → wird übersprungen)
+# - Geändert erneut eingereichte Nachträge: frühere Prüfung aus der Prüfhistorie
+#   des Projekts, nur die Änderungen werden neu geprüft (--no-reuse schaltet ab)
+# - Caches (LLM, Chunk-Speicher, Seiten) und Messpunkte liegen im VAULT aus --vault
+#
+# Beispiele:
+#   python -m tgacode index --workers 2
+#   python -m tgacode check --projekt "Fa Müller/Projekt A" nachtraege/ --out ergebnisse/
+# Gemini-Zugang über Umgebungsvariablen: GEMINI_API_KEY, optional
+# GEMINI_API_ENDPOINT, GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_CONCURRENCY
+# ==============================================================================
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tgacode import llm, metrics, pipeline
+from tgacode.chunkstore import ChunkStore
+from tgacode.config import VAULT, vault_paths
+from tgacode.deckblatt import fill_deckblatt, load_template
+from tgacode.embedding import EMBED_BATCH_SIZE
+from tgacode.embed_service import load_embed_service
+from tgacode.extraction import source_sha256
+from tgacode.history import CheckHistory
+from tgacode.indexing import (
+    EMBEDDING_MODEL, index_dir, index_lock, index_project, project_id,
+)
+from tgacode.lexical import load_lexical
+from tgacode.llm_cache import LLMCache
+from tgacode.pricecheck import euro
+from tgacode.ratelimit import MAX_CONCURRENCY, RPM_LIMIT, TPM_LIMIT, configure_limiter
+from tgacode.vectorstore import open_collection, open_project_store
+
+STATUS_FILE = "status.json"
+
+
+def _log(msg):
+    print(f"{time.strftime('%H:%M:%S')} {msg}", flush=True)
+
+
+def list_projects(vault, selected=None):
+    """(Firma, Projekt, Pfad) aller Projekte; selected filtert auf 'Firma/Projekt'."""
+    projects = []
+    if not os.path.isdir(vault):
+        return projects
+    for firma in sorted(os.listdir(vault)):
+        f_path = os.path.join(vault, firma)
+        if firma.startswith(("_", ".")) or not os.path.isdir(f_path):
+            continue
+        for projekt in sorted(os.listdir(f_path)):
+            p_path = os.path.join(f_path, projekt)
+            if os.path.isdir(p_path) and (not selected or f"{firma}/{projekt}" in selected):
+                projects.append((firma, projekt, p_path))
+    return projects
+
+
+def list_nachtraege(paths):
+    """PDF-Dateien aus Dateien und Ordnern (nicht rekursiv), sortiert und eindeutig."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(".pdf")
+            )
+        elif path.lower().endswith(".pdf"):
+            found.append(path)
+    return list(dict.fromkeys(os.path.abspath(p) for p in found))
+
+
+def result_dirs(out_root, nachtraege):
+    """
+    Ausgabeordner je Nachtrag: der Dateiname ohne Endung; kommt er aus mehreren
+    Ordnern vor, mit Kurz-Hash des Ordnerpfads (sonst überschreiben sich die Ergebnisse).
+    """
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in nachtraege]
+    dirs = {}
+    for path, stem in zip(nachtraege, stems):
+        if stems.count(stem) > 1:
+            stem += "_" + hashlib.sha1(os.path.dirname(path).encode("utf-8")).hexdigest()[:8]
+        dirs[path] = os.path.join(out_root, stem)
+    return dirs
+
+
+def configure_gemini():
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        raise SystemExit("GEMINI_API_KEY ist nicht gesetzt.")
+    llm.configure(api_key, endpoint=os.environ.get("GEMINI_API_ENDPOINT"))
+    configure_limiter(
+        rpm=int(os.environ.get("GEMINI_RPM", RPM_LIMIT)),
+        tpm=int(os.environ.get("GEMINI_TPM", TPM_LIMIT)),
+        max_concurrency=int(os.environ.get("GEMINI_MAX_CONCURRENCY", MAX_CONCURRENCY)),
+    )
+
+
+def _write(path, data, binary=False):
+    """Atomar schreiben (halbfertige Dateien gelten beim Fortsetzen nicht als Ergebnis)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb" if binary else "w", **({} if binary else {"encoding": "utf-8"})) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _load_status(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATUS_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# ------------------------------------------------------------------------------
+# index
+# ------------------------------------------------------------------------------
+
+def cmd_index(args):
+    projects = list_projects(args.vault, set(args.projekt or []))
+    if not projects:
+        _log("Keine Projekte gefunden.")
+        return 0
+    embedder = load_embed_service(EMBEDDING_MODEL)
+    paths = vault_paths(args.vault)
+    chunk_store = ChunkStore(paths["chunks"])
+    failed = 0
+
+    def run(firma, projekt, p_path):
+        # Sperre: läuft parallel eine Indexierung aus der App, schlägt dieses Projekt fehl
+        with index_lock(p_path):
+            return index_project(
+                p_path, project_id(firma, projekt), embedder, open_project_store(p_path),
+                batch_size=args.batch_size, workers=args.embed_workers,
+                chunk_store=chunk_store, page_cache_dir=paths["pages"],
+            )
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(run, *p): p for p in projects}
+        for fut in as_completed(futures):
+            firma, projekt, _ = futures[fut]
+            try:
+                stats = fut.result()
+                _log(
+                    f"{firma}/{projekt}: {stats['added']} neu, {stats['updated']} geändert, "
+                    f"{stats['skipped']} übersprungen, {stats['removed']} entfernt, "
+                    f"{stats['reused']} aus dem Chunk-Speicher, "
+                    f"{stats['chunks']} Chunks in {stats['seconds']:.1f} s "
+                    f"(Extraktion {stats['extract_seconds']:.1f} s, Chunking {stats['chunk_seconds']:.1f} s, "
+                    f"Embedding {stats['embed_seconds']:.1f} s, Speichern {stats['store_seconds']:.1f} s, "
+                    f"Stichwortindex {stats['lexical_seconds']:.1f} s)"
+                )
+            except Exception as e:
+                failed += 1
+                _log(f"{firma}/{projekt}: FEHLER – {e}")
+    _log(f"Indexierung beendet: {len(projects) - failed} ok, {failed} fehlgeschlagen.")
+    return 1 if failed else 0
+
+
+# ------------------------------------------------------------------------------
+# check
+# ------------------------------------------------------------------------------
+
+def check_one(path, out_dir, collection, embedder, stammdaten, args, cache, lexical=None, history=None):
+    """Prüft einen Nachtrag; überspringt ihn, wenn status.json zum Datei-Hash passt."""
+    sha = source_sha256(path)
+    status = _load_status(out_dir)
+    if status and status.get("source_sha256") == sha and not args.force:
+        return "übersprungen"
+
+    os.makedirs(out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    with metrics.trace("check", project=os.path.basename(os.path.dirname(out_dir)), source=path) as tr:
+        result = pipeline.run_check(
+            [path], collection, embedder, stammdaten=stammdaten, eco=args.eco, cache=cache,
+            single_pass=args.single_pass, lexical=lexical, history=history, names=[os.path.basename(path)],
+            page_cache_dir=vault_paths(args.vault)["pages"],
+        )
+        _write(os.path.join(out_dir, "bericht.md"), result["report"])
+        _write(os.path.join(out_dir, "zusammenfassung.json"),
+               json.dumps(result["summary"], ensure_ascii=False, indent=2))
+        if args.template:
+            from io import BytesIO
+
+            workbook = load_template(args.template)
+            fill_deckblatt(workbook, result["summary"])
+            buf = BytesIO()
+            workbook.save(buf)
+            _write(os.path.join(out_dir, "deckblatt.xlsx"), buf.getvalue(), binary=True)
+    # Zuletzt: markiert den Nachtrag als fertig
+    _write(os.path.join(out_dir, STATUS_FILE), json.dumps({
+        "source": path,
+        "source_sha256": sha,
+        "questions": result["questions"],
+        "chunks": len(result["hits"]),
+        "prompt_tokens": result["usage"]["tokens"],
+        "mode": result["mode"],
+        "wiederverwendet": result.get("reused"),
+        "preis_check": {
+            "positionen": len(result["prices"]["positions"]),
+            "summe_angegeben": euro(result["prices"]["summe_angegeben"]),
+            "summe_korrigiert": euro(result["prices"]["summe_korrigiert"]),
+            "abweichungen": result["prices"]["issues"],
+        },
+        "seconds": round(time.perf_counter() - t0, 2),
+        "timing": [
+            {**row, "seconds": round(row["seconds"], 3)} for row in metrics.breakdown(tr.spans)
+        ],
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }, ensure_ascii=False, indent=2))
+    return "fertig"
+
+
+def cmd_check(args):
+    if "/" not in args.projekt:
+        raise SystemExit("--projekt erwartet 'Firma/Projekt'.")
+    firma, projekt = args.projekt.split("/", 1)
+    p_path = os.path.join(args.vault, firma, projekt)
+    if not os.path.isdir(p_path):
+        raise SystemExit(f"Projekt nicht gefunden: {p_path}")
+    nachtraege = list_nachtraege(args.nachtraege)
+    if not nachtraege:
+        _log("Keine Nachtrags-PDFs gefunden.")
+        return 0
+
+    configure_gemini()
+    paths = vault_paths(args.vault)
+    embedder = load_embed_service(EMBEDDING_MODEL)
+    collection = open_collection(p_path, project_id(firma, projekt), chunk_store=ChunkStore(paths["chunks"]))
+    lexical = load_lexical(index_dir(p_path))
+    stammdaten = pipeline.read_stammdaten(p_path)
+    cache = None if args.no_cache else LLMCache(paths["llm_cache"])
+    history = None if args.no_reuse else CheckHistory(p_path)
+    out_root = os.path.join(args.out, project_id(firma, projekt))
+    out_dirs = result_dirs(out_root, nachtraege)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(
+                check_one, path, out_dirs[path], collection, embedder, stammdaten, args, cache, lexical, history,
+            ): path
+            for path in nachtraege
+        }
+        for i, fut in enumerate(as_completed(futures), 1):
+            name = os.path.basename(futures[fut])
+            try:
+                _log(f"[{i}/{len(nachtraege)}] {name}: {fut.result()}")
+            except Exception as e:
+                failed += 1
+                _log(f"[{i}/{len(nachtraege)}] {name}: FEHLER – {e}")
+    _log(f"Prüfung beendet: {len(nachtraege) - failed} ok, {failed} fehlgeschlagen → {out_root}")
+    return 1 if failed else 0
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="python -m tgacode", description="der TGAcode – Stapelverarbeitung")
+    ap.add_argument("--vault", default=VAULT, help=f"Projektablage (Standard: {VAULT})")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    ix = sub.add_parser("index", help="Projekte inkrementell indexieren")
+    ix.add_argument("--projekt", action="append", help="nur dieses Projekt ('Firma/Projekt', mehrfach möglich)")
+    ix.add_argument("--workers", type=int, default=1, help="Projekte parallel")
+    ix.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    ix.add_argument("--embed-workers", type=int, default=None, help="Embedding-Prozesse je Projekt (Standard: automatisch)")
+    ix.set_defaults(func=cmd_index)
+
+    ck = sub.add_parser("check", help="Nachträge prüfen (Bericht, JSON, Deckblatt)")
+    ck.add_argument("nachtraege", nargs="+", help="Nachtrags-PDFs oder Ordner mit PDFs")
+    ck.add_argument("--projekt", required=True, help="'Firma/Projekt' im VAULT")
+    ck.add_argument("--out", required=True, help="Ausgabeordner")
+    ck.add_argument("--workers", type=int, default=2, help="Nachträge parallel (Gemini-Limiter gilt gemeinsam)")
+    ck.add_argument("--template", help="Excel-Deckblatt (.xlsx) mit Platzhaltern")
+    ck.add_argument("--eco", action="store_true", help="ohne Fragen-Agent (weniger KI-Aufrufe)")
+    ck.add_argument("--single-pass", action="store_true",
+                    help="Bericht und JSON in einem Schema-Aufruf (Fallback: zwei Schritte)")
+    ck.add_argument("--no-cache", action="store_true", help="LLM-Cache nicht verwenden")
+    ck.add_argument("--force", action="store_true", help="auch bereits geprüfte Nachträge neu prüfen")
+    ck.add_argument("--no-reuse", action="store_true",
+                    help="frühere Prüfungen geänderter Nachträge nicht wiederverwenden")
+    ck.set_defaults(func=cmd_check)
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    paths = vault_paths(args.vault)
+    previous = metrics.set_path(paths["metrics"]), llm.set_discovery_cache(paths["models"])
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        _log("Abgebrochen – erneuter Aufruf setzt fort.")
+        return 130
+    finally:
+        metrics.set_path(previous[0])
+        llm.set_discovery_cache(previous[1])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+# ==============================================================================
+# Gemeinsame Pfade (Streamlit-App und Hintergrundprozesse)
+# ==============================================================================
+
+import os
+
+VAULT = "vault_tgacode"
+
+
+def vault_paths(vault):
+    """Caches, Messpunkte und Katalog eines VAULT (Stapelverarbeitung: --vault)."""
+    cache_dir = os.path.join(vault, "_cache")
+    metrics_dir = os.path.join(vault, "_metrics")
+    return {
+        # Prozessübergreifende Caches liegen im VAULT, aber außerhalb der Firmenordner
+        "cache": cache_dir,
+        "pages": os.path.join(cache_dir, "pages"),
+        "llm_cache": os.path.join(cache_dir, "llm_cache.sqlite3"),
+        # Chunks + Embeddings je Dokumentinhalt, von allen Projekten geteilt
+        "chunks": os.path.join(cache_dir, "chunks"),
+        "models": os.path.join(cache_dir, "models.json"),
+        # Messpunkte (Spans) als JSON-Zeilen
+        "metrics_dir": metrics_dir,
+        "metrics": os.path.join(metrics_dir, "metrics.jsonl"),
+        # Projektkatalog (Firmen, Projekte, Dokumente, Stammdaten-Versionen)
+        "catalog": os.path.join(vault, "_catalog.sqlite3"),
+    }
+
+
+_paths = vault_paths(VAULT)
+CACHE_DIR = _paths["cache"]
+PAGE_CACHE_DIR = _paths["pages"]
+LLM_CACHE_PATH = _paths["llm_cache"]
+CHUNK_STORE_DIR = _paths["chunks"]
+MODELS_CACHE_PATH = _paths["models"]
+METRICS_DIR = _paths["metrics_dir"]
+METRICS_PATH = _paths["metrics"]
+CATALOG_PATH = _paths["catalog"]
@@ -0,0 +1,37 @@
+# ==============================================================================
+# Excel-Deckblatt: Platzhalter der Vorlage mit der JSON-Zusammenfassung befüllen
+# ==============================================================================
+
+from tgacode.metrics import span
+
+# Platzhalter in der Vorlage → Feld der JSON-Zusammenfassung
+PLACEHOLDERS = {
+    "[VOB_CHECK]": "vob_check",
+    "[TECHNISCHE_PRUEFUNG]": "technische_pruefung",
+    "[PREIS_CHECK]": "preis_check",
+    "[GESAMTSUMME_KORRIGIERT]": "gesamtsumme_korrigiert",
+    "[EMPFEHLUNG]": "empfehlung",
+    "[NAECHSTE_SCHRITTE]": "naechste_schritte",
+}
+
+
+def load_template(source):
+    """Lädt eine .xlsx-Vorlage (Pfad oder Datei-Objekt)."""
+    import openpyxl  # erst für das Deckblatt laden
+
+    return openpyxl.load_workbook(source)
+
+
+def fill_deckblatt(workbook, summary):
+    """Ersetzt die Platzhalter im aktiven Blatt. Liefert die Anzahl ersetzter Zellen."""
+    values = {ph: str(summary.get(field, "")) for ph, field in PLACEHOLDERS.items()}
+    replaced = 0
+    with span("excel.fill") as sp:
+        for row in workbook.active.iter_rows():
+            for cell in row:
+                if cell.value and isinstance(cell.value, str):
+                    if cell.value in values:
+                        cell.value = values[cell.value]
+                        replaced += 1
+        sp["cells"] = replaced
+    return replaced
@@ -0,0 +1,164 @@
+# ==============================================================================
+# Prozessweiter Embedding-Dienst (Micro-Batching über alle Sitzungen)
+# - Eine Warteschlange vor dem einen geladenen Modell: gleichzeitige Anfragen
+#   (Recherche-Fragen, Indexierungs-Batches) werden zu Micro-Batches gebündelt
+# - Kurze Höchstwartezeit, begrenzte Warteschlange mit Gegendruck
+#   (Aufrufer warten, bis Platz frei ist; nach QUEUE_TIMEOUT EmbedBusy)
+# - Latenz-Perzentile je Anfrage und Batch-Statistik für die Anzeige
+# - Gleiche encode()-Schnittstelle wie der SentenceTransformer
+# ==============================================================================
+
+import time
+import threading
+from collections import deque
+
+from tgacode.embedding import EMBED_BATCH_SIZE, load_embedder
+from tgacode.metrics import percentiles
+
+MAX_WAIT = 0.005  # s, die ein Batch auf weitere Anfragen wartet
+MAX_QUEUE = 2048  # Texte in der Warteschlange, danach Gegendruck
+QUEUE_TIMEOUT = 60.0
+STATS_WINDOW = 1000
+
+
+class EmbedBusy(RuntimeError):
+    """Die Warteschlange des Embedding-Dienstes ist dauerhaft voll."""
+
+
+class _Request:
+    __slots__ = ("texts", "done", "result", "error", "queued")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.queued = time.perf_counter()
+
+
+class EmbedService:
+    """
+    Bündelt encode()-Aufrufe aus beliebigen Threads. Anfragen werden nie geteilt:
+    ein Batch nimmt weitere auf, solange max_batch Texte nicht überschritten werden
+    und die älteste Anfrage höchstens max_wait wartet.
+    """
+
+    def __init__(self, embedder, max_batch=EMBED_BATCH_SIZE, max_wait=MAX_WAIT, max_queue=MAX_QUEUE,
+                 queue_timeout=QUEUE_TIMEOUT):
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._queue = deque()
+        self._queued_texts = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._latencies = deque(maxlen=STATS_WINDOW)
+        self._batch_texts = deque(maxlen=STATS_WINDOW)
+        self._batch_requests = deque(maxlen=STATS_WINDOW)
+        self._counts = {"requests": 0, "texts": 0, "batches": 0, "throttled": 0, "rejected": 0, "max_queue": 0}
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True, show_progress_bar=False):
+        """Wie SentenceTransformer.encode (numpy); blockiert bei voller Warteschlange."""
+        single = isinstance(texts, str)
+        req = _Request([texts] if single else list(texts))
+        if not req.texts:
+            return self.embedder.encode([], convert_to_numpy=True, show_progress_bar=False)
+        n = len(req.texts)
+        with self._cond:
+            if self._queued_texts and self._queued_texts + n > self.max_queue:
+                self._counts["throttled"] += 1
+                deadline = time.monotonic() + self.queue_timeout
+                while self._queued_texts and self._queued_texts + n > self.max_queue:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counts["rejected"] += 1
+                        raise EmbedBusy(f"Embedding-Warteschlange voll ({self._queued_texts} Texte).")
+                    self._cond.wait(remaining)
+            req.queued = time.perf_counter()
+            self._queue.append(req)
+            self._queued_texts += n
+            self._counts["max_queue"] = max(self._counts["max_queue"], self._queued_texts)
+            self._ensure_worker()
+            self._cond.notify_all()
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.result[0] if single else req.result
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._work, name="embed-service", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self):
+        """Nächster Micro-Batch (Aufrufer hält _cond, Warteschlange nicht leer)."""
+        deadline = self._queue[0].queued + self.max_wait
+        while True:
+            size = 0
+            count = 0
+            for req in self._queue:
+                if count and size + len(req.texts) > self.max_batch:
+                    break
+                size += len(req.texts)
+                count += 1
+            remaining = deadline - time.perf_counter()
+            if size >= self.max_batch or count < len(self._queue) or remaining <= 0:
+                break
+            self._cond.wait(remaining)
+        batch = [self._queue.popleft() for _ in range(count)]
+        self._queued_texts -= size
+        self._cond.notify_all()  # Platz für wartende Aufrufer
+        return batch
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                batch = self._take_batch()
+            texts = [t for req in batch for t in req.texts]
+            try:
+                vecs = self.embedder.encode(texts, batch_size=self.max_batch, convert_to_numpy=True,
+                                            show_progress_bar=False)
+                error = None
+            except Exception as e:
+                vecs, error = None, e
+            finished = time.perf_counter()
+            pos = 0
+            for req in batch:
+                if error is None:
+                    req.result = vecs[pos:pos + len(req.texts)]
+                req.error = error
+                pos += len(req.texts)
+                req.done.set()
+            with self._cond:
+                self._latencies.extend(finished - req.queued for req in batch)
+                self._batch_texts.append(len(texts))
+                self._batch_requests.append(len(batch))
+                self._counts["requests"] += len(batch)
+                self._counts["texts"] += len(texts)
+                self._counts["batches"] += 1
+
+    def stats(self):
+        """Latenz-Perzentile je Anfrage (s), Batch-Größen und Zähler der Warteschlange."""
+        with self._cond:
+            latencies = list(self._latencies)
+            texts = list(self._batch_texts)
+            requests = list(self._batch_requests)
+            counts = dict(self._counts)
+            queued = self._queued_texts
+        return {
+            **counts,
+            "queued": queued,
+            "latency": percentiles(latencies, digits=4),
+            "batch_texts": percentiles(texts, digits=1),
+            "mean_batch_texts": sum(texts) / len(texts) if texts else 0.0,
+            "mean_batch_requests": sum(requests) / len(requests) if requests else 0.0,
+        }
+
+
+def load_embed_service(model_name):
+    """Lädt das Modell und legt den Dienst davor (für Warmup/cache_resource)."""
+    return EmbedService(load_embedder(model_name))
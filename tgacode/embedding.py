@@ -0,0 +1,112 @@
+# ==============================================================================
+# Embedding-Pipeline
+# - Chunks werden in konfigurierbaren Batches encodiert (SentenceTransformer-Batching)
+# - Große Indexierungsjobs optional über einen Prozess-Pool verteilt
+# - Ergebnisse werden als begrenzte Batches gestreamt (flacher Speicherbedarf)
+# ==============================================================================
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import multiprocessing
+
+EMBED_BATCH_SIZE = 64
+EMBED_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+# Ab diesem Volumen (Summe der zu indexierenden PDF-Größen) lohnt der Prozess-Pool
+POOL_MIN_BYTES = 20 * 1024 * 1024
+
+# Pro Worker-Prozess geladenes Modell
+_worker_model = None
+
+
+def _init_worker(model_name, threads):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_in_worker(texts, batch_size):
+    return _worker_model.encode(
+        texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False
+    ).tolist()
+
+
+def load_embedder(model_name):
+    """SentenceTransformer laden (Import erst hier – zieht torch nach)."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def encode_texts(embedder, texts, batch_size=EMBED_BATCH_SIZE):
+    """Encodiert eine Liste von Texten in einem Aufruf; liefert Listen von Floats."""
+    if not texts:
+        return []
+    return embedder.encode(
+        list(texts), batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False
+    ).tolist()
+
+
+def _batched(items, n):
+    it = iter(items)
+    while True:
+        batch = list(islice(it, n))
+        if not batch:
+            return
+        yield batch
+
+
+def embed_stream(embedder, items, model_name, batch_size=EMBED_BATCH_SIZE, workers=1, stats=None):
+    """
+    Nimmt (id, text, metadaten)-Tupel entgegen und liefert
+    (ids, texte, metadaten, embeddings) je Batch –
+    immer in Eingabereihenfolge. Mit workers > 1 rechnen eigene Prozesse
+    (je ein Modell, Threads aufgeteilt); höchstens 2 Batches pro Worker sind
+    gleichzeitig unterwegs. stats erhält "embed_seconds" (Encode- bzw.
+    Pipeline-Zeit) und "chunks".
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("embed_seconds", 0.0)
+    stats.setdefault("chunks", 0)
+
+    if workers <= 1:
+        for batch in _batched(items, batch_size):
+            ids, docs, metas = (list(x) for x in zip(*batch))
+            t0 = time.perf_counter()
+            vecs = encode_texts(embedder, docs, batch_size)
+            stats["embed_seconds"] += time.perf_counter() - t0
+            stats["chunks"] += len(docs)
+            yield ids, docs, metas, vecs
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # spawn statt fork: torch-Threadpools vertragen keinen fork
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(model_name, threads)) as pool:
+        inflight = deque()
+
+        def pop():
+            ids, docs, metas, fut = inflight.popleft()
+            vecs = fut.result()
+            stats["chunks"] += len(docs)
+            return ids, docs, metas, vecs
+
+        # Im Pool-Modus zählt die Wandzeit der Pipeline (Worker rechnen parallel)
+        t0 = time.perf_counter()
+        try:
+            for batch in _batched(items, batch_size):
+                ids, docs, metas = (list(x) for x in zip(*batch))
+                inflight.append((ids, docs, metas, pool.submit(_encode_in_worker, docs, batch_size)))
+                if len(inflight) >= workers * 2:
+                    yield pop()
+            while inflight:
+                yield pop()
+        finally:
+            stats["embed_seconds"] += time.perf_counter() - t0
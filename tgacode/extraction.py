@@ -0,0 +1,222 @@
+# ==============================================================================
+# PDF-Textextraktion
+# - Seitentexte im Platten-Cache, Schlüssel = SHA-256 der Datei
+#   (dieselbe PDF wird nie zweimal geparst – auch nicht als Nachtrag-Upload)
+# - Parallel über einen Prozess-Pool, auf Datei- und Seitenebene
+# ==============================================================================
+
+import os
+import json
+import gzip
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+
+from tgacode.config import PAGE_CACHE_DIR
+from tgacode.metrics import span
+
+EXTRACT_WORKERS = max(1, os.cpu_count() or 1)
+# Große PDFs werden in Seitenbereiche dieser Länge aufgeteilt
+PAGES_PER_TASK = 25
+# Einzelne kleine PDF ohne Pool extrahieren (Pool-Start lohnt nicht)
+INLINE_MAX_BYTES = 2 * 1024 * 1024
+
+
+def _is_path(src):
+    return isinstance(src, (str, os.PathLike))
+
+
+def _source_bytes(src):
+    """Inhalt eines Uploads/Datei-Objekts (Position bleibt erhalten)."""
+    if hasattr(src, "getvalue"):
+        return src.getvalue()
+    pos = src.tell()
+    src.seek(0)
+    data = src.read()
+    src.seek(pos)
+    return data
+
+
+def source_sha256(src):
+    """SHA-256 eines Pfads oder Uploads."""
+    h = hashlib.sha256()
+    if _is_path(src):
+        with open(src, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    else:
+        h.update(_source_bytes(src))
+    return h.hexdigest()
+
+
+def _cache_file(cache_dir, sha):
+    return os.path.join(cache_dir, sha[:2], f"{sha}.json.gz")
+
+
+def load_cached_pages(sha, cache_dir=PAGE_CACHE_DIR):
+    """Seitentexte aus dem Cache oder None."""
+    try:
+        with gzip.open(_cache_file(cache_dir, sha), "rt", encoding="utf-8") as f:
+            return json.load(f)["pages"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def store_cached_pages(sha, pages, cache_dir=PAGE_CACHE_DIR):
+    path = _cache_file(cache_dir, sha)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump({"pages": pages}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # Cache ist optional
+
+
+def _open_reader(src):
+    return PdfReader(src if _is_path(src) else BytesIO(src))
+
+
+def _extract_from(reader, start, stop):
+    pages = reader.pages
+    out = []
+    for i in range(start, len(pages) if stop is None else min(stop, len(pages))):
+        try:
+            out.append(pages[i].extract_text() or "")
+        except Exception:
+            out.append("")
+    return out
+
+
+def _extract_range(src, start=0, stop=None):
+    """Extrahiert Seiten [start, stop); fehlerhafte Seiten liefern ''. src = Pfad oder Bytes."""
+    return _extract_from(_open_reader(src), start, stop)
+
+
+def _extract_first(src, stop):
+    """(Seiten [0, stop), Seitenzahl): der erste Bereich liefert die Seitenzahl mit (ein Parse im Worker)."""
+    reader = _open_reader(src)
+    return _extract_from(reader, 0, stop), len(reader.pages)
+
+
+def _source_size(src):
+    return os.path.getsize(src) if _is_path(src) else len(src)
+
+
+def extract_pages(src, sha=None, cache_dir=PAGE_CACHE_DIR):
+    """Seitentexte einer PDF (Pfad oder Upload), über den Cache."""
+    sha = sha or source_sha256(src)
+    pages = load_cached_pages(sha, cache_dir)
+    if pages is None:
+        try:
+            pages = _extract_range(src if _is_path(src) else _source_bytes(src))
+        except Exception:
+            return []
+        store_cached_pages(sha, pages, cache_dir)
+    return pages
+
+
+def pages_to_text(pages):
+    return "".join(t + "\n" for t in pages if t)
+
+
+def read_pdf(file):
+    """Extrahiert Text aus PDF-Datei (gecacht über den Datei-Hash)."""
+    with span("pdf.extract", files=1) as sp:
+        pages = extract_pages(file)
+        sp["pages"] = len(pages)
+    return pages_to_text(pages)
+
+
+def iter_extracted(sources, shas=None, workers=EXTRACT_WORKERS, cache_dir=PAGE_CACHE_DIR):
+    """
+    Generator: Seitentexte je Quelle, in Eingabereihenfolge.
+    Gecachte Dateien kommen direkt aus dem Cache; der Rest wird im Prozess-Pool
+    extrahiert, große PDFs in Seitenbereichen (PAGES_PER_TASK) verteilt. Die
+    Seitenzahl liefert der erste Bereich aus dem Worker; die übrigen Bereiche
+    werden eingeplant, sobald er fertig ist (kein Parse im Hauptprozess).
+    Höchstens 2 Dateien pro Worker sind gleichzeitig in Arbeit.
+    """
+    sources = list(sources)
+    shas = list(shas) if shas else [None] * len(sources)
+    if workers <= 1 or len(sources) == 0:
+        for src, sha in zip(sources, shas):
+            yield extract_pages(src, sha, cache_dir)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    pool = None
+    inflight = deque()
+
+    # Einträge: {"sha", "pages"} fertig bzw. {"sha", "pages": None, "first", "data"} → {"parts"}
+    def spread(entry):
+        first = entry.pop("first")
+        try:
+            _, n = first.result()
+        except Exception:
+            n = 0
+        entry["parts"] = [first] + [
+            pool.submit(_extract_range, entry["data"], i, i + PAGES_PER_TASK)
+            for i in range(PAGES_PER_TASK, n, PAGES_PER_TASK)
+        ]
+        entry["data"] = None
+
+    def spread_done():
+        for entry in inflight:
+            if "first" in entry and entry["first"].done():
+                spread(entry)
+
+    def finish():
+        entry = inflight[0]
+        while "first" in entry:
+            # Auch andere Dateien verteilen, während auf den ersten Bereich gewartet wird
+            wait([e["first"] for e in inflight if "first" in e], return_when=FIRST_COMPLETED)
+            spread_done()
+        inflight.popleft()
+        if entry["pages"] is not None:
+            return entry["pages"]
+        try:
+            first, *rest = entry["parts"]
+            pages = first.result()[0] + [t for fut in rest for t in fut.result()]
+        except Exception:
+            return []
+        store_cached_pages(entry["sha"], pages, cache_dir)
+        return pages
+
+    try:
+        uncached = 0
+        for src, sha in zip(sources, shas):
+            while len(inflight) >= workers * 2:
+                yield finish()
+            sha = sha or source_sha256(src)
+            cached = load_cached_pages(sha, cache_dir)
+            if cached is not None:
+                inflight.append({"sha": sha, "pages": cached})
+                continue
+            data = src if _is_path(src) else _source_bytes(src)
+            uncached += 1
+            if pool is None and uncached == 1 and _source_size(data) <= INLINE_MAX_BYTES:
+                # Einzelne kleine PDF: Pool-Start lohnt nicht
+                try:
+                    pages = _extract_range(data)
+                    store_cached_pages(sha, pages, cache_dir)
+                except Exception:
+                    pages = []
+                inflight.append({"sha": sha, "pages": pages})
+            else:
+                if pool is None:
+                    pool = ProcessPoolExecutor(workers, mp_context=ctx)
+                inflight.append({"sha": sha, "pages": None, "data": data,
+                                 "first": pool.submit(_extract_first, data, PAGES_PER_TASK)})
+            spread_done()
+        while inflight:
+            yield finish()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
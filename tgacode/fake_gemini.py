@@ -0,0 +1,249 @@
+# ==============================================================================
+# Lokaler Fake-Endpunkt für die Gemini-REST-API (Tests & Benchmarks)
+# - Modelle auflisten, generateContent (Text und JSON mit Schema)
+# - streamGenerateContent: JSON-Array in Stücken, Latenz auf die Stücke verteilt
+# - Konfigurierbare Latenz, Server-Quota (Requests/Minute) und zufällige 429
+#
+# Start:  python -m tgacode.fake_gemini --port 8765 --rpm 10 --latency 0.5
+# App:    GEMINI_API_ENDPOINT = "http://127.0.0.1:8765" in .streamlit/secrets.toml
+# ==============================================================================
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODELS = ("models/gemini-fake-flash", "models/gemini-fake-pro")
+
+
+class FakeGeminiState:
+    """Konfiguration und Zähler des Fake-Servers (thread-sicher)."""
+
+    def __init__(self, latency=0.2, rpm=0, error_rate=0.0, retry_after=2.0, models=DEFAULT_MODELS,
+                 reject_schema=False):
+        self.latency = latency
+        self.reject_schema = reject_schema  # wie Modelle ohne response_schema-Unterstützung
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.models = list(models)
+        self.requests = 0
+        self.rejected = 0
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """None → Anfrage zulassen, sonst Retry-After in Sekunden."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            while self._window and now - self._window[0] > 60.0:
+                self._window.popleft()
+            if self.rpm and len(self._window) >= self.rpm:
+                self.rejected += 1
+                return max(0.1, 60.0 - (now - self._window[0]))
+            if self.error_rate and random.random() < self.error_rate:
+                self.rejected += 1
+                return self.retry_after
+            self._window.append(now)
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "rejected": self.rejected}
+
+
+def _prompt_text(body):
+    parts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+
+# Schema-Typen kommen über REST als Enum-Zahl oder Name
+_SCHEMA_TYPES = {1: "string", 2: "number", 3: "integer", 4: "boolean", 5: "array", 6: "object"}
+
+
+def _fake_value(schema, prompt):
+    kind = (schema or {}).get("type", "string")
+    kind = _SCHEMA_TYPES.get(kind, "string") if isinstance(kind, int) else str(kind).lower()
+    if kind == "object":
+        return {
+            k: fake_answer(prompt, {}) if k == "bericht" else _fake_value(v, prompt)
+            for k, v in (schema.get("properties") or {}).items()
+        }
+    if kind == "array":
+        return [_fake_value(schema.get("items"), prompt)]
+    if kind in ("number", "integer"):
+        return 0
+    if kind == "boolean":
+        return False
+    return f"Fake-Wert ({len(prompt)} Zeichen Prompt)"
+
+
+def fake_answer(prompt, generation_config):
+    """Deterministische Antwort passend zum Prompt-Typ."""
+    if generation_config.get("responseMimeType") == "application/json":
+        schema = generation_config.get("responseSchema") or {
+            "type": "object",
+            "properties": {k: {"type": "string"} for k in re.findall(r"\b([a-z]+(?:_[a-z]+)+)\b", prompt)[:8]},
+        }
+        return json.dumps(_fake_value(schema, prompt), ensure_ascii=False)
+    if "Liste der Fragen" in prompt:
+        return "\n".join(f"{i}. Welche Vereinbarung gilt für Kernforderung {i}?" for i in range(1, 4))
+    if "ZU ÜBERARBEITENDE ABSCHNITTE" in prompt:
+        # Abschnitts-Überarbeitung: nur die angeforderten Überschriften zurückgeben
+        block = prompt.split("ZU ÜBERARBEITENDE ABSCHNITTE:", 1)[1].split("\n---\n", 2)[1]
+        headings = [line for line in block.splitlines() if line.startswith("#")]
+        return "\n\n".join(f"{h}\nÜberarbeitet nach Korrekturen." for h in headings) + "\n"
+    return (
+        "# Prüfbericht (Fake)\n\n"
+        "## Zusammenfassung\n- Nachtrag geprüft\n- Kontext berücksichtigt\n\n"
+        "## VOB/B-Konformitäts-Check\nKeine Auffälligkeiten.\n\n"
+        "## Technische Prüfung & Preis-Check\nPositionen plausibel.\n\n"
+        "## Empfehlung & Nächste Schritte\nFreigabe unter Vorbehalt.\n"
+    )
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, payload, headers=None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/v1beta/models":
+                self._send(200, {"models": [
+                    {"name": m, "inputTokenLimit": 1_048_576, "outputTokenLimit": 8192,
+                     "supportedGenerationMethods": ["generateContent", "streamGenerateContent", "countTokens"]}
+                    for m in state.models
+                ]})
+            elif path == "/stats":
+                self._send(200, state.stats())
+            else:
+                self._send(404, {"error": {"code": 404, "message": f"{path} not found", "status": "NOT_FOUND"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            m = re.match(r"^/v1beta/(models/[^:]+):(\w+)", self.path.split("?")[0])
+            if not m or m.group(1) not in state.models:
+                return self._send(404, {"error": {"code": 404, "message": "model not found", "status": "NOT_FOUND"}})
+            model, method = m.groups()
+            prompt = _prompt_text(body)
+            if method == "countTokens":
+                return self._send(200, {"totalTokens": max(1, len(prompt) // 4)})
+            if method not in ("generateContent", "streamGenerateContent"):
+                return self._send(404, {"error": {"code": 404, "message": f"{method} not found", "status": "NOT_FOUND"}})
+
+            retry = state.admit()
+            if retry is not None:
+                return self._send(429, {"error": {
+                    "code": 429,
+                    "message": f"Resource has been exhausted (e.g. check quota). Please retry in {retry:.1f}s.",
+                    "status": "RESOURCE_EXHAUSTED",
+                }}, headers={"Retry-After": f"{retry:.1f}"})
+
+            config = body.get("generationConfig") or {}
+            if state.reject_schema and config.get("responseSchema"):
+                return self._send(400, {"error": {
+                    "code": 400, "message": "response_schema is not supported for this model",
+                    "status": "INVALID_ARGUMENT",
+                }})
+            text = fake_answer(prompt, config)
+            if method == "streamGenerateContent":
+                return self._stream(model, prompt, text)
+            time.sleep(state.latency)
+            self._send(200, _response(model, prompt, text))
+
+        def _stream(self, model, prompt, text):
+            # Erstes Stück nach einem Fünftel der Latenz, der Rest verteilt sich auf die Zeilen
+            pieces = [line + "\n" for line in text.split("\n")]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(state.latency * 0.2)
+            delay = state.latency * 0.8 / max(1, len(pieces))
+            sent = ""
+            for i, piece in enumerate(pieces):
+                sent += piece
+                # usageMetadata wie bei Gemini kumuliert (letztes Stück = Gesamtverbrauch)
+                payload = _response(model, prompt, piece, final=i == len(pieces) - 1, generated=sent)
+                data = (("[" if i == 0 else ",") + json.dumps(payload)).encode("utf-8")
+                self._chunk(data)
+                time.sleep(delay)
+            self._chunk(b"]")
+            self._chunk(b"")
+
+        def _chunk(self, data):
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def _response(model, prompt, text, final=True, generated=None):
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if final:
+        candidate["finishReason"] = "STOP"
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": max(1, len(prompt) // 4),
+            "candidatesTokenCount": max(1, len(generated or text) // 4),
+            "totalTokenCount": max(1, (len(prompt) + len(generated or text)) // 4),
+        },
+        "modelVersion": model.split("/", 1)[1],
+    }
+
+
+def start_fake_server(port=0, **config):
+    """Startet den Fake-Server im Hintergrund. Liefert (server, state, url)."""
+    state = FakeGeminiState(**config)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Lokaler Fake-Endpunkt für die Gemini-REST-API")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.2, help="Antwortzeit in Sekunden")
+    ap.add_argument("--rpm", type=int, default=0, help="Server-Quota in Requests/Minute (0 = unbegrenzt)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Anteil zufälliger 429-Antworten")
+    ap.add_argument("--retry-after", type=float, default=2.0)
+    ap.add_argument("--reject-schema", action="store_true", help="response_schema mit 400 ablehnen")
+    args = ap.parse_args(argv)
+    server, state, url = start_fake_server(
+        args.port, latency=args.latency, rpm=args.rpm,
+        error_rate=args.error_rate, retry_after=args.retry_after, reject_schema=args.reject_schema,
+    )
+    print(f"Fake-Gemini läuft auf {url} (Strg+C beendet)")
+    try:
+        while True:
+            time.sleep(5)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(state.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# ==============================================================================
+# Prüfhistorie je Projekt (Wiederverwendung bei erneut eingereichten Nachträgen)
+# - Jede Prüfung wird mit Nachtragstext, Fragen, Recherche-Treffern, Bericht und
+#   JSON-Zusammenfassung unter _index/pruefungen abgelegt
+# - Text-Embedding je Prüfung (Mittel über Textabschnitte) im Verzeichnis-Index
+# - Neuer Nachtrag: Vorauswahl per Kosinus-Ähnlichkeit, Bestätigung per
+#   Zeilen-Diff; kompakter Diff (alt/neu) für den Prompt
+# - Wortgleiche Nachträge deckt weiterhin der LLM-Cache ab (gleiche Prompts)
+# - index.json wird unter einer Sperrdatei fortgeschrieben (mehrere App-Prozesse/CLI)
+# ==============================================================================
+
+import os
+import gzip
+import json
+import time
+import difflib
+import hashlib
+import threading
+
+from tgacode.embedding import encode_texts
+from tgacode.indexing import file_lock, index_dir
+
+HISTORY_DIRNAME = "pruefungen"
+INDEX_NAME = "index.json"
+LOCK_NAME = "index.lock"
+HISTORY_VERSION = 1
+MAX_RECORDS = 50  # je Projekt; älteste fallen raus
+
+MIN_SIMILARITY = 0.9  # Kosinus der Text-Embeddings (Vorauswahl)
+MIN_TEXT_RATIO = 0.8  # Anteil gleicher Zeilen (difflib) für eine Wiederverwendung
+CANDIDATES = 3  # Vorauswahl, die per Zeilen-Diff verglichen wird
+VECTOR_PIECE_CHARS = 1000
+VECTOR_MAX_PIECES = 16
+DIFF_CONTEXT = 1  # unveränderte Zeilen rund um eine Änderung
+DIFF_MAX_LINES = 200
+
+
+def text_sha(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _lines(text):
+    """Zeilen ohne Leerzeilen, Leerraum vereinheitlicht (PDF-Extraktion schwankt)."""
+    return [" ".join(line.split()) for line in (text or "").splitlines() if line.strip()]
+
+
+def text_vector(embedder, text):
+    """
+    Normiertes Mittel der Embeddings gleichmäßig verteilter Textabschnitte.
+    Abschnitte enden an Zeilengrenzen: eine geänderte Zeile verschiebt nur ihren Abschnitt.
+    """
+    import numpy as np
+
+    pieces, current = [], ""
+    for line in _lines(text):
+        current = f"{current}\n{line}" if current else line
+        if len(current) >= VECTOR_PIECE_CHARS:
+            pieces.append(current)
+            current = ""
+    pieces = pieces + [current] if current or not pieces else pieces
+    if len(pieces) > VECTOR_MAX_PIECES:
+        step = len(pieces) / VECTOR_MAX_PIECES
+        pieces = [pieces[int(i * step)] for i in range(VECTOR_MAX_PIECES)]
+    vec = np.asarray(encode_texts(embedder, pieces), dtype=np.float32).mean(axis=0)
+    norm = float(np.linalg.norm(vec))
+    return (vec / norm if norm else vec).tolist()
+
+
+def compare_texts(old, new, context=DIFF_CONTEXT, max_lines=DIFF_MAX_LINES):
+    """
+    {"ratio", "diff", "added", "changed_lines"}: Anteil gleicher Zeilen, kompakter
+    Diff (- alt / + neu, wenige Kontextzeilen) und die neuen Zeilen als Text.
+    """
+    a, b = _lines(old), _lines(new)
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    ratio = matcher.ratio()
+    out, added, changed = [], [], 0
+    for group in matcher.get_grouped_opcodes(context):
+        if out:
+            out.append("…")
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                out.extend(f"  {line}" for line in a[i1:i2])
+                continue
+            out.extend(f"- {line}" for line in a[i1:i2])
+            out.extend(f"+ {line}" for line in b[j1:j2])
+            added.extend(b[j1:j2])
+            changed += max(i2 - i1, j2 - j1)
+    if len(out) > max_lines:
+        out = out[:max_lines] + [f"[… {len(out) - max_lines} weitere Diff-Zeilen …]"]
+    return {"ratio": ratio, "diff": "\n".join(out), "added": "\n".join(added), "changed_lines": changed}
+
+
+def _dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+class CheckHistory:
+    """
+    Abgeschlossene Prüfungen eines Projekts: ein gz-JSON je Prüfung (Schlüssel =
+    Hash des Nachtragstexts) und index.json mit Embedding und Kopfdaten aller Einträge.
+    """
+
+    def __init__(self, project_path, max_records=MAX_RECORDS):
+        self.root = os.path.join(index_dir(project_path), HISTORY_DIRNAME)
+        self.max_records = max_records
+
+    def _path(self, rid):
+        return os.path.join(self.root, f"{rid}.json.gz")
+
+    def entries(self):
+        """Kopfdaten (id, created, names, nt_sha256, vector), neueste zuerst."""
+        try:
+            with open(os.path.join(self.root, INDEX_NAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if not isinstance(data, dict) or data.get("version") != HISTORY_VERSION:
+            return []
+        return sorted(data["entries"], key=lambda e: -e["created"])
+
+    def _write_index(self, entries):
+        path = os.path.join(self.root, INDEX_NAME)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": HISTORY_VERSION, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def load(self, rid):
+        """Vollständiger Eintrag oder None."""
+        try:
+            with gzip.open(self._path(rid), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def add(self, check, vector, names=()):
+        """
+        Legt die Prüfung ab (gleicher Nachtragstext ersetzt den alten Eintrag).
+        Fehler schlucken: die Historie ist optional. Liefert die ID oder None.
+        """
+        nt_sha = text_sha(check["nt_text"])
+        rid = nt_sha[:16]
+        record = {
+            "version": HISTORY_VERSION, "id": rid, "created": time.time(), "names": list(names),
+            "nt_sha256": nt_sha, "nt_text": check["nt_text"], "questions": check.get("questions") or [],
+            "hits": check.get("hits") or [], "final_ctx": check.get("final_ctx") or "",
+            "report": check.get("report") or "", "summary": check.get("summary"), "mode": check.get("mode"),
+        }
+        head = {k: record[k] for k in ("id", "created", "names", "nt_sha256")}
+        head["vector"] = [round(float(x), 5) for x in vector]
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp = f"{self._path(rid)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False, default=float)
+            os.replace(tmp, self._path(rid))
+            # Lesen–Ändern–Schreiben prozessübergreifend sperren (TimeoutError ist ein OSError)
+            with file_lock(os.path.join(self.root, LOCK_NAME)):
+                entries = [head] + [e for e in self.entries() if e["id"] != rid]
+                for old in entries[self.max_records:]:
+                    try:
+                        os.remove(self._path(old["id"]))
+                    except OSError:
+                        pass
+                self._write_index(entries[:self.max_records])
+        except OSError:
+            return None
+        return rid
+
+    def find_similar(self, nt_text, vector, min_similarity=MIN_SIMILARITY, min_ratio=MIN_TEXT_RATIO):
+        """
+        Nächste frühere Prüfung eines geänderten Nachtrags oder None (wortgleiche
+        Texte zählen nicht): Kandidaten nach Kosinus-Ähnlichkeit, davon die mit dem
+        höchsten Zeilenanteil (mindestens min_ratio). Treffer:
+        {"record", "similarity", "ratio", "diff", "added", "changed_lines"}.
+        """
+        nt_sha = text_sha(nt_text)
+        scored = []
+        for e in self.entries():
+            if e["nt_sha256"] == nt_sha:
+                continue
+            sim = _dot(vector, e["vector"])
+            if sim >= min_similarity:
+                scored.append((sim, e))
+        scored.sort(key=lambda se: -se[0])
+        best = None
+        for sim, e in scored[:CANDIDATES]:
+            record = self.load(e["id"])
+            if record is None:
+                continue
+            cmp = compare_texts(record["nt_text"], nt_text)
+            if cmp["ratio"] >= min_ratio and (best is None or cmp["ratio"] > best["ratio"]):
+                best = {"record": record, "similarity": sim, **cmp}
+        return best
@@ -0,0 +1,502 @@
+# ==============================================================================
+# Projektwissen: PDF-Extraktion & inkrementelle Indexierung (ChromaDB)
+# - Manifest pro Projekt (_index/manifest.json): Hash, mtime, Größe, Chunk-IDs
+# - Nur neue/geänderte PDFs werden extrahiert (Seiten-Cache) und eingebettet
+# - Chunks entfernter PDFs werden gezielt gelöscht
+# - Embeddings batchweise (optional Prozess-Pool), gestreamt in die Collection
+# - Zeit je Stufe (Extraktion, Chunking, Embedding, Speichern) in den Statistiken
+# - Sperrdatei pro Projekt: nie zwei Indexierungen derselben Collection gleichzeitig
+#   (auch nicht App und Stapelverarbeitung)
+# - Lexikalischer BM25-Index über dieselben Chunks (_index/lexical.json.gz)
+# - Kleine Projekte: quantisierte Embedding-Matrix für NumPy-Abfragen (tgacode.vecstore)
+# - Gemeinsamer Chunk-Speicher (tgacode.chunkstore): bekannte Dokumente werden
+#   übernommen statt erneut extrahiert und eingebettet – nur als Verweis im
+#   Manifest ("shared"), ohne Kopie in der Collection
+# ==============================================================================
+
+import os
+import re
+import json
+import time
+import socket
+import hashlib
+from collections import deque
+from contextlib import contextmanager
+
+from tgacode import metrics
+from tgacode.chunking import CHUNK_OVERLAP, CHUNK_WORDS, chunk_metadata, iter_chunks
+from tgacode.chunkstore import ChunkStore, chunk_key
+from tgacode.config import PAGE_CACHE_DIR
+from tgacode.embedding import EMBED_BATCH_SIZE, EMBED_WORKERS, POOL_MIN_BYTES, embed_stream
+from tgacode.extraction import EXTRACT_WORKERS, iter_extracted, source_sha256
+from tgacode.lexical import LexicalIndex
+from tgacode.vecstore import NUMPY_MAX_CHUNKS, sync_store
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+INDEX_DIRNAME = "_index"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "indexing.lock"
+LOCK_STALE_SECONDS = 6 * 3600  # danach gilt eine Sperre als verwaist
+# v2: seitenweises Chunking mit Überlappung und Quellen-Metadaten
+MANIFEST_VERSION = 2
+# Chunks je Collection-Aufruf beim Kopieren aus dem Chunk-Speicher
+REUSE_BATCH = 1000
+
+
+def index_dir(project_path):
+    """Verzeichnis für Index-Metadaten eines Projekts (durch '_' in der Akte ausgeblendet)."""
+    return os.path.join(project_path, INDEX_DIRNAME)
+
+
+def chunking_params(size, overlap):
+    return {"size": size, "overlap": overlap}
+
+
+def _empty_manifest(model_name, chunking):
+    return {"version": MANIFEST_VERSION, "embedding_model": model_name, "chunking": chunking, "files": {}}
+
+
+def load_manifest(project_path):
+    """Lädt das Index-Manifest. Fehlend oder unlesbar → None."""
+    path = os.path.join(index_dir(project_path), MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(project_path, manifest):
+    """Schreibt das Manifest atomar (tmp-Datei + os.replace)."""
+    os.makedirs(index_dir(project_path), exist_ok=True)
+    path = os.path.join(index_dir(project_path), MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+class IndexBusy(RuntimeError):
+    """Das Projekt wird bereits (in einem anderen Thread oder Prozess) indexiert."""
+
+
+def _lock_stale(path, stale_seconds=LOCK_STALE_SECONDS):
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        return True
+    except OSError:
+        return False  # Sperre nicht lesbar – im Zweifel nicht brechen
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            owner = json.load(f)
+    except FileNotFoundError:
+        return True
+    except (OSError, ValueError):
+        return age > min(60, stale_seconds)  # gerade angelegt und noch nicht beschrieben
+    if age > stale_seconds:
+        return True
+    # Prozess auf diesem Rechner beendet? (os.kill(pid, 0) beendet unter Windows den Prozess)
+    if os.name != "nt" and owner.get("host") == socket.gethostname():
+        try:
+            os.kill(int(owner.get("pid", 0)), 0)
+        except ProcessLookupError:
+            return True
+        except (OSError, ValueError):
+            pass
+    return False
+
+
+def _try_lock(path, stale_seconds=LOCK_STALE_SECONDS):
+    """Legt die Sperrdatei exklusiv an (verwaiste werden ersetzt). True bei Erfolg."""
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if not _lock_stale(path, stale_seconds):
+                return False
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    else:
+        return False
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getpid(), "host": socket.gethostname(), "since": time.time()}, f)
+    return True
+
+
+def _unlock(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@contextmanager
+def index_lock(project_path):
+    """Exklusive Indexierung eines Projekts; löst IndexBusy aus, wenn bereits gesperrt."""
+    os.makedirs(index_dir(project_path), exist_ok=True)
+    path = os.path.join(index_dir(project_path), LOCK_NAME)
+    if not _try_lock(path):
+        raise IndexBusy(f"Projekt wird bereits indexiert ({path}).")
+    try:
+        yield
+    finally:
+        _unlock(path)
+
+
+@contextmanager
+def file_lock(path, timeout=10.0, stale_seconds=60):
+    """
+    Kurze exklusive Sperre über eine Sperrdatei (Threads und Prozesse, auch auf
+    dem Netzlaufwerk); wartet bis timeout, dann TimeoutError.
+    """
+    deadline = time.monotonic() + timeout
+    while not _try_lock(path, stale_seconds):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Sperre nicht erhalten ({path}).")
+        time.sleep(0.02)
+    try:
+        yield
+    finally:
+        _unlock(path)
+
+
+def list_project_pdfs(path):
+    """Alle PDFs der Projekt-Akte (Dateiname → Pfad)."""
+    if not os.path.isdir(path):
+        return {}
+    return {
+        f: os.path.join(path, f)
+        for f in sorted(os.listdir(path))
+        if f.lower().endswith(".pdf") and os.path.isfile(os.path.join(path, f))
+    }
+
+
+def project_id(firma, projekt):
+    """Projekt-ID wie in der App (Basis für den Collection-Namen)."""
+    return f"{firma}_{projekt}".replace(" ", "_")
+
+
+def collection_name(p_id):
+    """Chroma-taugliche Collection-ID (3-512 Zeichen aus [a-zA-Z0-9._-], alphanumerisch am Rand)."""
+    name = re.sub(r"[^a-zA-Z0-9._-]", "_", p_id).strip("._-")
+    if name != p_id or len(name) < 3:
+        # Umlaute/Sonderzeichen ersetzt → Kurz-Hash gegen Kollisionen anhängen
+        name = f"{name or 'projekt'}_{hashlib.sha1(p_id.encode('utf-8')).hexdigest()[:8]}"
+    return name[:512]
+
+
+def _delete_ids(col, ids):
+    if ids:
+        col.delete(ids=list(ids))
+
+
+def _delete_entry(col, entry):
+    """Entfernt die Chunks einer Datei aus der Collection (geteilte liegen nicht darin)."""
+    if not entry.get("shared"):
+        _delete_ids(col, entry.get("chunk_ids", []))
+
+
+def _collection_ids(files):
+    return [cid for e in files.values() if not e.get("shared") for cid in e.get("chunk_ids", [])]
+
+
+def _documents(col, store, entry):
+    """Chunk-Texte einer Datei: aus dem Chunk-Speicher, sonst aus der Collection."""
+    ids = entry.get("chunk_ids", [])
+    stored = store.texts(entry["chunk_key"]) if entry.get("chunk_key") else None
+    if stored is not None and len(stored[0]) == len(ids):
+        return stored[0]
+    # Chroma garantiert keine Reihenfolge
+    got = col.get(ids=list(ids), include=["documents"])
+    texts = dict(zip(got.get("ids") or [], got.get("documents") or []))
+    return [texts.get(i) for i in ids]
+
+
+def _backfill_chunk_store(col, files, store, model_name, chunking):
+    """
+    Trägt indexierte Dateien ohne chunk_key (ältere Indizes) aus der Collection
+    in den Chunk-Speicher ein – einmalig, ohne neu einzubetten. Geteilte Dateien
+    stehen schon darin. True bei Änderung.
+    """
+    changed = False
+    for entry in files.values():
+        ids = entry.get("chunk_ids", [])
+        if entry.get("chunk_key") or entry.get("shared") or not ids or not entry.get("sha256"):
+            continue
+        key = chunk_key(entry["sha256"], model_name, chunking)
+        if not store.has(key):
+            got = col.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+            rows = {cid: (doc, meta, vec) for cid, doc, meta, vec
+                    in zip(got["ids"], got["documents"], got["metadatas"], got["embeddings"])}
+            if any(cid not in rows for cid in ids):
+                continue
+            rows = [rows[cid] for cid in ids]
+            store.put(key, [r[0] for r in rows],
+                      [(r[1].get("page_start"), r[1].get("page_end")) for r in rows],
+                      [r[2] for r in rows])
+        entry["chunk_key"] = key
+        changed = True
+    return changed
+
+
+def _reconcile(col, files, store):
+    """
+    Gleicht Manifest, Collection und Chunk-Speicher ab (z. B. nach abgebrochenem
+    Lauf oder geleertem Speicher): Dateien mit fehlenden Chunks fliegen aus dem
+    Manifest (→ Neuindexierung), Chunks ohne Manifest-Eintrag werden gelöscht.
+    """
+    present = set(col.get(include=[]).get("ids", []))
+    known = set()
+    for name in list(files):
+        entry = files[name]
+        ids = entry.get("chunk_ids", [])
+        if entry.get("shared"):
+            stored = store.texts(entry.get("chunk_key", ""))
+            if stored is None or len(stored[0]) != len(ids):
+                del files[name]
+        elif all(i in present for i in ids):
+            known.update(ids)
+        else:
+            del files[name]
+    _delete_ids(col, present - known)
+
+
+def _unshare(col, files, store):
+    """
+    Kopiert geteilte Dateien in die Collection – nur, wenn die Recherche ohne
+    Verweis-Speicher auskommen muss (Projekt über NUMPY_MAX_CHUNKS oder ein
+    Eintrag fehlt im Chunk-Speicher). True bei Änderung.
+    """
+    changed = False
+    for name, entry in files.items():
+        loaded = store.load(entry["chunk_key"]) if entry.get("shared") else None
+        if loaded is None:
+            continue
+        texts, pages, vecs = loaded
+        ids = entry["chunk_ids"]
+        for i in range(0, len(ids), REUSE_BATCH):
+            sl = slice(i, i + REUSE_BATCH)
+            col.add(ids=ids[sl], documents=texts[sl],
+                    metadatas=[chunk_metadata(name, a, b) for a, b in pages[sl]],
+                    embeddings=vecs[sl].astype("float32").tolist())
+        del entry["shared"]
+        changed = True
+    return changed
+
+
+def index_project(path, p_id, embedder, chroma_client, model_name=EMBEDDING_MODEL,
+                  batch_size=EMBED_BATCH_SIZE, workers=None,
+                  chunk_size=CHUNK_WORDS, chunk_overlap=CHUNK_OVERLAP, progress=None, chunk_store=None,
+                  page_cache_dir=PAGE_CACHE_DIR):
+    """
+    Inkrementelle Indexierung der Projekt-PDFs in ChromaDB.
+    1) Unveränderte Dateien (mtime/Größe bzw. Hash gleich) werden übersprungen.
+    2) Neue/geänderte Dateien werden extrahiert, seitenweise gechunkt (Überlappung,
+       Quelle + Seitenbereich als Metadaten) und batchweise eingebettet;
+       die Embeddings werden in begrenzten Batches in die Collection gestreamt.
+    3) Chunks gelöschter Dateien werden aus der Collection entfernt.
+    4) Der lexikalische Index folgt denselben Chunks; fehlt er (ältere Indizes),
+       wird er aus den gespeicherten Texten (Chunk-Speicher bzw. Collection)
+       nachgetragen – ohne neu einzubetten.
+    5) Bis NUMPY_MAX_CHUNKS wird auf den Chunk-Speicher verwiesen (bzw. die
+       quantisierte Matrix aus der Collection abgeleitet).
+    Dokumente, deren Inhalt (Hash, Modell, Chunking) im Chunk-Speicher liegt, werden
+    ohne Extraktion und Embedding übernommen – nur als Verweis ("shared" im Manifest),
+    ohne Kopie in der Collection: der Platzbedarf wächst mit den einzigartigen
+    Inhalten, nicht mit der Zahl der Projekte. Neue landen nach dem Einbetten dort.
+    Kommt die Recherche ohne Verweis-Speicher aus (Projekt über NUMPY_MAX_CHUNKS),
+    werden geteilte Dateien doch in die Collection kopiert; fehlt ein Eintrag im
+    Chunk-Speicher (geleert), wird die Datei neu indexiert.
+    chunk_store=None nutzt den gemeinsamen Speicher unter VAULT/_cache/chunks,
+    page_cache_dir den Seiten-Cache der Extraktion.
+    workers=None wählt automatisch: Prozess-Pool ab POOL_MIN_BYTES, sonst seriell.
+    Bei anderem Embedding-Modell oder anderen Chunk-Parametern wird neu aufgebaut.
+    progress(fertige_dateien, dateien, chunks) meldet den Fortschritt.
+    Gibt ein Statistik-Dict zurück (inkl. chunks_per_sec und *_seconds je Stufe).
+    """
+    t_start = time.perf_counter()
+    col = chroma_client.get_or_create_collection(collection_name(p_id))
+    store = chunk_store if chunk_store is not None else ChunkStore()
+    stats = {"skipped": 0, "added": 0, "updated": 0, "removed": 0, "chunks": 0,
+             "reused": 0, "reused_chunks": 0,
+             "extract_seconds": 0.0, "chunk_seconds": 0.0, "embed_seconds": 0.0, "store_seconds": 0.0,
+             "lexical_seconds": 0.0}
+
+    chunking = chunking_params(chunk_size, chunk_overlap)
+    manifest = load_manifest(path)
+    if (manifest is None or manifest.get("embedding_model") != model_name
+            or manifest.get("chunking") != chunking):
+        _delete_ids(col, col.get(include=[]).get("ids", []))
+        manifest = _empty_manifest(model_name, chunking)
+        lexical = LexicalIndex()
+    else:
+        lexical = LexicalIndex.load(index_dir(path))
+        shared = [e for e in manifest["files"].values() if e.get("shared")]
+        if (col.count() != len(_collection_ids(manifest["files"]))
+                or not all(store.has(e.get("chunk_key", "")) for e in shared)):
+            _reconcile(col, manifest["files"], store)
+            save_manifest(path, manifest)
+    files = manifest["files"]
+
+    current = list_project_pdfs(path)
+
+    for name in [n for n in files if n not in current]:
+        _delete_entry(col, files.pop(name))
+        lexical.remove_file(name)
+        stats["removed"] += 1
+    if stats["removed"]:
+        save_manifest(path, manifest)
+
+    todo = []
+    for name, fp in current.items():
+        st_ = os.stat(fp)
+        entry = files.get(name)
+        if entry and entry.get("mtime") == st_.st_mtime and entry.get("size") == st_.st_size:
+            stats["skipped"] += 1
+            continue
+
+        sha = source_sha256(fp)
+        if entry and entry.get("sha256") == sha:
+            # Nur Zeitstempel geändert (z. B. erneut hochgeladen) – Inhalt identisch
+            entry["mtime"], entry["size"] = st_.st_mtime, st_.st_size
+            save_manifest(path, manifest)
+            stats["skipped"] += 1
+            continue
+        todo.append((name, fp, st_, sha))
+
+    total = len(todo)
+    if progress:
+        progress(0, total, 0)
+
+    def finish(name, entry, was_indexed):
+        files[name] = entry
+        save_manifest(path, manifest)
+        stats["updated" if was_indexed else "added"] += 1
+
+    # Bekannte Inhalte: nur auf den gemeinsamen Speicher verweisen (keine Kopie)
+    fresh = []
+    for name, fp, st_, sha in todo:
+        key = chunk_key(sha, model_name, chunking)
+        entry = store.load(key)
+        if entry is None:
+            fresh.append((name, fp, st_, sha))
+            continue
+        texts = entry[0]
+        old = files.pop(name, None)
+        if old:
+            _delete_entry(col, old)
+        lexical.remove_file(name)
+        chunk_ids = [f"{name}_{i}" for i in range(len(texts))]
+        for cid, text in zip(chunk_ids, texts):
+            lexical.add(name, cid, text)
+        finish(name, {"sha256": sha, "mtime": st_.st_mtime, "size": st_.st_size, "chunk_ids": chunk_ids,
+                      "embedding_model": model_name, "chunk_key": key, "shared": True}, old is not None)
+        stats["reused"] += 1
+        stats["reused_chunks"] += len(chunk_ids)
+        if progress:
+            progress(stats["added"] + stats["updated"], total, stats["reused_chunks"])
+    todo = fresh
+
+    if workers is None:
+        workers = EMBED_WORKERS if sum(t[2].st_size for t in todo) >= POOL_MIN_BYTES else 1
+
+    # Eine Datei wandert erst ins Manifest, wenn alle ihre Chunks gespeichert sind.
+    # Die Pipeline liest voraus, daher merken wir uns den Chunk-Endstand je Datei.
+    done = deque()
+    produced = 0
+    # Je Datei Texte, Seiten und Embeddings für den Chunk-Speicher (bis zum Commit)
+    pending = {}
+    owner = {}
+
+    # Extraktion (Cache/Prozess-Pool) läuft der Embedding-Pipeline voraus
+    extract_workers = max(1, EXTRACT_WORKERS - (workers if workers > 1 else 0))
+
+    def produce():
+        nonlocal produced
+        extracted = metrics.timed_iter(
+            iter_extracted([t[1] for t in todo], [t[3] for t in todo], extract_workers, page_cache_dir),
+            stats, "extract_seconds",
+        )
+        for (name, fp, st_, sha), pages in zip(todo, extracted):
+            old = files.pop(name, None)
+            if old:
+                _delete_entry(col, old)
+                save_manifest(path, manifest)
+            lexical.remove_file(name)
+            chunk_ids = []
+            keep = pending[name] = {"texts": [], "pages": [], "vecs": []}
+            chunks = metrics.timed_iter(iter_chunks(pages, chunk_size, chunk_overlap), stats, "chunk_seconds")
+            for i, (chunk, p_from, p_to) in enumerate(chunks):
+                chunk_ids.append(f"{name}_{i}")
+                t0 = time.perf_counter()
+                lexical.add(name, chunk_ids[-1], chunk)
+                stats["lexical_seconds"] += time.perf_counter() - t0
+                keep["texts"].append(chunk)
+                keep["pages"].append((p_from, p_to))
+                owner[chunk_ids[-1]] = name
+                produced += 1
+                yield chunk_ids[-1], chunk, chunk_metadata(name, p_from, p_to)
+            entry = {
+                "sha256": sha,
+                "mtime": st_.st_mtime,
+                "size": st_.st_size,
+                "chunk_ids": chunk_ids,
+                "embedding_model": model_name,
+                "chunk_key": chunk_key(sha, model_name, chunking),
+            }
+            done.append((produced, name, entry, old is not None))
+
+    stored = 0
+
+    def commit_done():
+        while done and done[0][0] <= stored:
+            _, name, entry, was_indexed = done.popleft()
+            keep = pending.pop(name)
+            t0 = time.perf_counter()
+            store.put(entry["chunk_key"], keep["texts"], keep["pages"], keep["vecs"])
+            stats["store_seconds"] += time.perf_counter() - t0
+            finish(name, entry, was_indexed)
+            if progress:
+                progress(stats["added"] + stats["updated"], total, stored + stats["reused_chunks"])
+
+    for ids, docs, metas, vecs in embed_stream(embedder, produce(), model_name, batch_size, workers, stats):
+        t0 = time.perf_counter()
+        col.add(ids=ids, documents=docs, metadatas=metas, embeddings=vecs)
+        stats["store_seconds"] += time.perf_counter() - t0
+        for cid, vec in zip(ids, vecs):
+            pending[owner.pop(cid)]["vecs"].append(vec)
+        stored += len(ids)
+        commit_done()
+    commit_done()
+
+    # Nicht übernommene Dateien (Abbruch) raus, fehlende aus Chunk-Speicher bzw. Collection nach
+    t0 = time.perf_counter()
+    if lexical.sync(files, lambda entry: _documents(col, store, entry)) or todo or stats["reused"] \
+            or stats["removed"]:
+        lexical.save(index_dir(path))
+    stats["lexical_seconds"] += time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    changed = _backfill_chunk_store(col, files, store, model_name, chunking)
+    n_chunks = sum(len(e.get("chunk_ids", [])) for e in files.values())
+    if n_chunks > NUMPY_MAX_CHUNKS or not all(store.has(e.get("chunk_key", "")) for e in files.values()):
+        changed |= _unshare(col, files, store)
+    if changed:
+        save_manifest(path, manifest)
+    sync_store(index_dir(path), col, manifest, chunk_store=store)
+    stats["store_seconds"] += time.perf_counter() - t0
+
+    stats["seconds"] = time.perf_counter() - t_start
+    stats["chunks_per_sec"] = stats["chunks"] / stats["embed_seconds"] if stats["embed_seconds"] else 0.0
+    stats["batch_size"], stats["workers"] = batch_size, workers
+    for stage in ("extract", "chunk", "embed", "store", "lexical"):
+        metrics.record(f"index.{stage}", stats[f"{stage}_seconds"], project=p_id, chunks=stats["chunks"])
+    return stats
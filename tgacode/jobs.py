@@ -0,0 +1,141 @@
+# ==============================================================================
+# Hintergrund-Warteschlange für Indexierungsjobs
+# - Speichern von Dokumenten plant einen Job ein, die UI blockiert nicht
+# - Pro Projekt läuft höchstens ein Job; weitere Anforderungen für dasselbe
+#   Projekt werden zu einem wartenden Job zusammengefasst
+# - Status und Fortschritt je Projekt für die Anzeige (von allen Sitzungen geteilt)
+# ==============================================================================
+
+import time
+import uuid
+import threading
+from collections import deque
+
+QUEUED = "wartet"
+RUNNING = "läuft"
+DONE = "fertig"
+FAILED = "fehlgeschlagen"
+
+ACTIVE = (QUEUED, RUNNING)
+
+
+class Job:
+    __slots__ = ("id", "key", "label", "fn", "state", "progress", "result", "error",
+                 "created", "started", "finished", "requests")
+
+    def __init__(self, key, fn, label):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.label = label or key
+        self.fn = fn
+        self.state = QUEUED
+        self.progress = {"done": 0, "total": 0, "chunks": 0}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.requests = 1  # zusammengefasste Anforderungen
+
+    @property
+    def active(self):
+        return self.state in ACTIVE
+
+    def fraction(self):
+        total = self.progress["total"]
+        return self.progress["done"] / total if total else 0.0
+
+    def seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobQueue:
+    """
+    Führt fn(progress) je Job in Daemon-Threads aus. Jobs mit gleichem key
+    (Projekt) laufen nacheinander; ein noch wartender Job übernimmt neue
+    Anforderungen (das letzte fn gewinnt). progress(done, total, chunks).
+    """
+
+    def __init__(self, workers=1, history=50):
+        self.workers = max(1, workers)
+        self._pending = deque()
+        self._running = {}
+        self._latest = {}
+        self._history = deque(maxlen=history)
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, key, fn, label=None):
+        with self._cond:
+            for job in self._pending:
+                if job.key == key:
+                    job.fn = fn
+                    job.requests += 1
+                    return job
+            job = Job(key, fn, label)
+            self._pending.append(job)
+            self._latest[key] = job
+            self._ensure_workers()
+            self._cond.notify()
+            return job
+
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work, name=f"index-jobs-{len(self._threads)}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def _next(self):
+        """Ältester wartender Job, dessen Projekt gerade nicht läuft (Aufrufer hält _cond)."""
+        for job in self._pending:
+            if job.key not in self._running:
+                self._pending.remove(job)
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next()
+                job.state, job.started = RUNNING, time.time()
+                self._running[job.key] = job
+
+            def progress(done, total, chunks=0, job=job):
+                job.progress = {"done": done, "total": total, "chunks": chunks}
+
+            try:
+                job.result = job.fn(progress)
+                job.state = DONE
+            except Exception as e:
+                job.error = e
+                job.state = FAILED
+            finally:
+                job.finished = time.time()
+                with self._cond:
+                    del self._running[job.key]
+                    self._history.append(job)
+                    self._cond.notify_all()
+
+    def latest(self, key):
+        """Jüngster Job des Projekts (wartend, laufend oder zuletzt beendet) oder None."""
+        with self._cond:
+            return self._latest.get(key)
+
+    def running(self, key):
+        with self._cond:
+            return self._running.get(key)
+
+    def active(self):
+        """Laufende und wartende Jobs aller Projekte."""
+        with self._cond:
+            return list(self._running.values()) + list(self._pending)
+
+    def history(self):
+        with self._cond:
+            return list(self._history)
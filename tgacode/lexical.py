@@ -0,0 +1,178 @@
+# ==============================================================================
+# Lexikalischer Index (BM25) neben dem Vektorindex
+# - Invertierter Index über dieselben Chunks wie die Chroma-Collection
+#   (_index/lexical.json.gz), aufgebaut während index_project
+# - Tokenizer behält Bezeichner: OZ "3.1.20", "§2", "DIN 1988-300", Artikelnummern
+# - Rangfusion (Reciprocal Rank Fusion) mit den Vektortreffern: exakte Treffer
+#   auf Positionsnummern und Paragraphen rücken nach oben
+# ==============================================================================
+
+import os
+import gzip
+import json
+import math
+import re
+import threading
+from collections import Counter
+
+LEXICAL_NAME = "lexical.json.gz"
+LEXICAL_VERSION = 1
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60  # Dämpfung der Reciprocal Rank Fusion
+
+# "§ 2" → "§2"; Zahlen mit Punkten/Bindestrichen (OZ, Normen, Daten) bleiben ein Token
+_TOKEN_RE = re.compile(r"§+\s*\d+[a-z]?|\d+(?:[./-]\d+)*[a-z]?|[^\W\d_]+(?:-\d+)*", re.IGNORECASE)
+_STOPWORDS = frozenset(
+    "der die das den dem des ein eine einer eines einem einen und oder ist sind wird werden "
+    "wurde in im zu zum zur von vom mit für auf an am bei aus als auch nicht nach wie über "
+    "unter bis durch es sich dass so nur noch bzw ggf".split()
+)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def tokenize(text):
+    tokens = []
+    for m in _TOKEN_RE.finditer((text or "").lower()):
+        tok = re.sub(r"\s+", "", m.group()).rstrip(".")
+        if tok and tok not in _STOPWORDS:
+            tokens.append(tok)
+    return tokens
+
+
+def lexical_path(index_dir):
+    return os.path.join(index_dir, LEXICAL_NAME)
+
+
+class LexicalIndex:
+    """
+    postings: Term → {Chunk-ID: Häufigkeit}; lengths: Chunk-ID → Tokens;
+    files: Datei → Chunk-IDs (für inkrementelles Entfernen).
+    """
+
+    def __init__(self, postings=None, lengths=None, files=None):
+        self.postings = postings or {}
+        self.lengths = lengths or {}
+        self.files = files or {}
+        self._total = sum(self.lengths.values())
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, name, chunk_id, text):
+        tf = Counter(tokenize(text))
+        for term, n in tf.items():
+            self.postings.setdefault(term, {})[chunk_id] = n
+        self.lengths[chunk_id] = sum(tf.values())
+        self._total += self.lengths[chunk_id]
+        self.files.setdefault(name, []).append(chunk_id)
+
+    def remove_file(self, name):
+        ids = set(self.files.pop(name, ()))
+        if not ids:
+            return False
+        for term in list(self.postings):
+            plist = self.postings[term]
+            for cid in ids.intersection(plist):
+                del plist[cid]
+            if not plist:
+                del self.postings[term]
+        for cid in ids:
+            self._total -= self.lengths.pop(cid, 0)
+        return True
+
+    def lookup(self, term):
+        """Chunk-IDs, die den Bezeichner wörtlich enthalten (z. B. '3.1.20', '§2')."""
+        toks = tokenize(term)
+        return sorted(self.postings.get(toks[0], {})) if len(toks) == 1 else []
+
+    def search(self, query, n_results=5):
+        """BM25-Rangliste [(Chunk-ID, Score)] für einen Anfragetext."""
+        n = len(self.lengths)
+        if not n:
+            return []
+        avg = self._total / n or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for cid, tf in plist.items():
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[cid] / avg)
+                scores[cid] = scores.get(cid, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:n_results]
+
+    def sync(self, files, fetch_documents):
+        """
+        Gleicht mit dem Manifest ab: fremde oder veraltete Dateien fliegen raus,
+        fehlende (z. B. Index aus älterer Version) werden über
+        fetch_documents(entry) → Texte der Chunks des Manifest-Eintrags nachgetragen.
+        Liefert True, wenn sich etwas geändert hat.
+        """
+        changed = False
+        for name in list(self.files):
+            if name not in files or self.files[name] != files[name].get("chunk_ids", []):
+                changed |= self.remove_file(name)
+        for name, entry in files.items():
+            ids = entry.get("chunk_ids", [])
+            if name in self.files or not ids:
+                continue
+            for cid, text in zip(ids, fetch_documents(entry)):
+                self.add(name, cid, text or "")
+            changed = True
+        return changed
+
+    def save(self, index_dir):
+        """Schreibt den Index atomar (tmp-Datei + os.replace)."""
+        os.makedirs(index_dir, exist_ok=True)
+        path = lexical_path(index_dir)
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump({"version": LEXICAL_VERSION, "postings": self.postings,
+                       "lengths": self.lengths, "files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        with _cache_lock:
+            _cache.pop(path, None)
+
+    @classmethod
+    def load(cls, index_dir):
+        """Lädt den Index (leer, wenn fehlend, unlesbar oder alte Version)."""
+        try:
+            with gzip.open(lexical_path(index_dir), "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != LEXICAL_VERSION:
+            return cls()
+        return cls(data["postings"], data["lengths"], data["files"])
+
+
+def load_lexical(index_dir):
+    """Index für Abfragen – im Prozess gecacht, bis sich die Datei ändert; None, wenn leer."""
+    path = lexical_path(index_dir)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit and hit[0] == mtime:
+            return hit[1]
+    index = LexicalIndex.load(index_dir)
+    index = index if len(index) else None
+    with _cache_lock:
+        _cache[path] = (mtime, index)
+    return index
+
+
+def fuse_rankings(rankings, k=RRF_K):
+    """Reciprocal Rank Fusion: rankings = [[Chunk-ID, …], …] → {Chunk-ID: Score}."""
+    scores = {}
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking):
+            scores[cid] = scores.get(cid, 0.0) + 1.0 / (k + rank + 1)
+    return scores
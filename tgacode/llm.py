@@ -0,0 +1,540 @@
+# ==============================================================================
+# Gemini-Aufrufe: dynamische Modellauswahl, Rate-Limit/Backoff, Modellrotation
+# - google.generativeai wird erst beim ersten Aufruf importiert und konfiguriert
+# - Discovery-Ergebnis auf Platte gecacht (TTL) → Kaltstart ohne list_models()
+# - Rotation nach Modell-Gesundheit (Circuit-Breaker, schnellstes gesundes zuerst)
+# - 404/Not Found → nächstes Modell
+# - Streaming-Variante für den Bericht (Rotation/Backoff bis zum ersten Token)
+# - 429/Quota → gemeinsamer Limiter (Retry-After, Jitter, adaptive Parallelität)
+# - Optionaler LLM-Cache (tgacode.llm_cache) und notify-Callback für die UI
+# - Jeder Versuch als Span (tgacode.metrics): Modell, Tokens, Wartezeit im Limiter
+# ==============================================================================
+
+import os
+import re
+import json
+import time
+import threading
+from contextlib import ExitStack
+
+from tgacode.config import MODELS_CACHE_PATH
+from tgacode.llm_cache import make_key
+from tgacode.metrics import span
+from tgacode.model_health import get_health
+from tgacode.ratelimit import count_tokens, get_limiter, http_status, is_rate_limit
+
+DISCOVERY_TTL = 24 * 3600
+DEFAULT_INPUT_TOKEN_LIMIT = 32_768  # wenn die Discovery kein Limit liefert
+REQUEST_TIMEOUT = 120  # Sekunden; hängende Modelle zählen als Fehler
+
+
+_client = None
+_client_config = {}
+_client_lock = threading.Lock()
+
+
+def configure(api_key, endpoint=None):
+    """Merkt die Zugangsdaten vor; der Import von google.generativeai erfolgt erst bei Bedarf."""
+    global _client
+    with _client_lock:
+        _client_config.clear()
+        _client_config.update(api_key=api_key, endpoint=endpoint)
+        _client = None
+
+
+def _genai():
+    """google.generativeai einmalig importieren und mit den vorgemerkten Zugangsdaten konfigurieren."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import google.generativeai as genai
+            endpoint = _client_config.get("endpoint")
+            if endpoint:
+                # z. B. lokaler Test-Endpunkt: python -m tgacode.fake_gemini
+                genai.configure(
+                    api_key=_client_config.get("api_key"), transport="rest",
+                    client_options={"api_endpoint": endpoint},
+                )
+            elif _client_config:
+                genai.configure(api_key=_client_config.get("api_key"))
+            _client = genai
+        return _client
+
+
+def warm_up():
+    """Client laden und Modellliste bereitstellen (für den Hintergrund-Start der App)."""
+    _genai()
+    return get_model_names()
+
+
+def discover_supported_models():
+    """
+    Fragt verfügbare Gemini-Modelle ab und filtert auf solche,
+    die generateContent unterstützen. Liefert (sortierte Liste, discovered, Eingabelimits).
+    """
+    supported = []
+    limits = {}
+    discovered = True
+    try:
+        for m in _genai().list_models():
+            name = getattr(m, "name", None)
+            methods = getattr(m, "supported_generation_methods", []) or []
+            if name and ("generateContent" in methods):
+                supported.append(name)
+                if getattr(m, "input_token_limit", None):
+                    limits[name] = int(m.input_token_limit)
+    except Exception:
+        # Fallback-Liste ohne potenziell eingeschränkte Modelle
+        discovered = False
+        supported = [
+            "gemini-2.0-flash",
+            "gemini-1.5-flash",
+            "gemini-1.5-pro",
+            "gemini-1.0-pro",
+        ]
+
+    def sort_key(n: str):
+        # Bevorzuge "flash", dann "pro", grob nach Major-Version absteigend
+        tier = 0 if "flash" in n else (1 if "pro" in n else 2)
+        m = re.search(r"gemini-(\d+)", n)
+        major = int(m.group(1)) if m else 0
+        return (tier, -major)
+
+    return sorted(set(supported), key=sort_key), discovered, limits
+
+
+def _load_discovery_cache(path, ttl):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if time.time() - data["ts"] <= ttl and data["names"]:
+            return data
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _save_discovery_cache(path, names, not_found, limits):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ts": time.time(), "names": names, "not_found": sorted(not_found), "limits": limits}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+_names = None
+_not_found = set()
+_limits = {}
+_instances = {}
+_models_lock = threading.Lock()
+_discovery_path = MODELS_CACHE_PATH
+
+
+def set_discovery_cache(path):
+    """Ort des Discovery-Caches (z. B. anderer VAULT in der Stapelverarbeitung); liefert den bisherigen."""
+    global _discovery_path
+    previous, _discovery_path = _discovery_path, path
+    return previous
+
+
+def get_model_names(path=None, ttl=DISCOVERY_TTL):
+    """
+    Modellnamen in Discovery-Reihenfolge. Erst aus dem Platten-Cache,
+    sonst über list_models() (Fallback-Liste wird nicht gecacht).
+    Modelle, die 404 geliefert haben, sind bis zum Ablauf des Caches ausgeschlossen.
+    """
+    global _names
+    path = path or _discovery_path
+    with _models_lock:
+        if _names is None:
+            cached = _load_discovery_cache(path, ttl)
+            if cached:
+                _names = list(cached["names"])
+                _not_found.update(cached.get("not_found", []))
+                _limits.update(cached.get("limits") or {})
+            else:
+                _names, discovered, limits = discover_supported_models()
+                _limits.update(limits)
+                if discovered:
+                    _save_discovery_cache(path, _names, _not_found, _limits)
+        return [n for n in _names if n not in _not_found]
+
+
+def mark_not_found(name, path=None):
+    """Merkt ein Modell mit 404 dauerhaft (bis zur nächsten Discovery) als unbrauchbar."""
+    path = path or _discovery_path
+    with _models_lock:
+        if name in _not_found:
+            return
+        _not_found.add(name)
+        if _names:
+            _save_discovery_cache(path, _names, _not_found, _limits)
+
+
+def input_token_limit(names=None):
+    """
+    Kleinstes Eingabelimit (Tokens) der nutzbaren Modelle – die Rotation
+    kann jedes davon treffen, der Prompt muss also in alle passen.
+    """
+    names = names if names is not None else get_model_names()
+    with _models_lock:
+        known = [_limits[n] for n in names if n in _limits]
+    return min(known) if known else DEFAULT_INPUT_TOKEN_LIMIT
+
+
+def _model(name):
+    """GenerativeModel erst bei Bedarf instanziieren."""
+    with _models_lock:
+        inst = _instances.get(name)
+        if inst is None:
+            inst = _instances[name] = _genai().GenerativeModel(name)
+        return inst
+
+
+def get_models():
+    """(Instanzen, Namen) in Discovery-Reihenfolge; Instanzen werden gecacht."""
+    instances, names = [], []
+    for name in get_model_names():
+        try:
+            instances.append(_model(name))
+            names.append(name)
+        except Exception:
+            continue
+    return instances, names
+
+
+def _rotation(names):
+    """
+    Kandidaten in Gesundheits-Reihenfolge (offene Breaker übersprungen). Der
+    half-open-Probeaufruf wird auf jedem Weg freigegeben, sobald der Aufrufer zum
+    nächsten Modell wechselt oder aufhört.
+    """
+    health = get_health()
+    for name in health.order(names):
+        if health.begin(name):
+            try:
+                yield name, _model(name)
+            except Exception:
+                health.record_failure(name)
+            finally:
+                health.end(name)
+
+
+_STATUS_404 = re.compile(r"\b404\b")
+
+
+def _is_not_found(err):
+    """404/Not Found nach HTTP-Status; ohne Status nur die ganze Zahl (die Meldung enthält die URL)."""
+    status = http_status(err)
+    if status is not None:
+        return status == 404
+    msg = str(err).lower()
+    return bool(_STATUS_404.search(msg)) or "not found" in msg
+
+
+def _record_error(name, err):
+    if isinstance(err, ValueError):
+        return  # Antwort unbrauchbar (z. B. blockiert/kein JSON) – kein Modellausfall
+    not_found = _is_not_found(err)
+    get_health().record_failure(name, not_found=not_found, rate_limited=is_rate_limit(err))
+    if not_found:
+        mark_not_found(name)
+
+
+def _usage(resp, attrs):
+    """Token-Zahlen aus usage_metadata (falls geliefert) in die Span-Attribute."""
+    meta = getattr(resp, "usage_metadata", None)
+    if meta:
+        attrs["tokens_in"] = getattr(meta, "prompt_token_count", None)
+        attrs["tokens_out"] = getattr(meta, "candidates_token_count", None)
+
+
+def notify_status(notify, msg):
+    """Statusmeldung an den optionalen notify-Callback (UI/CLI) weitergeben."""
+    if notify:
+        notify(msg)
+
+
+def generate_with_backoff(prompt, max_output_tokens=1536, temperature=0.3, attempts_per_model=2,
+                          cache=None, notify=None):
+    """
+    generateContent mit Rotation bei 404/Not Found; 429/Quota laufen über den
+    prozessweiten Limiter (Pacing vor dem Aufruf, Retry-After, Backoff mit Jitter).
+    Antworten werden im LLM-Cache abgelegt (Schlüssel: Prompt und Konfiguration).
+    Gibt resp.text zurück.
+    """
+    names = get_model_names()
+    if not names:
+        raise RuntimeError("Keine nutzbaren Gemini-Modelle gefunden. Prüfe API-Zugang/Billing.")
+
+    config = {"max_output_tokens": max_output_tokens, "temperature": temperature}
+    key = make_key("text", prompt, config)
+    if cache:
+        with span("llm.cache", kind="text") as sp:
+            cached = cache.get(key)
+            sp.update(hit=bool(cached), model=cached[1] if cached else None)
+        if cached:
+            notify_status(notify, f"KI-Antwort aus Cache ({cached[1]})")
+            return cached[0]
+
+    limiter = get_limiter()
+    tokens = count_tokens(prompt) + max_output_tokens
+    health = get_health()
+    last_err = None
+    for model_name, model in _rotation(names):
+        for i in range(attempts_per_model):
+            try:
+                with span("llm.generate", kind="text", model=model_name, attempt=i) as sp, \
+                        limiter.slot(tokens) as waited:
+                    sp["wait"] = round(waited, 3)
+                    t0 = time.monotonic()
+                    resp = model.generate_content(
+                        prompt, generation_config=config, request_options={"timeout": REQUEST_TIMEOUT}
+                    )
+                    text = resp.text
+                    _usage(resp, sp)
+                health.record_success(model_name, time.monotonic() - t0)
+                if cache:
+                    cache.put(key, text, model_name)
+                notify_status(notify, f"KI-Modell verwendet: {model_name}")
+                return text
+            except Exception as e:
+                _record_error(model_name, e)
+                if _is_not_found(e):
+                    last_err = e
+                    break  # direkt nächstes Modell
+                elif is_rate_limit(e):
+                    # Wartezeit übernimmt der Limiter beim nächsten slot()
+                    last_err = e
+                    continue
+                else:
+                    last_err = e
+                    break
+    raise last_err if last_err else RuntimeError("KI-Generierung fehlgeschlagen.")
+
+
+def _chunk_text(chunk):
+    if chunk is None:
+        return ""
+    try:
+        return chunk.text
+    except ValueError:
+        return ""  # z. B. Abschluss-Chunk ohne Text
+
+
+def stream_with_backoff(prompt, max_output_tokens=1536, temperature=0.3, attempts_per_model=2,
+                        cache=None, notify=None, timing=None):
+    """
+    Streaming-Variante von generate_with_backoff: liefert Textstücke, sobald sie ankommen.
+    Rotation, Limiter und Backoff greifen bis zum ersten Token; danach bleibt es beim
+    gewählten Modell. Der fertige Text landet im selben Cache-Eintrag wie beim
+    blockierenden Aufruf. timing (dict) erhält ttft, total, model und cached.
+    """
+    timing = timing if timing is not None else {}
+    t_start = time.monotonic()
+    names = get_model_names()
+    if not names:
+        raise RuntimeError("Keine nutzbaren Gemini-Modelle gefunden. Prüfe API-Zugang/Billing.")
+
+    config = {"max_output_tokens": max_output_tokens, "temperature": temperature}
+    key = make_key("text", prompt, config)
+    if cache:
+        with span("llm.cache", kind="stream") as sp:
+            cached = cache.get(key)
+            sp.update(hit=bool(cached), model=cached[1] if cached else None)
+        if cached:
+            elapsed = time.monotonic() - t_start
+            timing.update(ttft=elapsed, total=elapsed, model=cached[1], cached=True)
+            notify_status(notify, f"KI-Antwort aus Cache ({cached[1]})")
+            yield cached[0]
+            return
+
+    limiter = get_limiter()
+    tokens = count_tokens(prompt) + max_output_tokens
+    health = get_health()
+    last_err = None
+    for model_name, model in _rotation(names):
+        for i in range(attempts_per_model):
+            stack = ExitStack()
+            try:
+                sp = stack.enter_context(span("llm.generate", kind="stream", model=model_name, attempt=i))
+                sp["wait"] = round(stack.enter_context(limiter.slot(tokens)), 3)
+                t0 = time.monotonic()
+                resp = model.generate_content(
+                    prompt, generation_config=config, stream=True,
+                    request_options={"timeout": REQUEST_TIMEOUT},
+                )
+                chunks = iter(resp)
+                # 429/404 kommen spätestens mit dem ersten Chunk
+                first = _chunk_text(next(chunks, None))
+            except Exception as e:
+                stack.__exit__(type(e), e, e.__traceback__)
+                _record_error(model_name, e)
+                last_err = e
+                if _is_not_found(e):
+                    break  # direkt nächstes Modell
+                elif is_rate_limit(e):
+                    continue  # Wartezeit übernimmt der Limiter
+                else:
+                    break
+
+            timing.update(ttft=time.monotonic() - t_start, model=model_name, cached=False)
+            sp["ttft"] = round(time.monotonic() - t0, 3)
+            parts = [first]
+            with stack:
+                try:
+                    if first:
+                        yield first
+                    for chunk in chunks:
+                        text = _chunk_text(chunk)
+                        if text:
+                            parts.append(text)
+                            yield text
+                    _usage(resp, sp)
+                except Exception as e:
+                    _record_error(model_name, e)
+                    raise
+            text = "".join(parts)
+            health.record_success(model_name, time.monotonic() - t0)
+            timing["total"] = time.monotonic() - t_start
+            if cache:
+                cache.put(key, text, model_name)
+            notify_status(notify, f"KI-Modell verwendet: {model_name} (Streaming)")
+            return
+    raise last_err if last_err else RuntimeError("KI-Generierung fehlgeschlagen.")
+
+
+SUMMARY_FIELDS = (
+    "vob_check",
+    "technische_pruefung",
+    "preis_check",
+    "gesamtsumme_korrigiert",
+    "empfehlung",
+    "naechste_schritte",
+)
+
+
+def summary_json_schema(fields=None):
+    # Schlankes, kompatibles Schema – ohne additionalProperties
+    # fields: nur diese Felder (Teil-Aktualisierung nach Korrekturen)
+    fields = [f for f in SUMMARY_FIELDS if fields is None or f in fields]
+    return {
+        "type": "object",
+        "properties": {f: {"type": "string"} for f in fields},
+        "required": fields,
+    }
+
+
+def report_summary_json_schema():
+    # Single-Pass: Markdown-Bericht und Zusammenfassung in einer Antwort
+    schema = summary_json_schema()
+    schema["properties"] = {"bericht": {"type": "string"}, **schema["properties"]}
+    schema["required"] = ["bericht", *schema["required"]]
+    return schema
+
+
+def generate_json_with_backoff(prompt, json_schema=None, attempts_per_model=2, cache=None, notify=None,
+                               max_output_tokens=512, schema_only=False):
+    """
+    Erzeugt JSON via response_mime_type=application/json.
+    1) Versucht Schema-Modus (wenn json_schema übergeben wird).
+    2) Bei Schema-Fehlern oder Nichtunterstützung: Fallback ohne Schema
+       + strikte Prompt-Vorgabe "Nur ein JSON-Objekt zurückgeben"
+       (entfällt mit schema_only=True – dann wird die erste Ablehnung ohne
+       weitere Modelle weitergereicht).
+    Gibt ein Python-Dict zurück (gecacht und gedrosselt wie generate_with_backoff).
+    """
+    names = get_model_names()
+    if not names:
+        raise RuntimeError("Keine nutzbaren Gemini-Modelle gefunden. Prüfe API-Zugang/Billing.")
+
+    key = make_key("json", prompt, {"schema": json_schema, "temperature": 0.2,
+                                   "max_output_tokens": max_output_tokens})
+    if cache:
+        with span("llm.cache", kind="json") as sp:
+            cached = cache.get(key)
+            sp.update(hit=bool(cached), model=cached[1] if cached else None)
+        if cached:
+            notify_status(notify, f"KI (JSON) aus Cache ({cached[1]})")
+            return json.loads(cached[0])
+
+    def try_call(model, use_schema=True):
+        if use_schema and json_schema:
+            return model.generate_content(
+                prompt,
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "response_schema": json_schema,
+                    "temperature": 0.2,
+                    "max_output_tokens": max_output_tokens,
+                },
+                request_options={"timeout": REQUEST_TIMEOUT},
+            )
+        else:
+            strict_prompt = (
+                prompt
+                + "\n\nGib ausschließlich ein einzelnes, valides JSON-Objekt zurück – ohne Erklärtext, keine Code-Fences."
+            )
+            return model.generate_content(
+                strict_prompt,
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "temperature": 0.2,
+                    "max_output_tokens": max_output_tokens,
+                },
+                request_options={"timeout": REQUEST_TIMEOUT},
+            )
+
+    limiter = get_limiter()
+    tokens = count_tokens(prompt) + max_output_tokens
+    health = get_health()
+    last_err = None
+    for model_name, model in _rotation(names):
+        # Zweiphasig: (1) mit Schema, (2) ohne Schema
+        for phase in ((True,) if schema_only else (True, False)):
+            for i in range(attempts_per_model):
+                try:
+                    with span("llm.generate", kind="json", model=model_name, attempt=i, schema=phase) as sp, \
+                            limiter.slot(tokens) as waited:
+                        sp["wait"] = round(waited, 3)
+                        t0 = time.monotonic()
+                        resp = try_call(model, use_schema=phase)
+                        text = resp.text
+                        _usage(resp, sp)
+                    health.record_success(model_name, time.monotonic() - t0)
+                    data = json.loads(text)
+                    if cache:
+                        cache.put(key, json.dumps(data, ensure_ascii=False), model_name)
+                    notify_status(notify, f"KI (JSON): {model_name} | Schema={'on' if phase else 'off'}")
+                    return data
+                except Exception as e:
+                    msg = str(e).lower()
+                    rejected = phase and ("schema" in msg or "unknown field" in msg or "unsupported" in msg)
+                    # Schema nicht unterstützt ist kein Modellausfall
+                    if not rejected:
+                        _record_error(model_name, e)
+                    # Nur mit Schema gewünscht: die Ablehnung gilt für alle Modelle → sofort zum Aufrufer
+                    if rejected and schema_only:
+                        raise
+                    # 404 → direkt nächstes Modell
+                    if _is_not_found(e):
+                        last_err = e
+                        break
+                    # Schema nicht unterstützt → sofort in nächste Phase (ohne Schema)
+                    if rejected:
+                        last_err = e
+                        break
+                    # 429 / Quota → Wartezeit über den Limiter
+                    if is_rate_limit(e):
+                        last_err = e
+                        continue
+                    # Anderes Problem → nächster Versuch mit nächstem Modell/Phase
+                    last_err = e
+                    break
+            # Falls 404 oder Schema-Problem: Phase/Modell wechseln
+            if last_err and (_is_not_found(last_err) or "schema" in str(last_err).lower() or "unknown field" in str(last_err).lower()):
+                continue
+    raise last_err if last_err else RuntimeError("Strukturierte JSON-Generierung fehlgeschlagen.")
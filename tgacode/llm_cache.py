@@ -0,0 +1,131 @@
+# ==============================================================================
+# LLM-Antwort-Cache (prozess- und sitzungsübergreifend)
+# - SQLite-Datei im VAULT → auch für Kollegen auf anderen Rechnern nutzbar
+# - Schlüssel: kompletter Prompt + Generierungs-Konfiguration (ohne Modell: die
+#   Rotation entscheidet erst beim Aufruf; das antwortende Modell steht am Eintrag)
+# - LRU-Verdrängung bei Größenlimit, TTL, Treffer-/Fehlzugriffszähler
+# ==============================================================================
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from tgacode.config import LLM_CACHE_PATH
+
+LLM_CACHE_MAX_BYTES = 200 * 1024 * 1024
+LLM_CACHE_TTL = 14 * 24 * 3600
+
+
+def make_key(kind, prompt, config):
+    """
+    Cache-Schlüssel über Art (text/json), Prompt und Konfiguration. Das Modell
+    gehört nicht dazu: welches antwortet, steht vor dem Aufruf nicht fest
+    (Rotation nach Gesundheit, 404); es wird mit der Antwort gespeichert.
+    """
+    payload = json.dumps(
+        {"kind": kind, "prompt": prompt, "config": config},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Plattenbasierter Antwort-Cache. Fehler beim Zugriff gelten als Fehlzugriff."""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._db() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, model TEXT,"
+                " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+
+    @contextmanager
+    def _db(self):
+        # Kein WAL: der VAULT kann auf einem Netzlaufwerk liegen
+        con = sqlite3.connect(self.path, timeout=10)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """(value, model) oder None. Abgelaufene Einträge werden entfernt."""
+        now = time.time()
+        try:
+            with self._db() as con:
+                row = con.execute(
+                    "SELECT value, model, created FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[2] > self.ttl:
+                    con.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    row = None
+                if row:
+                    con.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            row = None
+        self._count(row is not None)
+        return (row[0], row[1]) if row else None
+
+    def put(self, key, value, model=None):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        try:
+            with self._db() as con:
+                con.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, model, size, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, value, model, size, now, now),
+                )
+                self._evict(con, now)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, con, now):
+        con.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        total = con.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Älteste Zugriffe zuerst verdrängen, bis das Limit eingehalten ist
+        drop = []
+        for key, size in con.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            drop.append((key,))
+            total -= size
+        con.executemany("DELETE FROM entries WHERE key = ?", drop)
+
+    def stats(self):
+        try:
+            with self._db() as con:
+                entries, size = con.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+        except sqlite3.Error:
+            entries, size = 0, 0
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self):
+        with self._db() as con:
+            con.execute("DELETE FROM entries")
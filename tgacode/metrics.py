@@ -0,0 +1,139 @@
+# ==============================================================================
+# Leichtgewichtige Messpunkte (Spans) für Extraktion, Embedding, Chroma und Gemini
+# - span(): Dauer + Attribute (Tokens, Modell, Fehler) je Arbeitsschritt
+# - trace(): sammelt die Spans eines Durchlaufs (z. B. einer Prüfung) für die UI
+# - Jeder Span wird als JSON-Zeile an VAULT/_metrics/metrics.jsonl angehängt
+# ==============================================================================
+
+import os
+import json
+import math
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from tgacode.config import METRICS_PATH
+
+_current = ContextVar("tgacode_trace", default=None)
+_write_lock = threading.Lock()
+_enabled = True
+_path = METRICS_PATH
+
+
+def set_enabled(enabled):
+    """Schreiben der JSONL-Datei an/aus (Spans für die UI werden weiter gesammelt)."""
+    global _enabled
+    _enabled = enabled
+
+
+def set_path(path):
+    """Ziel der JSONL-Datei (z. B. anderer VAULT in der Stapelverarbeitung); liefert das bisherige."""
+    global _path
+    previous, _path = _path, path
+    return previous
+
+
+class Trace:
+    __slots__ = ("id", "name", "attrs", "spans", "started")
+
+    def __init__(self, name, attrs):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.spans = []
+        self.started = time.time()
+
+
+def _append(record, path=None):
+    if not _enabled:
+        return
+    path = path or _path
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError:
+        pass  # Messung darf die Prüfung nie stören
+
+
+def record(name, seconds, **attrs):
+    """Bereits gemessenen Span erfassen (z. B. aufsummierte Pipeline-Stufen)."""
+    tr = _current.get()
+    span = {"name": name, "seconds": round(seconds, 4), **attrs}
+    if tr is not None:
+        tr.spans.append(span)
+    _append({"ts": time.time(), "trace": tr.id if tr else None,
+             "trace_name": tr.name if tr else None, **span})
+    return span
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Misst einen Arbeitsschritt. Der Kontext liefert das Attribut-Dict,
+    in das der Aufrufer Tokens, Modell usw. nachtragen kann.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            attrs.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        record(name, time.perf_counter() - t0, **attrs)
+
+
+@contextmanager
+def trace(name, **attrs):
+    """Sammelt alle Spans dieses Kontexts (gleicher Thread) in Trace.spans."""
+    tr = Trace(name, attrs)
+    token = _current.set(tr)
+    t0 = time.perf_counter()
+    try:
+        yield tr
+    finally:
+        _current.reset(token)
+        _append({"ts": time.time(), "trace": tr.id, "trace_name": name, "name": "trace",
+                 "seconds": round(time.perf_counter() - t0, 4), **attrs})
+
+
+def timed_iter(iterable, stats, key):
+    """Reicht Elemente durch und summiert die Wartezeit auf next() in stats[key]."""
+    it = iter(iterable)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        finally:
+            stats[key] = stats.get(key, 0.0) + time.perf_counter() - t0
+        yield item
+
+
+def percentiles(values, ps=(50, 95, 99), digits=4):
+    """Perzentile nach dem Nächster-Rang-Verfahren."""
+    if not values:
+        return {}
+    data = sorted(values)
+    return {f"p{p}": round(data[max(0, math.ceil(p / 100 * len(data)) - 1)], digits) for p in ps}
+
+
+def breakdown(spans):
+    """Summen je Span-Name (Dauer, Anzahl, Tokens) in Reihenfolge des ersten Auftretens."""
+    rows = {}
+    for s in spans:
+        row = rows.setdefault(s["name"], {"name": s["name"], "seconds": 0.0, "calls": 0,
+                                          "tokens_in": 0, "tokens_out": 0, "models": []})
+        row["seconds"] += s["seconds"]
+        row["calls"] += s.get("calls", 1)
+        row["tokens_in"] += s.get("tokens_in") or 0
+        row["tokens_out"] += s.get("tokens_out") or 0
+        if s.get("model") and s["model"] not in row["models"]:
+            row["models"].append(s["model"])
+    return list(rows.values())
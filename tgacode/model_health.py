@@ -0,0 +1,147 @@
+# ==============================================================================
+# Modell-Gesundheit & Circuit-Breaker (prozessweit)
+# - Latenz-EWMA, Fehlerzähler, Zustand closed / open / half-open je Modell
+# - Rotation überspringt offene Breaker und bevorzugt das schnellste gesunde Modell
+# - 404/Not Found öffnet sofort mit langer Sperrzeit; 429 zählt nicht (→ Limiter)
+# ==============================================================================
+
+import time
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+BREAKER_THRESHOLD = 3          # aufeinanderfolgende Fehler bis zum Öffnen
+BREAKER_COOLDOWN = 60.0        # erste Sperrzeit in Sekunden, verdoppelt sich bis ...
+BREAKER_COOLDOWN_MAX = 900.0
+NOT_FOUND_COOLDOWN = 6 * 3600.0
+LATENCY_ALPHA = 0.3
+
+
+class ModelHealth:
+    __slots__ = ("name", "state", "latency", "successes", "errors", "consecutive",
+                 "opened_at", "cooldown", "trial")
+
+    def __init__(self, name):
+        self.name = name
+        self.state = CLOSED
+        self.latency = None
+        self.successes = 0
+        self.errors = 0
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.cooldown = 0.0
+        self.trial = False  # Probeaufruf im half-open-Zustand läuft
+
+    def refresh(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.trial = False
+        return self.state
+
+
+class HealthRegistry:
+    """Gesundheitszustand aller Modelle eines Server-Prozesses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _get(self, name):
+        h = self._models.get(name)
+        if h is None:
+            h = self._models[name] = ModelHealth(name)
+        return h
+
+    def order(self, names):
+        """
+        Rotationsreihenfolge: gesunde Modelle nach Latenz (unbekannt zuletzt,
+        sonst Discovery-Reihenfolge), dann half-open. Offene Breaker entfallen;
+        sind alle offen, wird das zuerst wieder freie Modell versucht.
+        """
+        now = time.monotonic()
+        with self._lock:
+            ranked, blocked = [], []
+            for i, name in enumerate(names):
+                h = self._get(name)
+                state = h.refresh(now)
+                if state == OPEN:
+                    blocked.append((h.opened_at + h.cooldown, name))
+                    continue
+                latency = h.latency if h.latency is not None else float("inf")
+                ranked.append((0 if state == CLOSED else 1, latency, i, name))
+            if ranked:
+                return [r[-1] for r in sorted(ranked)]
+            return [name for _, name in sorted(blocked)[:1]]
+
+    def begin(self, name):
+        """Darf das Modell jetzt aufgerufen werden? Reserviert ggf. den half-open-Probeaufruf."""
+        with self._lock:
+            h = self._get(name)
+            state = h.refresh(time.monotonic())
+            if state == HALF_OPEN:
+                if h.trial:
+                    return False
+                h.trial = True
+            return True
+
+    def end(self, name):
+        """
+        Gibt einen offenen half-open-Probeaufruf frei, falls weder Erfolg noch Ausfall
+        verbucht wurde (unbrauchbare Antwort, Schema abgelehnt, Abbruch).
+        """
+        with self._lock:
+            h = self._get(name)
+            if h.state == HALF_OPEN:
+                h.trial = False
+
+    def record_success(self, name, latency):
+        with self._lock:
+            h = self._get(name)
+            h.successes += 1
+            h.consecutive = 0
+            h.latency = latency if h.latency is None else (
+                LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * h.latency
+            )
+            h.state, h.trial, h.cooldown = CLOSED, False, 0.0
+
+    def record_failure(self, name, not_found=False, rate_limited=False):
+        with self._lock:
+            h = self._get(name)
+            h.trial = False
+            if rate_limited:
+                # Quota ist Sache des Limiters; Breaker-Zustand bleibt
+                return
+            h.errors += 1
+            h.consecutive += 1
+            now = time.monotonic()
+            if not_found:
+                h.state, h.opened_at, h.cooldown = OPEN, now, NOT_FOUND_COOLDOWN
+            elif h.state == HALF_OPEN:
+                h.state, h.opened_at = OPEN, now
+                h.cooldown = min(BREAKER_COOLDOWN_MAX, max(BREAKER_COOLDOWN, h.cooldown * 2))
+            elif h.consecutive >= BREAKER_THRESHOLD:
+                h.state, h.opened_at, h.cooldown = OPEN, now, BREAKER_COOLDOWN
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "name": h.name,
+                    "state": h.refresh(now),
+                    "latency": h.latency,
+                    "successes": h.successes,
+                    "errors": h.errors,
+                    "reopen_in": max(0.0, h.opened_at + h.cooldown - now) if h.state == OPEN else 0.0,
+                }
+                for h in self._models.values()
+            ]
+
+
+_registry = HealthRegistry()
+
+
+def get_health():
+    return _registry
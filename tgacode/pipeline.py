@@ -0,0 +1,577 @@
+# ==============================================================================
+# Prüf-Pipeline: Analyst → Kontextbeschaffung → Gutachter → JSON-Zusammenfassung
+# - Prompt-Vorlagen und budgetierte Prompt-Bausteine (von App und CLI geteilt)
+# - run_check(): kompletter Durchlauf ohne UI (z. B. für die Stapelverarbeitung)
+# - Positionen und Summen rechnet tgacode.pricecheck lokal nach; die KI erhält
+#   die geprüften Zahlen als kompakte Tabelle
+# - Korrekturen überarbeiten nur die betroffenen Berichtsabschnitte und JSON-Felder
+# - Single-Pass: Bericht und JSON-Zusammenfassung in einem Schema-Aufruf,
+#   Fallback auf Bericht + separates JSON, wenn das Modell das Schema ablehnt
+# - Erneut eingereichte Nachträge (tgacode.history): Fragen und Recherche der
+#   früheren Prüfung werden übernommen, der Bericht nur anhand des Diffs aktualisiert
+# ==============================================================================
+
+import os
+
+from tgacode import llm
+from tgacode.config import PAGE_CACHE_DIR
+from tgacode.extraction import iter_extracted, pages_to_text
+from tgacode.history import text_vector
+from tgacode.metrics import span
+from tgacode.pricecheck import apply_to_summary, check_prices, format_price_check
+from tgacode.report_sections import SECTION_TITLES, render_sections
+from tgacode.prompts import (
+    JSON_PROMPT_TOKENS,
+    QUESTION_PROMPT_TOKENS,
+    REFINE_PROMPT_TOKENS,
+    REPORT_PROMPT_TOKENS,
+    Section,
+    build_prompt,
+    prompt_budget,
+)
+from tgacode.retrieval import format_context, retrieve_for_questions
+
+QUESTION_OUTPUT_TOKENS = 512
+REPORT_OUTPUT_TOKENS = 1400
+SECTION_OUTPUT_TOKENS = 450  # je überarbeitetem Abschnitt
+JSON_OUTPUT_TOKENS = 512  # Standard von llm.generate_json_with_backoff
+COMBINED_OUTPUT_TOKENS = REPORT_OUTPUT_TOKENS + JSON_OUTPUT_TOKENS
+STAMMDATEN_FILE = "_projekt_stammdaten.txt"
+
+SECTION_LABELS = {
+    "stammdaten": "Stammdaten", "nachtrag": "Nachtrag", "kontext": "Recherche",
+    "bericht": "Bericht", "korrekturen": "Korrekturen", "preise": "Preisprüfung",
+    "abschnitte": "Abschnitte", "aenderungen": "Änderungen",
+}
+
+QUESTION_TEMPLATE = (
+    "Du bist ein Analyst für TGA-Bauprojekte. Lies den Nachtrag, "
+    "identifiziere die 3-5 Kernforderungen und formuliere für jede eine präzise Frage, "
+    "um relevante Infos in den Projektunterlagen zu finden. Gib NUR die Liste der Fragen aus.\n\n"
+    "NACHTRAG:\n{nachtrag}"
+)
+
+REPORT_TEMPLATE = """
+SYSTEM: Du bist 'der TGAcode', ein KI-Gutachter für TGA-Bauprojekte (VOB).
+DEINE AUFGABE: Erstelle einen finalen Prüfbericht im Markdown-Format mit:
+- Zusammenfassung (3-4 Stichpunkte)
+- VOB/B-Konformitäts-Check
+- Technische Prüfung & Preis-Check
+- Empfehlung & Nächste Schritte
+Belege Aussagen aus der Projekt-Akte mit der Quellenangabe in eckigen Klammern
+(z. B. [Datei LV.pdf, Seite 12]).
+Positionen und Summen sind bereits lokal nachgerechnet (siehe Preisprüfung):
+übernimm diese Zahlen, rechne nicht selbst nach.
+
+PROJEKT-STAMMDATEN (höchste Priorität):
+---
+{stammdaten}
+---
+
+LOKALE PREISPRÜFUNG (Positionen nachgerechnet, Summen verbindlich):
+---
+{preise}
+---
+
+DER ZU PRÜFENDE NACHTRAG:
+---
+{nachtrag}
+---
+
+RECHERCHE-ERGEBNISSE AUS DER PROJEKT-AKTE:
+---
+{kontext}
+---
+"""
+
+COMBINED_TEMPLATE = REPORT_TEMPLATE + """
+AUSGABE: Ein einziges JSON-Objekt mit den Feldern
+- bericht: der vollständige Prüfbericht im Markdown-Format (Gliederung wie oben)
+- vob_check, technische_pruefung, preis_check, gesamtsumme_korrigiert, empfehlung,
+  naechste_schritte: kurze, sachliche Feldwerte passend zum Bericht
+  (gesamtsumme_korrigiert = "Summe korrigiert" aus der lokalen Preisprüfung)
+"""
+
+JSON_TEMPLATE = """
+Erzeuge eine komprimierte, sachliche JSON-Zusammenfassung der Prüfung
+mit den Feldern: vob_check, technische_pruefung, preis_check,
+gesamtsumme_korrigiert, empfehlung, naechste_schritte.
+gesamtsumme_korrigiert ist die "Summe korrigiert" aus der lokalen Preisprüfung.
+
+Nutze ausschließlich diese Quellen:
+1) Projekt-Stammdaten:
+{stammdaten}
+
+Lokale Preisprüfung (verbindlich):
+{preise}
+
+2) Nachtrag (Volltext; ggf. gekürzt):
+{nachtrag}
+
+3) Recherchierte Projekt-Kontexte (gekürzt):
+{kontext}
+
+4) Eigener Bericht (Auszug):
+{bericht}
+
+Formuliere kurze, klare Werte. Keine Erläuterung, nur die reinen Feldwerte.
+"""
+
+REFINE_TEMPLATE = """
+SYSTEM: Du bist 'der TGAcode', KI-Gutachter.
+Überarbeite den bestehenden Bericht sachlich und präzise anhand der Korrekturen des Nutzers.
+Behalte die gleiche Gliederung (Zusammenfassung, VOB-Check, Technik/Preis-Check, Empfehlung).
+
+Bestehender Bericht:
+---
+{bericht}
+---
+
+Korrekturen des Nutzers:
+---
+{korrekturen}
+---
+
+Zusätzlicher Kontext (falls nötig):
+- Stammdaten: {stammdaten}
+- Lokale Preisprüfung (vor den Korrekturen): {preise}
+- Nachtrag (Kurzfassung): {nachtrag}
+- Recherche-Kontext: {kontext}
+"""
+
+DELTA_TEMPLATE = """
+SYSTEM: Du bist 'der TGAcode', ein KI-Gutachter für TGA-Bauprojekte (VOB).
+Der Nachtrag wurde in einer früheren Fassung bereits geprüft und jetzt geändert
+erneut eingereicht. Aktualisiere den bisherigen Prüfbericht: prüfe NUR die geänderten
+Stellen neu und übernimm alle übrigen Aussagen unverändert. Behalte die Gliederung
+(Zusammenfassung, VOB-Check, Technik/Preis-Check, Empfehlung) und die Quellenangaben
+in eckigen Klammern bei. Positionen und Summen sind bereits lokal nachgerechnet
+(siehe Preisprüfung): übernimm diese Zahlen, rechne nicht selbst nach.
+
+BISHERIGER PRÜFBERICHT (frühere Fassung):
+---
+{bericht}
+---
+
+ÄNDERUNGEN GEGENÜBER DER FRÜHEREN FASSUNG (- alt, + neu):
+---
+{aenderungen}
+---
+
+LOKALE PREISPRÜFUNG DER NEUEN FASSUNG (Summen verbindlich):
+---
+{preise}
+---
+
+PROJEKT-STAMMDATEN:
+---
+{stammdaten}
+---
+
+RECHERCHE-ERGEBNISSE (frühere Prüfung und geänderte Stellen):
+---
+{kontext}
+---
+"""
+
+SECTION_REFINE_TEMPLATE = """
+SYSTEM: Du bist 'der TGAcode', KI-Gutachter.
+Überarbeite NUR die folgenden Abschnitte des Prüfberichts sachlich und präzise anhand der
+Korrekturen des Nutzers: {titel}.
+Gib ausschließlich diese Abschnitte aus – mit unveränderten Überschriften, in derselben
+Reihenfolge, im Markdown-Format. Alle übrigen Abschnitte bleiben unverändert.
+
+ZU ÜBERARBEITENDE ABSCHNITTE:
+---
+{abschnitte}
+---
+
+Korrekturen des Nutzers:
+---
+{korrekturen}
+---
+
+Übrige Abschnitte (unverändert, nur Kontext):
+---
+{bericht}
+---
+
+Zusätzlicher Kontext (falls nötig):
+- Stammdaten: {stammdaten}
+- Lokale Preisprüfung (vor den Korrekturen): {preise}
+- Nachtrag (Kurzfassung): {nachtrag}
+- Recherche-Kontext: {kontext}
+"""
+
+PARTIAL_JSON_TEMPLATE = """
+Aktualisiere nach den Korrekturen des Nutzers nur diese Felder der JSON-Zusammenfassung:
+{felder}.
+Die Felder fassen die überarbeiteten Berichtsabschnitte kurz und sachlich zusammen.
+
+1) Überarbeitete Abschnitte:
+{abschnitte}
+
+2) Korrekturen des Nutzers:
+{korrekturen}
+
+3) Projekt-Stammdaten:
+{stammdaten}
+
+4) Lokale Preisprüfung (vor den Korrekturen; Korrekturen des Nutzers gehen vor):
+{preise}
+
+Keine Erläuterung, nur reine Feldwerte im JSON-Objekt.
+"""
+
+REFINED_JSON_TEMPLATE = """
+Erzeuge eine komprimierte, sachliche JSON-Zusammenfassung der Prüfung
+mit den Feldern: vob_check, technische_pruefung, preis_check,
+gesamtsumme_korrigiert, empfehlung, naechste_schritte.
+
+Quellen:
+1) Projekt-Stammdaten:
+{stammdaten}
+
+Lokale Preisprüfung (vor den Korrekturen; Korrekturen des Nutzers gehen vor):
+{preise}
+
+2) Nachtrag (Volltext; ggf. gekürzt):
+{nachtrag}
+
+3) Recherchierte Projekt-Kontexte (gekürzt):
+{kontext}
+
+4) Überarbeiteter Bericht (Auszug):
+{bericht}
+
+5) Korrekturen des Nutzers:
+{korrekturen}
+
+Keine Erläuterung, nur reine Feldwerte im JSON-Objekt.
+"""
+
+
+def read_stammdaten(project_path):
+    path = os.path.join(project_path, STAMMDATEN_FILE)
+    if not os.path.exists(path):
+        return ""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def budgeted_prompt(template, sections, cap, max_output_tokens):
+    """Prompt im Token-Budget (Obergrenze des Aufrufs, höchstens Eingabelimit der Modelle)."""
+    budget = prompt_budget(cap, max_output_tokens, llm.input_token_limit())
+    return build_prompt(template, sections, budget)
+
+
+def context_section(hits, questions, final_ctx, priority=2, min_tokens=0, max_tokens=None):
+    """Recherche-Abschnitt: Treffer nach Relevanz gekürzt, sonst der fertige Kontexttext."""
+    if hits:
+        return Section("kontext", hits=hits, questions=questions or None,
+                       priority=priority, min_tokens=min_tokens, max_tokens=max_tokens)
+    return Section("kontext", final_ctx, priority=priority, min_tokens=min_tokens, max_tokens=max_tokens)
+
+
+def read_nachtrag(sources, page_cache_dir=PAGE_CACHE_DIR):
+    """Volltext der Nachtrags-PDFs (Seitentexte aus dem Cache, sofern bekannt)."""
+    with span("pdf.extract", files=len(sources)) as sp:
+        docs = list(iter_extracted(sources, cache_dir=page_cache_dir))
+        sp["pages"] = sum(len(pages) for pages in docs)
+    return "".join(pages_to_text(pages) for pages in docs)
+
+
+def run_price_check(nt_text, stammdaten, overrides=""):
+    with span("price.check") as sp:
+        prices = check_prices(nt_text, stammdaten, overrides)
+        sp.update(positions=len(prices["positions"]), issues=len(prices["issues"]))
+    return prices
+
+
+def question_prompt(nt_text):
+    return budgeted_prompt(QUESTION_TEMPLATE, [Section("nachtrag", nt_text)],
+                           QUESTION_PROMPT_TOKENS, QUESTION_OUTPUT_TOKENS)
+
+
+def parse_questions(text):
+    return [q.strip() for q in text.strip().split("\n") if q.strip()]
+
+
+def retrieve_context(collection, embedder, questions, nt_text, lexical=None):
+    """
+    (hits, final_ctx): eine Abfrage für alle Fragen, sonst der Nachtragstext als Query.
+    Mit lexical (BM25-Index des Projekts) hybrid; der Fallback kommt dann mit weniger Treffern aus.
+    """
+    if questions:
+        hits = retrieve_for_questions(collection, embedder, questions, n_results=3, lexical=lexical)
+        return hits, format_context(hits, questions)
+    # Eco-/Fallback: nutze Nachtragstext als Query
+    hits = retrieve_for_questions(collection, embedder, [nt_text[:1000]],
+                                  n_results=5 if lexical is None else 4, lexical=lexical)
+    return hits, "Kontext (Eco/Fallback):\n" + format_context(hits)
+
+
+# Die Prompt-Bausteine erhalten den Prüfstand als Dict:
+# stammdaten, nt_text, hits, questions, final_ctx, prices (und ggf. report)
+
+def find_previous(history, embedder, nt_text):
+    """(frühere Prüfung laut history.find_similar oder None, Text-Embedding für history.add)."""
+    with span("history.match") as sp:
+        vector = text_vector(embedder, nt_text)
+        match = history.find_similar(nt_text, vector)
+        sp["ratio"] = round(match["ratio"], 3) if match else None
+    return match, vector
+
+
+def reuse_context(match, collection, embedder, lexical=None):
+    """
+    (questions, hits, final_ctx) der früheren Prüfung. Die neuen Zeilen werden als
+    zusätzliche Frage recherchiert; deren Treffer kommen zu den bisherigen dazu.
+    """
+    record = match["record"]
+    questions = list(record["questions"])
+    hits = [dict(h, questions=list(h.get("questions") or [])) for h in record["hits"]]
+    added = match["added"].strip()
+    if added:
+        new_hits = retrieve_for_questions(collection, embedder, [added[:1000]], n_results=3, lexical=lexical)
+        known = {h["id"]: h for h in hits}
+        qi = len(questions)
+        if questions:  # Eco-Prüfungen haben keine Fragen, dann ohne Label
+            questions.append("Geänderte Stellen: " + " ".join(added.split())[:300])
+        for hit in new_hits:
+            hit["questions"] = [qi] if questions else []
+            if hit["id"] in known:
+                known[hit["id"]]["questions"].extend(hit["questions"])
+            else:
+                hits.append(hit)
+    return questions, hits, format_context(hits, questions or None)
+
+
+def reuse_summary(match):
+    """Einzeiler für Status und Logs."""
+    names = ", ".join(match["record"].get("names") or []) or "früherer Nachtrag"
+    return (f"Frühere Prüfung wiederverwendet ({names}, {match['ratio']:.0%} gleich): "
+            f"{match['changed_lines']} geänderte Zeile(n) neu geprüft")
+
+
+def price_section(check, priority=0):
+    return Section("preise", format_price_check(check.get("prices")), priority=priority, max_tokens=2_500)
+
+
+def nachtrag_limit(check, tokens):
+    """Mit erkannten Positionen braucht der Nachtrag nur noch Begründung und Kontext."""
+    prices = check.get("prices")
+    return tokens if prices and prices["positions"] else None
+
+
+def report_prompt(check):
+    return budgeted_prompt(REPORT_TEMPLATE, [
+        Section("stammdaten", check["stammdaten"], priority=0, max_tokens=2_000),
+        price_section(check, priority=0),
+        Section("nachtrag", check["nt_text"], priority=1, min_tokens=3_000,
+                max_tokens=nachtrag_limit(check, 3_000)),
+        context_section(check["hits"], check["questions"], check["final_ctx"], priority=2, min_tokens=3_000),
+    ], REPORT_PROMPT_TOKENS, REPORT_OUTPUT_TOKENS)
+
+
+def combined_prompt(check):
+    """Single-Pass: gleiche Abschnitte wie der Bericht, Ausgabe als JSON mit Bericht + Feldern."""
+    return budgeted_prompt(COMBINED_TEMPLATE, [
+        Section("stammdaten", check["stammdaten"], priority=0, max_tokens=2_000),
+        price_section(check, priority=0),
+        Section("nachtrag", check["nt_text"], priority=1, min_tokens=3_000,
+                max_tokens=nachtrag_limit(check, 3_000)),
+        context_section(check["hits"], check["questions"], check["final_ctx"], priority=2, min_tokens=3_000),
+    ], REPORT_PROMPT_TOKENS, COMBINED_OUTPUT_TOKENS)
+
+
+def generate_combined(prompt, cache=None, notify=None):
+    """
+    (Bericht, Zusammenfassung) aus einem Schema-Aufruf. Lehnt das Modell das
+    Schema ab oder fehlt der Bericht, wird der Fehler weitergereicht (→ Zwei-Schritt-Ablauf).
+    """
+    data = llm.generate_json_with_backoff(
+        prompt, llm.report_summary_json_schema(), cache=cache, notify=notify,
+        max_output_tokens=COMBINED_OUTPUT_TOKENS, schema_only=True,
+    )
+    report = data.pop("bericht", None) if isinstance(data, dict) else None
+    if not isinstance(report, str) or not report.strip():
+        raise ValueError("Single-Pass-Antwort ohne Bericht.")
+    return report, data
+
+
+def delta_prompt(check, match):
+    """Aktualisiert den früheren Bericht anhand des Diffs (statt den Nachtrag neu zu prüfen)."""
+    return budgeted_prompt(DELTA_TEMPLATE, [
+        Section("aenderungen", match["diff"] or "Keine Textänderungen erkannt.", priority=0, max_tokens=3_000),
+        Section("bericht", match["record"]["report"], priority=0),
+        price_section(check, priority=1),
+        Section("stammdaten", check["stammdaten"], priority=2, max_tokens=1_000),
+        context_section(check["hits"], check["questions"], check["final_ctx"], priority=3, max_tokens=3_000),
+    ], REFINE_PROMPT_TOKENS, REPORT_OUTPUT_TOKENS)
+
+
+def json_prompt(check, report):
+    return budgeted_prompt(JSON_TEMPLATE, [
+        Section("stammdaten", check["stammdaten"], priority=0, max_tokens=1_500),
+        price_section(check, priority=0),
+        Section("bericht", report, priority=1, min_tokens=1_500),
+        Section("nachtrag", check["nt_text"], priority=2, min_tokens=1_500,
+                max_tokens=nachtrag_limit(check, 1_500)),
+        context_section(check["hits"], check["questions"], check["final_ctx"], priority=3, min_tokens=1_000),
+    ], JSON_PROMPT_TOKENS, JSON_OUTPUT_TOKENS)
+
+
+def recheck_prices(check, corrections):
+    """
+    Preis-Check nach Korrekturen (alle bisherigen Korrekturen, Stundensätze daraus
+    gehen den Stammdaten vor). Aktualisiert check["prices"], damit die Summe der
+    überarbeiteten JSON-Zusammenfassung wieder lokal nachgerechnet ist.
+    """
+    check["corrections"] = check.get("corrections", []) + [corrections]
+    check["prices"] = run_price_check(check["nt_text"], check["stammdaten"], "\n".join(check["corrections"]))
+    return check["prices"]
+
+
+def refine_prompt(check, report, corrections):
+    return budgeted_prompt(REFINE_TEMPLATE, [
+        Section("korrekturen", corrections, priority=0),
+        Section("bericht", report, priority=1),
+        Section("stammdaten", check["stammdaten"], priority=2, max_tokens=600),
+        price_section(check, priority=2),
+        Section("nachtrag", check["nt_text"], priority=3, max_tokens=1_500),
+        context_section(check["hits"], check["questions"], check["final_ctx"], priority=4, max_tokens=1_500),
+    ], REFINE_PROMPT_TOKENS, REPORT_OUTPUT_TOKENS)
+
+
+def refined_json_prompt(check, report, corrections):
+    return budgeted_prompt(REFINED_JSON_TEMPLATE, [
+        Section("korrekturen", corrections, priority=0),
+        Section("stammdaten", check["stammdaten"], priority=1, max_tokens=1_500),
+        price_section(check, priority=1),
+        Section("bericht", report, priority=2, min_tokens=1_500),
+        Section("nachtrag", check["nt_text"], priority=3, min_tokens=1_500),
+        context_section(check["hits"], check["questions"], check["final_ctx"], priority=4, min_tokens=1_000),
+    ], JSON_PROMPT_TOKENS, JSON_OUTPUT_TOKENS)
+
+
+def section_output_tokens(keys):
+    return min(REPORT_OUTPUT_TOKENS, SECTION_OUTPUT_TOKENS * max(1, len(keys)))
+
+
+def section_refine_prompt(check, sections, keys, corrections):
+    """Prompt, der nur die Abschnitte in keys neu schreibt (übrige Abschnitte als Kontext)."""
+    template = SECTION_REFINE_TEMPLATE.replace(
+        "{titel}", ", ".join(SECTION_TITLES[k] for k in keys)
+    )
+    return budgeted_prompt(template, [
+        Section("korrekturen", corrections, priority=0),
+        Section("abschnitte", render_sections(sections, keys), priority=0),
+        Section("preise", format_price_check(check.get("prices")), priority=1, max_tokens=2_500),
+        Section("bericht", render_sections(sections, keys, include=False), priority=2, max_tokens=1_500),
+        Section("stammdaten", check["stammdaten"], priority=2, max_tokens=600),
+        Section("nachtrag", check["nt_text"], priority=3, max_tokens=1_500),
+        context_section(check["hits"], check["questions"], check["final_ctx"], priority=4, max_tokens=1_500),
+    ], REFINE_PROMPT_TOKENS, section_output_tokens(keys))
+
+
+def partial_json_prompt(check, sections, keys, corrections, fields):
+    """Prompt für die JSON-Felder der überarbeiteten Abschnitte."""
+    template = PARTIAL_JSON_TEMPLATE.replace("{felder}", ", ".join(fields))
+    return budgeted_prompt(template, [
+        Section("korrekturen", corrections, priority=0),
+        Section("abschnitte", render_sections(sections, keys), priority=0),
+        Section("stammdaten", check["stammdaten"], priority=1, max_tokens=1_000),
+        Section("preise", format_price_check(check.get("prices")), priority=1, max_tokens=2_000),
+    ], JSON_PROMPT_TOKENS, JSON_OUTPUT_TOKENS)
+
+
+def run_check(nt_sources, collection, embedder, stammdaten="", eco=False, cache=None, notify=None,
+              single_pass=False, lexical=None, history=None, names=(), page_cache_dir=PAGE_CACHE_DIR):
+    """
+    Kompletter Prüfdurchlauf ohne UI. Liefert den Prüfstand (siehe oben)
+    ergänzt um report, summary, usage und mode ("single-pass", "zwei-schritt"
+    oder "aktualisiert"). Fehler bei Fragen/Retrieval und beim Single-Pass führen
+    wie in der App zum Fallback, Fehler bei Bericht oder JSON werden weitergereicht.
+    Mit history (CheckHistory) wird ein geänderter, früher geprüfter Nachtrag nur
+    anhand des Diffs aktualisiert ("reused") und jede Prüfung abgelegt.
+    """
+    nt_text = read_nachtrag(nt_sources, page_cache_dir)
+    prices = run_price_check(nt_text, stammdaten)
+
+    match = vector = None
+    if history is not None:
+        try:
+            match, vector = find_previous(history, embedder, nt_text)
+        except Exception as e:
+            llm.notify_status(notify, f"Prüfhistorie nicht verfügbar: {e}")
+    if match is not None:
+        check = _update_check(match, nt_text, prices, collection, embedder, stammdaten, cache, notify, lexical)
+    else:
+        check = _full_check(nt_text, prices, collection, embedder, stammdaten, eco, cache, notify,
+                            single_pass, lexical)
+    if vector is not None:
+        history.add(check, vector, names)
+    return check
+
+
+def _update_check(match, nt_text, prices, collection, embedder, stammdaten, cache, notify, lexical):
+    try:
+        questions, hits, final_ctx = reuse_context(match, collection, embedder, lexical)
+    except Exception as e:
+        llm.notify_status(notify, f"Recherche zu den Änderungen fehlgeschlagen: {e}")
+        record = match["record"]
+        questions, hits, final_ctx = record["questions"], record["hits"], record["final_ctx"]
+    check = {"stammdaten": stammdaten, "nt_text": nt_text, "hits": hits, "questions": questions,
+             "final_ctx": final_ctx, "prices": prices, "mode": "aktualisiert",
+             "reused": {"names": match["record"].get("names") or [], "ratio": round(match["ratio"], 3),
+                        "changed_lines": match["changed_lines"]}}
+    prompt, check["usage"] = delta_prompt(check, match)
+    check["report"] = llm.generate_with_backoff(
+        prompt, max_output_tokens=REPORT_OUTPUT_TOKENS, temperature=0.2, cache=cache, notify=notify,
+    )
+    prompt, _ = json_prompt(check, check["report"])
+    check["summary"] = apply_to_summary(
+        llm.generate_json_with_backoff(prompt, llm.summary_json_schema(), cache=cache, notify=notify), prices,
+    )
+    return check
+
+
+def _full_check(nt_text, prices, collection, embedder, stammdaten, eco, cache, notify, single_pass, lexical):
+    questions = []
+    if not eco:
+        prompt, _ = question_prompt(nt_text)
+        try:
+            questions = parse_questions(llm.generate_with_backoff(
+                prompt, max_output_tokens=QUESTION_OUTPUT_TOKENS, temperature=0.2, cache=cache, notify=notify,
+            ))
+        except Exception as e:
+            llm.notify_status(notify, f"Fragengenerierung fehlgeschlagen – Eco-Fallback: {e}")
+
+    try:
+        hits, final_ctx = retrieve_context(collection, embedder, questions, nt_text, lexical)
+    except Exception as e:
+        hits, final_ctx = [], f"Fehler bei der Datenbeschaffung: {e}"
+
+    check = {"stammdaten": stammdaten, "nt_text": nt_text, "hits": hits,
+             "questions": questions, "final_ctx": final_ctx, "prices": prices}
+    if single_pass:
+        prompt, check["usage"] = combined_prompt(check)
+        try:
+            check["report"], summary = generate_combined(prompt, cache=cache, notify=notify)
+            check["summary"] = apply_to_summary(summary, prices)
+            check["mode"] = "single-pass"
+            return check
+        except Exception as e:
+            llm.notify_status(notify, f"Single-Pass nicht möglich – Bericht und JSON getrennt: {e}")
+
+    check["mode"] = "zwei-schritt"
+    prompt, check["usage"] = report_prompt(check)
+    check["report"] = llm.generate_with_backoff(
+        prompt, max_output_tokens=REPORT_OUTPUT_TOKENS, temperature=0.2, cache=cache, notify=notify,
+    )
+    prompt, _ = json_prompt(check, check["report"])
+    check["summary"] = apply_to_summary(
+        llm.generate_json_with_backoff(prompt, llm.summary_json_schema(), cache=cache, notify=notify), prices,
+    )
+    return check
@@ -0,0 +1,274 @@
+# ==============================================================================
+# Lokaler Preis-Check für Nachtragspositionen (ohne KI)
+# - Liest Positionszeilen (OZ, Menge, Einheit, EP, GP) aus dem Nachtragstext,
+#   einzeilig oder mit Mengenzeile unter der Positionsüberschrift
+# - Rechnet GP = Menge × EP und die Summen exakt nach (Decimal, kaufmännisch gerundet)
+# - Vereinbarte Stundensätze aus den Stammdaten deckeln Stundenlohnpositionen
+# - Ergebnis als kompakter Textblock für die Prompts statt ganzer Seiten
+# ==============================================================================
+
+import re
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+CENT = Decimal("0.01")
+TOLERANCE = Decimal("0.01")  # Rundungsdifferenz, die nicht als Fehler gilt
+
+_NUM = r"\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,3})?|\d+(?:[.,]\d{1,3})?"
+_UNIT = (
+    r"Stück|Stck\.?|Stk\.?|St\.?|lfdm|lfm|m²|m³|m2|m3|m|Stunden?|Std\.?|h|"
+    r"pauschal|psch\.?|PA|kg|t|l|Satz|Einh\.?|ME"
+)
+_CUR = r"(?:€|EUR|Euro)"
+
+_OZ_RE = re.compile(
+    r"^\s*(?:Pos(?:ition)?\.?\s*)?"
+    r"(?!\d{1,2}\.(?:0?[1-9]|1[0-2])\.(?:19|20)\d{2}\b)"  # kein Datum
+    r"(?P<oz>\d{1,4}(?:\.\d{1,4}){1,4})\.?\s+(?P<text>\S.*)$"
+)
+_FIGURES_RE = re.compile(
+    rf"(?:Menge\s*:?\s*)?(?P<menge>{_NUM})\s*(?P<einheit>{_UNIT})\s+"
+    rf"(?:EP\s*:?\s*)?(?P<ep>{_NUM})\s*{_CUR}?"
+    rf"(?:\s+(?:GP\s*:?\s*)?(?P<gp>{_NUM})\s*{_CUR}?)?\s*$"
+)
+_TOTAL_RE = re.compile(
+    rf"(?:Gesamtsumme|Nettosumme|Angebotssumme|Gesamtbetrag|Summe)\b[^\n\d]{{0,40}}?(?P<sum>{_NUM})\s*{_CUR}",
+    re.IGNORECASE,
+)
+# Brutto-Zeilen ("inkl. USt.", "Bruttosumme", "MwSt.") bzw. ausdrücklich netto ("zzgl. MwSt.")
+_GROSS_RE = re.compile(r"\b(?:ust\b|mwst|inkl|brutto)", re.IGNORECASE)
+_NET_RE = re.compile(r"netto|\b(?:zzgl|exkl)\b", re.IGNORECASE)
+_RATE_KEYWORD_RE = re.compile(
+    r"Stundens(?:a|ä)tze?|Stundenl(?:o|ö)hne?|Stundenverrechnungss(?:a|ä)tze?|"
+    r"Verrechnungss(?:a|ä)tze?|Lohns(?:a|ä)tze?|Regiestunden?",
+    re.IGNORECASE,
+)
+_RATE_VALUE_RE = re.compile(rf"(?P<rate>{_NUM})\s*(?:{_CUR}|€/h|EUR/h)")
+_FILLER = {"ist", "sind", "beträgt", "betragen", "gilt", "je", "pro", "stunde", "netto", "vereinbart",
+           "für", "von", "der", "die", "das", "den", "mit", "bei", "und", "h", "fa", "fa.", "firma"}
+HOUR_UNITS = {"h", "std", "std.", "stunde", "stunden"}
+
+
+def parse_number(text):
+    """Deutsche und englische Schreibweise: '1.234,56', '1,234.56', '12,5', '245.50'."""
+    s = text.strip().replace("'", "")
+    if "," in s and "." in s:
+        dec = "," if s.rfind(",") > s.rfind(".") else "."
+        s = s.replace("." if dec == "," else ",", "").replace(dec, ".")
+    elif "," in s:
+        s = s.replace(",", ".") if s.count(",") == 1 else s.replace(",", "")
+    elif s.count(".") > 1 or re.fullmatch(r"\d{1,3}\.\d{3}", s):
+        s = s.replace(".", "")  # Tausenderpunkte
+    try:
+        return Decimal(s)
+    except InvalidOperation:
+        return None
+
+
+def money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def euro(value):
+    """Betrag im deutschen Format, z. B. '12.345,67 €'."""
+    if value is None:
+        return "–"
+    return f"{money(value):,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _fmt(value):
+    return euro(value)[:-2] if value is not None else "–"
+
+
+def _qty(value):
+    return f"{value.normalize():f}".replace(".", ",")
+
+
+def parse_positions(text):
+    """
+    Positionen aus dem Nachtragstext. Eine Zeile mit Menge/Einheit/EP(/GP)
+    gehört zur zuletzt gelesenen OZ-Zeile (oder steht in derselben Zeile).
+    """
+    positions = []
+    current = None
+    for line in (text or "").splitlines():
+        oz_match = _OZ_RE.match(line)
+        if oz_match:
+            current = {"oz": oz_match.group("oz"), "text": oz_match.group("text").strip()}
+        fig = _FIGURES_RE.search(line)
+        if not fig:
+            continue
+        menge, ep = parse_number(fig.group("menge")), parse_number(fig.group("ep"))
+        if menge is None or ep is None:
+            continue
+        gp = parse_number(fig.group("gp")) if fig.group("gp") else None
+        pos = dict(current or {"oz": None, "text": ""})
+        if oz_match:
+            pos["text"] = line[oz_match.start("text"):fig.start()].strip(" :-–")
+        pos.update(menge=menge, einheit=fig.group("einheit"), ep=ep, gp=gp)
+        positions.append(pos)
+        current = None  # jede Position nur einmal
+    return positions
+
+
+def parse_stated_total(text):
+    """
+    Letzte Netto-Summe im Nachtrag: ausdrücklich als netto (bzw. zzgl. USt.)
+    bezeichnete Summen haben Vorrang, Brutto-Zeilen (inkl. USt., MwSt.) zählen nicht.
+    """
+    net = total = None
+    for line in (text or "").splitlines():
+        is_net = bool(_NET_RE.search(line))
+        if not is_net and _GROSS_RE.search(line):
+            continue
+        for m in _TOTAL_RE.finditer(line):
+            total = parse_number(m.group("sum"))
+            if is_net:
+                net = total
+    return net if net is not None else total
+
+
+def parse_rates(stammdaten):
+    """
+    Vereinbarte Stundensätze aus den Stammdaten, z. B. 'Stundensatz Fa. Reiter ist 48 €'
+    oder 'Stundensätze: Monteur 52,50 €/h, Helfer 41 €'. Liefert [(Bezeichnung, Satz)].
+    """
+    rates = []
+    for line in (stammdaten or "").splitlines():
+        if not _RATE_KEYWORD_RE.search(line):
+            continue
+        for segment in re.split(r"[;,](?!\d)", line):
+            value = _RATE_VALUE_RE.search(segment)
+            if not value:
+                continue
+            rate = parse_number(value.group("rate"))
+            label = _RATE_KEYWORD_RE.sub(" ", segment[:value.start()])
+            words = [w for w in re.split(r"[\s:=]+", label) if w and w.lower() not in _FILLER]
+            if rate is not None:
+                rates.append((" ".join(words), rate))
+    return rates
+
+
+def _label_tokens(label):
+    return [w.lower().strip(".") for w in label.split() if len(w.strip(".")) >= 3]
+
+
+def _matches(label, scope):
+    tokens = _label_tokens(label)
+    return bool(tokens) and all(t in scope for t in tokens)
+
+
+def _rate_for(position, rates, nt_text, position_texts=()):
+    """
+    Passender Stundensatz: Bezeichnung in der Position, sonst im Nachtrag (nur
+    Bezeichnungen, die in keiner Position stehen, z. B. die Firma), sonst ein
+    eindeutiger Satz ohne Bezeichnung. Sätze mit Bezeichnung gelten nie für
+    fremde Positionen → (None, None), die Position erhält einen Hinweis.
+    """
+    if not rates:
+        return None, None
+    hits = [(label, rate) for label, rate in rates if _matches(label, position["text"].lower())]
+    if not hits:
+        scope = (nt_text or "").lower()
+        hits = [(label, rate) for label, rate in rates
+                if _matches(label, scope) and not any(_matches(label, t) for t in position_texts)]
+    if hits:
+        return min(hits, key=lambda r: r[1])
+    general = {rate for label, rate in rates if not _label_tokens(label)}
+    if len(general) == 1:
+        return "", general.pop()
+    return None, None
+
+
+def check_prices(nt_text, stammdaten="", overrides=""):
+    """
+    Prüft die Positionen des Nachtrags. Liefert ein Dict mit positions (je OZ,
+    Menge, Einheit, EP, GP lt. Nachtrag, gp_calc, ep_korr, gp_korr, notes),
+    issues sowie den Summen summe_positionen (lt. Nachtrag), summe_angegeben,
+    summe_nachgerechnet und summe_korrigiert (Decimal bzw. None).
+    overrides (Korrekturen des Nutzers): deren Stundensätze ersetzen gleich
+    bezeichnete aus den Stammdaten; bei mehreren gilt der letzte.
+    """
+    positions = parse_positions(nt_text)
+    corrected = {label.lower(): (label, rate) for label, rate in parse_rates(overrides)}
+    rates = list(corrected.values()) + [r for r in parse_rates(stammdaten) if r[0].lower() not in corrected]
+    position_texts = [p["text"].lower() for p in positions]
+    issues = []
+    for pos in positions:
+        pos["notes"] = []
+        pos["gp_calc"] = money(pos["menge"] * pos["ep"])
+        label = pos["oz"] or pos["text"][:30] or "ohne OZ"
+        if pos["gp"] is not None and abs(pos["gp"] - pos["gp_calc"]) > TOLERANCE:
+            pos["notes"].append(f"GP {_fmt(pos['gp'])} ≠ Menge × EP {_fmt(pos['gp_calc'])}")
+        pos["ep_korr"] = pos["ep"]
+        if pos["einheit"].lower() in HOUR_UNITS:
+            rate_label, rate = _rate_for(pos, rates, nt_text, position_texts)
+            if rate is not None and pos["ep"] > rate:
+                pos["ep_korr"] = rate
+                pos["notes"].append(
+                    f"Stundensatz {_fmt(pos['ep'])} > vereinbart {_fmt(rate)}"
+                    + (f" ({rate_label})" if rate_label else "")
+                )
+            elif rate is None and rates:
+                pos["notes"].append("Stundensatz nicht eindeutig zuzuordnen")
+        pos["gp_korr"] = money(pos["menge"] * pos["ep_korr"])
+        issues.extend(f"{label}: {note}" for note in pos["notes"])
+
+    stated = parse_stated_total(nt_text)
+    summe_positionen = sum((p["gp"] if p["gp"] is not None else p["gp_calc"] for p in positions), Decimal(0))
+    summe_nachgerechnet = sum((p["gp_calc"] for p in positions), Decimal(0))
+    summe_korrigiert = sum((p["gp_korr"] for p in positions), Decimal(0))
+    if positions and stated is not None and abs(stated - summe_positionen) > TOLERANCE:
+        issues.append(f"Summe lt. Nachtrag {_fmt(stated)} ≠ Summe der Positionen {_fmt(summe_positionen)}")
+    return {
+        "positions": positions,
+        "rates": rates,
+        "issues": issues,
+        "summe_angegeben": stated,
+        "summe_positionen": summe_positionen if positions else None,
+        "summe_nachgerechnet": summe_nachgerechnet if positions else None,
+        "summe_korrigiert": summe_korrigiert if positions else None,
+    }
+
+
+def format_price_check(result):
+    """Kompakter Textblock für die Prompts (Positionstabelle, Summen, Abweichungen)."""
+    positions = result["positions"] if result else []
+    if not positions:
+        return "Keine Positionstabelle erkannt – Preise bitte aus dem Nachtragstext prüfen."
+    lines = ["OZ | Kurztext | Menge | Einheit | EP | GP lt. NT | GP geprüft"]
+    for p in positions:
+        lines.append(" | ".join([
+            p["oz"] or "–", p["text"][:50], _qty(p["menge"]), p["einheit"],
+            _fmt(p["ep"]) if p["ep_korr"] == p["ep"] else f"{_fmt(p['ep'])} → {_fmt(p['ep_korr'])}",
+            _fmt(p["gp"]), _fmt(p["gp_korr"]),
+        ]))
+    lines += [
+        "",
+        f"Summe lt. Nachtrag: {euro(result['summe_angegeben'])}",
+        f"Summe der Positionen lt. Nachtrag: {euro(result['summe_positionen'])}",
+        f"Summe nachgerechnet (Menge × EP): {euro(result['summe_nachgerechnet'])}",
+        f"Summe korrigiert (vereinbarte Sätze): {euro(result['summe_korrigiert'])}",
+    ]
+    if result["rates"]:
+        lines.append("Vereinbarte Stundensätze: " + ", ".join(
+            f"{label or 'allgemein'} {_fmt(rate)}" for label, rate in result["rates"]
+        ))
+    lines.append("Abweichungen: " + ("; ".join(result["issues"]) if result["issues"] else "keine"))
+    return "\n".join(lines)
+
+
+def short_summary(result):
+    """Einzeiler für Status und Logs."""
+    if not result or not result["positions"]:
+        return "Preis-Check (lokal): keine Positionen erkannt"
+    return (
+        f"Preis-Check (lokal): {len(result['positions'])} Positionen · "
+        f"korrigiert {euro(result['summe_korrigiert'])} · {len(result['issues'])} Abweichung(en)"
+    )
+
+
+def apply_to_summary(summary, result):
+    """Übernimmt die lokal berechnete Summe in die JSON-Zusammenfassung."""
+    if isinstance(summary, dict) and result and result["positions"]:
+        summary["gesamtsumme_korrigiert"] = euro(result["summe_korrigiert"])
+    return summary
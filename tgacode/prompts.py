@@ -0,0 +1,139 @@
+# ==============================================================================
+# Prompt-Zusammenstellung mit Token-Budget
+# - Abschnitte (Stammdaten, Nachtrag, Recherche, Bericht, Korrekturen) mit
+#   Priorität, Mindest- und Höchstbudget
+# - Gesamtbudget je Aufruf, begrenzt durch das Eingabelimit der Modelle
+# - Recherche-Treffer nach Relevanz: die schwächsten fallen zuerst weg
+# - Lange Texte behalten Anfang und Ende (Summen, Unterschriften), die Mitte wird gekürzt
+# ==============================================================================
+
+from tgacode.ratelimit import CHARS_PER_TOKEN, count_tokens
+from tgacode.retrieval import format_context
+
+SAFETY_TOKENS = 256    # Reserve für Schätzfehler und Systemanteile
+TRUNCATION_NOTE = "\n[… gekürzt …]\n"
+
+# Obergrenzen je Aufruf (Eingabe-Tokens) → planbare Kosten und Latenz
+QUESTION_PROMPT_TOKENS = 3_000
+REPORT_PROMPT_TOKENS = 12_000
+JSON_PROMPT_TOKENS = 8_000
+REFINE_PROMPT_TOKENS = 10_000
+
+
+def prompt_budget(cap, max_output_tokens, input_limit):
+    """Eingabebudget: Obergrenze des Aufrufs, höchstens Modelllimit minus Ausgabe und Reserve."""
+    return max(0, min(cap, input_limit - max_output_tokens - SAFETY_TOKENS))
+
+
+def truncate_to_tokens(text, tokens, head_share=2 / 3):
+    """Kürzt auf ca. `tokens` Tokens; Anfang und Ende bleiben erhalten."""
+    text = text or ""
+    if count_tokens(text) <= tokens:
+        return text
+    chars = int(tokens * CHARS_PER_TOKEN) - len(TRUNCATION_NOTE)
+    if chars <= 0:
+        return ""
+    head = int(chars * head_share)
+    tail = chars - head
+    return text[:head] + TRUNCATION_NOTE + (text[-tail:] if tail > 0 else "")
+
+
+class Section:
+    """
+    Ein Prompt-Abschnitt. Kleinere priority wird zuerst bedient; min_tokens
+    wird vorab reserviert, max_tokens deckelt den Abschnitt. Mit hits
+    (Retrieval-Treffer) entsteht der Text aus den relevantesten Chunks.
+    """
+
+    __slots__ = ("name", "text", "priority", "min_tokens", "max_tokens", "hits", "questions")
+
+    def __init__(self, name, text="", priority=1, min_tokens=0, max_tokens=None, hits=None, questions=None):
+        self.name = name
+        self.text = text or ""
+        self.priority = priority
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.hits = hits
+        self.questions = questions
+
+    def need(self):
+        if self.hits is not None:
+            return count_tokens(format_context(self.hits, self.questions))
+        return count_tokens(self.text)
+
+    def render(self, tokens):
+        """(Text, Anzahl weggelassener Treffer) innerhalb von `tokens`."""
+        if self.hits is None:
+            return truncate_to_tokens(self.text, tokens), 0
+        if self.need() <= tokens:
+            return format_context(self.hits, self.questions), 0
+        # Fusionierte Treffer nach RRF-Wertung, sonst nach Vektordistanz
+        ranked = sorted(
+            self.hits,
+            key=lambda h: -h["score"] if h.get("score") is not None
+            else (h["distance"] if h.get("distance") is not None else float("inf")),
+        )
+        header = count_tokens(format_context([], self.questions)) if self.questions else 0
+        used = header
+        chosen = []
+        for hit in ranked:
+            cost = count_tokens(format_context([hit], self.questions)) - header
+            if used + cost > tokens:
+                continue  # ggf. passt ein kürzerer, weniger relevanter Chunk noch
+            chosen.append(hit)
+            used += cost
+        if not chosen:
+            return "", len(ranked)
+        return format_context(chosen, self.questions), len(ranked) - len(chosen)
+
+
+def allocate(sections, budget):
+    """
+    Verteilt das Budget: erst die Mindestanteile nach Priorität,
+    dann der Rest nach Priorität bis zum Bedarf bzw. Höchstbudget.
+    """
+    order = sorted(sections, key=lambda s: s.priority)
+    need = {s.name: s.need() for s in sections}
+    cap = {s.name: min(need[s.name], s.max_tokens if s.max_tokens is not None else need[s.name]) for s in sections}
+    alloc = {s.name: 0 for s in sections}
+    left = budget
+    for s in order:
+        take = min(s.min_tokens, cap[s.name], left)
+        alloc[s.name] = take
+        left -= take
+    for s in order:
+        take = min(cap[s.name] - alloc[s.name], left)
+        alloc[s.name] += take
+        left -= take
+    return alloc, need
+
+
+def build_prompt(template, sections, budget):
+    """
+    Setzt die Abschnitte budgetiert in `template` ein ({name}-Platzhalter).
+    Liefert (prompt, usage) – usage enthält Budget, Gesamt-Tokens und je
+    Abschnitt Bedarf, Anteil und weggelassene Treffer.
+    """
+    fixed = count_tokens(template.format_map({s.name: "" for s in sections}))
+    alloc, need = allocate(sections, max(0, budget - fixed))
+    values, parts = {}, {}
+    for s in sections:
+        text, dropped = s.render(alloc[s.name])
+        values[s.name] = text
+        parts[s.name] = {"need": need[s.name], "tokens": count_tokens(text), "dropped": dropped}
+    prompt = template.format_map(values)
+    return prompt, {"budget": budget, "tokens": count_tokens(prompt), "sections": parts}
+
+
+def usage_summary(usage, labels=None):
+    """Kurzfassung für die UI, z. B. 'Prompt ≈ 9.8k/12.0k Tokens · gekürzt: Nachtrag (−4.1k)'."""
+    labels = labels or {}
+    notes = []
+    for name, part in usage["sections"].items():
+        label = labels.get(name, name)
+        if part["dropped"]:
+            notes.append(f"{label} ({part['dropped']} Treffer weggelassen)")
+        elif part["tokens"] < part["need"]:
+            notes.append(f"{label} (−{(part['need'] - part['tokens']) / 1000:.1f}k)")
+    text = f"Prompt ≈ {usage['tokens'] / 1000:.1f}k/{usage['budget'] / 1000:.1f}k Tokens"
+    return text + (" · gekürzt: " + ", ".join(notes) if notes else " · vollständig")
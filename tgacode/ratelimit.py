@@ -0,0 +1,211 @@
+# ==============================================================================
+# Prozessweiter Rate-Limiter für Gemini-Aufrufe
+# - Token-Buckets für Requests/Minute und Tokens/Minute (Pacing vor dem 429)
+# - Adaptive Parallelität (AIMD): 429 halbiert das Limit, Erfolge erhöhen es
+# - Retry-After-Hinweise gelten für alle Sitzungen; Backoff mit Jitter
+# ==============================================================================
+
+import re
+import math
+import time
+import random
+import threading
+from contextlib import contextmanager
+
+RPM_LIMIT = 15
+TPM_LIMIT = 1_000_000
+MAX_CONCURRENCY = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+CHARS_PER_TOKEN = 3.5  # deutsche Fachtexte: eher weniger Zeichen pro Token als Englisch
+
+_RETRY_PATTERNS = (
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.IGNORECASE),
+)
+
+
+_STATUS_429 = re.compile(r"\b429\b")
+
+
+def http_status(err):
+    """HTTP-Status eines API-Fehlers (google.api_core: err.code), sonst None."""
+    try:
+        return int(getattr(err, "code", None))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit(err):
+    status = http_status(err)
+    if status is not None:
+        return status == 429
+    # Ohne Status nur ganze Zahl prüfen – die Meldung enthält die URL (z. B. Port 34429)
+    msg = str(err).lower()
+    return (bool(_STATUS_429.search(msg)) or "quota" in msg
+            or "resource has been exhausted" in msg or "resource_exhausted" in msg)
+
+
+def retry_after_seconds(err):
+    """Wartezeit aus Retry-After-Header oder Fehlermeldung; None, wenn kein Hinweis."""
+    response = getattr(err, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("Retry-After") or headers.get("retry-after")
+        if value:
+            return float(value)
+    except (TypeError, ValueError, AttributeError):
+        pass
+    msg = str(err)
+    for pattern in _RETRY_PATTERNS:
+        m = pattern.search(msg)
+        if m:
+            return float(m.group(1))
+    return None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Exponentieller Backoff mit 'Full Jitter' (gleichverteilt in [0, min(cap, base·2^n)])."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def count_tokens(text):
+    """
+    Token-Schätzung über die Zeichenzahl (ohne API-Aufruf) – dieselbe für das
+    Pacing im Limiter und die Prompt-Budgets (tgacode.prompts).
+    """
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+class RateLimiter:
+    """Von allen Sitzungen eines Server-Prozesses geteilter Limiter."""
+
+    def __init__(self, rpm=RPM_LIMIT, tpm=TPM_LIMIT, max_concurrency=MAX_CONCURRENCY):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._req_bucket = float(rpm)
+        self._tok_bucket = float(tpm)
+        self._last = time.monotonic()
+        self._streak = 0     # aufeinanderfolgende 429
+        self._successes = 0  # Erfolge seit der letzten Limit-Änderung
+        self.calls = 0
+        self.throttled = 0
+        self.rate_429 = 0.0  # EWMA der 429-Quote
+        self.waited = 0.0
+
+    def _refill(self, now):
+        dt = now - self._last
+        self._last = now
+        self._req_bucket = min(self.rpm, self._req_bucket + dt * self.rpm / 60.0)
+        self._tok_bucket = min(self.tpm, self._tok_bucket + dt * self.tpm / 60.0)
+
+    def acquire(self, tokens=1):
+        """
+        Blockiert, bis Request-, Token-Budget und ein Parallelitäts-Slot frei sind.
+        Liefert die Wartezeit in Sekunden (Pacing bzw. Backoff nach 429).
+        """
+        tokens = min(max(1, tokens), self.tpm)
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.in_flight >= self.limit:
+                    wait = None  # bis ein Slot frei wird
+                elif self._req_bucket < 1:
+                    wait = (1 - self._req_bucket) * 60.0 / self.rpm
+                elif self._tok_bucket < tokens:
+                    wait = (tokens - self._tok_bucket) * 60.0 / self.tpm
+                else:
+                    self._req_bucket -= 1
+                    self._tok_bucket -= tokens
+                    self.in_flight += 1
+                    self.calls += 1
+                    break
+                self._cond.wait(timeout=wait)
+            waited = time.monotonic() - t0
+            self.waited += waited
+        return waited
+
+    def release(self, rate_limited=False, retry_after=None, ok=True):
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.rate_429 = 0.9 * self.rate_429 + (0.1 if rate_limited else 0.0)
+            if rate_limited:
+                self.throttled += 1
+                self._streak += 1
+                self._successes = 0
+                self.limit = max(1, self.limit // 2)
+                delay = retry_after if retry_after is not None else backoff_delay(self._streak - 1)
+                # Jitter auch auf Server-Hinweise, damit nicht alle gleichzeitig wiederkommen
+                delay += random.uniform(0, min(1.0, 0.1 * delay + 0.1))
+                self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            elif ok:
+                self._streak = 0
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens=1):
+        """
+        Kontext für einen API-Aufruf (liefert die Wartezeit vor dem Aufruf);
+        429-Fehler werden ausgewertet und weitergereicht.
+        """
+        waited = self.acquire(tokens)
+        ok, limited, retry_after = False, False, None
+        try:
+            yield waited
+            ok = True
+        except Exception as e:
+            limited = is_rate_limit(e)
+            retry_after = retry_after_seconds(e) if limited else None
+            raise
+        finally:
+            # auch bei abgebrochenen Streams (GeneratorExit) freigeben
+            self.release(rate_limited=limited, retry_after=retry_after, ok=ok)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "rate_429": self.rate_429,
+                "waited": self.waited,
+                "blocked_for": max(0.0, self.blocked_until - time.monotonic()),
+            }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def configure_limiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT, max_concurrency=MAX_CONCURRENCY):
+    """Setzt die Limits (z. B. aus Secrets); ersetzt den Limiter nur bei Änderungen."""
+    global _limiter
+    with _limiter_lock:
+        current = _limiter
+        if current is None or (current.rpm, current.tpm, current.max_concurrency) != (rpm, tpm, max_concurrency):
+            _limiter = RateLimiter(rpm, tpm, max_concurrency)
+        return _limiter
@@ -0,0 +1,131 @@
+# ==============================================================================
+# Prüfbericht als adressierbare Abschnitte
+# - Zerlegt den Markdown-Bericht an den Überschriften der Berichtsgliederung
+#   (Zusammenfassung, VOB-Check, Technik/Preis-Check, Empfehlung)
+# - Ordnet Korrekturen den betroffenen Abschnitten und JSON-Feldern zu
+# - Überarbeitete Abschnitte ersetzen nur ihre Vorgänger, der Rest bleibt wörtlich
+# ==============================================================================
+
+import re
+
+# (Schlüssel, Überschrift, Erkennungsmerkmale der Überschrift)
+REPORT_SECTIONS = [
+    ("zusammenfassung", "Zusammenfassung", ("zusammenfassung", "fazit", "überblick")),
+    ("vob", "VOB/B-Konformitäts-Check", ("vob",)),
+    ("technik_preis", "Technische Prüfung & Preis-Check", ("technisch", "preis")),
+    ("empfehlung", "Empfehlung & Nächste Schritte", ("empfehlung", "nächste schritte")),
+]
+SECTION_TITLES = {key: title for key, title, _ in REPORT_SECTIONS}
+
+# Welche Felder der JSON-Zusammenfassung aus welchem Abschnitt stammen
+SECTION_FIELDS = {
+    "zusammenfassung": (),
+    "vob": ("vob_check",),
+    "technik_preis": ("technische_pruefung", "preis_check", "gesamtsumme_korrigiert"),
+    "empfehlung": ("empfehlung", "naechste_schritte"),
+}
+
+# Stichworte in Korrekturen → betroffener Abschnitt (kurze Stichworte nur als ganzes Wort)
+CORRECTION_KEYWORDS = {
+    "zusammenfassung": ("zusammenfassung", "fazit", "überblick"),
+    "vob": ("vob", "§", "anordnung", "bedenken", "frist", "anzeige", "vertrag", "anspruch", "dem grunde"),
+    "technik_preis": (
+        "preis", "€", "eur", "euro", "ep", "gp", "menge", "stunde", "lohn", "satz", "position", "pos",
+        "summe", "betrag", "kosten", "aufmaß", "material", "technisch", "ausführung", "din", "norm",
+        "fabrikat", "leistung", "rabatt", "nachlass",
+    ),
+    "empfehlung": ("empfehl", "freigabe", "freigeben", "ablehn", "kürzen", "nächste", "schritt",
+                   "verhandl", "rückfrage"),
+}
+
+_HEADING_RE = re.compile(r"^\s{0,3}(?:#{1,6}\s+(?P<md>.+?)\s*#*|\*\*(?P<bold>[^*]+?)\*\*:?)\s*$")
+_MONEY_RE = re.compile(r"\d[\d.,]*\s*(?:€|EUR)")
+
+
+def _section_key(title):
+    low = title.lower()
+    for key, _, marks in REPORT_SECTIONS:
+        if any(m in low for m in marks):
+            return key
+    return None
+
+
+def split_report(report):
+    """
+    Zerlegt den Bericht in [{"key", "text"}, …]; text enthält die Überschrift.
+    Text vor der ersten erkannten Überschrift hat key None, Unterüberschriften
+    und wiederholte Überschriften bleiben im laufenden Abschnitt.
+    """
+    sections = [{"key": None, "text": ""}]
+    seen = set()
+    for line in (report or "").splitlines(keepends=True):
+        m = _HEADING_RE.match(line.rstrip("\r\n"))
+        key = _section_key(m.group("md") or m.group("bold")) if m else None
+        if key and key not in seen:
+            seen.add(key)
+            sections.append({"key": key, "text": line})
+        else:
+            sections[-1]["text"] += line
+    return [s for s in sections if s["key"] or s["text"].strip()]
+
+
+def join_report(sections):
+    return "".join(s["text"] if s["text"].endswith("\n") else s["text"] + "\n" for s in sections)
+
+
+def section_keys(sections):
+    return [s["key"] for s in sections if s["key"]]
+
+
+def _mentions(text, keyword, tokens):
+    return keyword in tokens if len(keyword) <= 3 and keyword.isalpha() else keyword in text
+
+
+def affected_sections(corrections, sections):
+    """
+    Abschnitte, die eine Korrektur betrifft (in Berichtsreihenfolge), oder None,
+    wenn der Bericht keine erkennbare Gliederung hat (→ komplette Überarbeitung).
+    Ändern sich Zahlen im Preis-Check, kommen Abschnitte mit Beträgen hinzu.
+    Ohne erkennbares Stichwort sind alle Abschnitte betroffen.
+    """
+    keys = section_keys(sections)
+    if len(keys) < 2:
+        return None
+    text = (corrections or "").lower()
+    tokens = set(re.findall(r"\w+", text))
+    hit = {k for k in keys if any(_mentions(text, kw, tokens) for kw in CORRECTION_KEYWORDS.get(k, ()))}
+    if not hit:
+        return keys
+    if "technik_preis" in hit:
+        hit.update(s["key"] for s in sections if s["key"] and _MONEY_RE.search(s["text"]))
+    return [k for k in keys if k in hit]
+
+
+def section_fields(keys):
+    """JSON-Felder der betroffenen Abschnitte (Reihenfolge wie im Schema)."""
+    return [f for key in keys for f in SECTION_FIELDS.get(key, ())]
+
+
+def render_sections(sections, keys, include=True):
+    """Text der Abschnitte in keys (include=True) bzw. aller übrigen."""
+    return "".join(s["text"] for s in sections if (s["key"] in keys) == include)
+
+
+def merge_sections(sections, keys, revised):
+    """
+    Ersetzt die Abschnitte in keys durch ihre Fassung aus `revised`.
+    Fehlt ein Abschnitt in der Antwort, bleibt der alte stehen; eine Antwort
+    ohne Überschriften gilt nur bei genau einem Abschnitt als dessen Text.
+    Liefert (neue Abschnitte, tatsächlich ersetzte Schlüssel).
+    """
+    new = {s["key"]: s["text"] for s in split_report(revised) if s["key"] in keys}
+    if not new and len(keys) == 1 and (revised or "").strip():
+        old = next(s["text"] for s in sections if s["key"] == keys[0])
+        new[keys[0]] = old.splitlines(keepends=True)[0] + revised.strip() + "\n"
+    merged = []
+    for s in sections:
+        text = new.get(s["key"], s["text"])
+        if s["key"] in new and not text.endswith("\n\n"):
+            text = text.rstrip("\n") + "\n\n"
+        merged.append({"key": s["key"], "text": text})
+    return merged, [k for k in keys if k in new]
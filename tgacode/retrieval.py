@@ -0,0 +1,106 @@
+# ==============================================================================
+# Kontextbeschaffung (Gutachter)
+# - Alle Analysten-Fragen in einem Encode-Batch und einer Chroma-Abfrage
+# - Chunks, die zu mehreren Fragen passen, erscheinen nur einmal im Kontext
+#   (mit den Labels aller zugehörigen Fragen)
+# - Hybrid: mit lexikalischem Index werden Vektor- und BM25-Rangliste je Frage
+#   fusioniert (RRF) – Positionsnummern und Paragraphen treffen exakt
+# ==============================================================================
+
+from tgacode.chunking import cite
+from tgacode.embedding import encode_texts
+from tgacode.lexical import fuse_rankings
+from tgacode.metrics import span
+
+# Kandidaten je Liste vor der Fusion (Vielfaches von n_results)
+FUSION_CANDIDATES = 2
+
+
+def _fuse(res, questions, lexical, n_results):
+    """Je Frage die besten n_results nach RRF über Vektor- und BM25-Rangliste."""
+    fused = []
+    with span("lexical.search", queries=len(questions)) as sp:
+        for qi, question in enumerate(questions):
+            ids = (res.get("ids") or [[]] * len(questions))[qi] or []
+            lex = [cid for cid, _ in lexical.search(question, n_results * FUSION_CANDIDATES)]
+            scores = fuse_rankings([ids, lex])
+            fused.append(sorted(scores.items(), key=lambda kv: -kv[1])[:n_results])
+        sp["lexical_only"] = len({cid for row in fused for cid, _ in row}
+                                 - {cid for ids in res.get("ids") or [] for cid in ids})
+    return fused
+
+
+def retrieve_for_questions(collection, embedder, questions, n_results=3, lexical=None):
+    """
+    Eine Abfrage für alle Fragen. Liefert Treffer-Dicts
+    {"id", "document", "metadata", "questions" (Indizes), "distance" (beste)},
+    sortiert nach erster Fundstelle (Frage, Rang). Mit lexical (LexicalIndex)
+    kommt "score" (beste RRF-Wertung) hinzu; reine Stichworttreffer haben
+    distance None und werden aus der Collection nachgeladen.
+    """
+    if not questions:
+        return []
+    candidates = n_results * FUSION_CANDIDATES if lexical is not None else n_results
+    with span("embed.encode", texts=len(questions)):
+        vecs = encode_texts(embedder, questions)
+    with span("chroma.query", queries=len(questions), n_results=candidates):
+        res = collection.query(
+            query_embeddings=vecs, n_results=candidates,
+            include=["documents", "metadatas", "distances"],
+        )
+
+    def column(key, qi, n):
+        rows = res.get(key) or []
+        return (rows[qi] if qi < len(rows) else None) or [None] * n
+
+    found = {}
+    for qi, ids in enumerate(res.get("ids") or []):
+        docs, metas, dists = (column(k, qi, len(ids)) for k in ("documents", "metadatas", "distances"))
+        for cid, doc, meta, dist in zip(ids, docs, metas, dists):
+            found.setdefault(cid, {})[qi] = (doc, meta, dist)
+
+    if lexical is None:
+        ranked = [[(cid, None) for cid in ids] for ids in res.get("ids") or []]
+    else:
+        ranked = _fuse(res, questions, lexical, n_results)
+        missing = [cid for row in ranked for cid, _ in row if cid not in found]
+        if missing:
+            with span("chroma.get", ids=len(missing)):
+                got = collection.get(ids=list(dict.fromkeys(missing)), include=["documents", "metadatas"])
+            for cid, doc, meta in zip(got.get("ids") or [], got.get("documents") or [], got.get("metadatas") or []):
+                found[cid] = {None: (doc, meta, None)}
+
+    merged = {}
+    for qi, row in enumerate(ranked):
+        for cid, score in row:
+            if cid not in found:
+                continue
+            doc, meta, dist = found[cid].get(qi) or next(iter(found[cid].values()))
+            dist = dist if qi in found[cid] else None
+            hit = merged.get(cid)
+            if hit is None:
+                hit = merged[cid] = {"id": cid, "document": doc, "metadata": meta,
+                                     "questions": [qi], "distance": dist}
+            else:
+                hit["questions"].append(qi)
+                if dist is not None and (hit["distance"] is None or dist < hit["distance"]):
+                    hit["distance"] = dist
+            if score is not None:
+                hit["score"] = max(hit.get("score", 0.0), score)
+    return list(merged.values())
+
+
+def format_context(hits, questions=None):
+    """
+    Kontextblock für die Prompts: optional die nummerierten Fragen (F1, F2, …),
+    danach jeder Chunk einmal mit Quellenangabe und Frage-Labels.
+    """
+    parts = []
+    if questions:
+        parts.append("Recherchefragen:\n" + "\n".join(f"F{i+1}: {q}" for i, q in enumerate(questions)))
+    for hit in hits:
+        head = f"[{cite(hit['metadata'])}]"
+        if questions:
+            head += " – relevant für " + ", ".join(f"F{i+1}" for i in hit["questions"])
+        parts.append(f"{head}\n{hit['document']}")
+    return "\n\n---\n\n".join(parts) + ("\n\n---\n\n" if parts else "")
@@ -0,0 +1,277 @@
+# ==============================================================================
+# Kompakter Vektorspeicher für kleine Projekte (NumPy statt Chroma-Abfrage)
+# - Embeddings quantisiert (int8 mit Skalierung je Zeile oder float16) als
+#   .npy-Matrix unter _index/, beim Abfragen per Memory-Map geöffnet
+# - Abfrage: ein Matrixprodukt für alle Fragen, Top-k per argpartition
+# - Gleiche Schnittstelle wie eine Chroma-Collection (query/get/count);
+#   Distanzen wie Chromas Standard (quadrierte L2-Distanz)
+# - Wird nach jeder Indexierung aus der Collection abgeleitet; passt der Stand
+#   nicht mehr zum Manifest, fragt die Recherche wieder Chroma
+# - Liegen alle Dokumente im gemeinsamen Chunk-Speicher, verweist das Projekt
+#   nur auf dessen Einträge (keine Kopie, Memory-Maps von allen Projekten geteilt)
+# ==============================================================================
+
+import os
+import gzip
+import json
+import hashlib
+import threading
+
+from tgacode.chunking import chunk_metadata
+
+MATRIX_NAME = "vectors.npy"
+META_NAME = "vectors.json.gz"
+VECSTORE_VERSION = 2
+
+VECTOR_DTYPE = "int8"  # "int8" (¼ von float32) oder "float16" (½)
+NUMPY_MAX_CHUNKS = 20_000  # darüber bleibt es bei Chroma
+ROW_BLOCK = 4096  # Zeilen je float32-Zwischenkopie (keine volle float32-Matrix je Abfrage)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def manifest_stamp(manifest):
+    """Fingerabdruck des Indexstands: Modell, Chunking sowie Hash und Chunk-IDs je Datei."""
+    files = manifest.get("files", {})
+    state = [manifest.get("embedding_model"), manifest.get("chunking"),
+             sorted((name, e.get("sha256"), e.get("chunk_ids", [])) for name, e in files.items())]
+    return hashlib.sha1(json.dumps(state, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _paths(index_dir):
+    return os.path.join(index_dir, MATRIX_NAME), os.path.join(index_dir, META_NAME)
+
+
+def quantize(vecs, dtype=VECTOR_DTYPE):
+    """(Matrix, Skalierung je Zeile oder None)."""
+    import numpy as np
+
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if dtype == "float16":
+        return vecs.astype(np.float16), None
+    if dtype != "int8":
+        raise ValueError(f"Unbekannter Vektortyp: {dtype}")
+    scales = np.abs(vecs).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vecs / scales[:, None]).astype(np.int8), scales
+
+
+def write_store(index_dir, ids, embeddings, documents, metadatas, stamp, dtype=VECTOR_DTYPE):
+    """Schreibt Matrix und Metadaten atomar (tmp-Dateien + os.replace, Metadaten zuletzt)."""
+    import numpy as np
+
+    vecs = np.asarray(embeddings, dtype=np.float32)
+    matrix, scales = quantize(vecs, dtype)
+    matrix_path, meta_path = _paths(index_dir)
+    os.makedirs(index_dir, exist_ok=True)
+    with open(matrix_path + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    os.replace(matrix_path + ".tmp", matrix_path)
+    meta = {
+        "version": VECSTORE_VERSION, "mode": "copy", "dtype": dtype, "stamp": stamp, "ids": list(ids),
+        "documents": list(documents), "metadatas": list(metadatas),
+        "scales": scales.tolist() if scales is not None else None,
+        "sq_norms": (vecs * vecs).sum(axis=1).tolist(),
+    }
+    _write_meta(meta_path, meta)
+
+
+def _write_meta(meta_path, meta):
+    with gzip.open(meta_path + ".tmp", "wt", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def write_refs(index_dir, files, stamp):
+    """Verweise auf den Chunk-Speicher statt einer eigenen Matrix: [(Datei, Schlüssel, Chunks)]."""
+    matrix_path, meta_path = _paths(index_dir)
+    os.makedirs(index_dir, exist_ok=True)
+    parts = [[name, e["chunk_key"], len(e.get("chunk_ids", []))] for name, e in sorted(files.items())]
+    _write_meta(meta_path, {"version": VECSTORE_VERSION, "mode": "refs", "stamp": stamp, "parts": parts})
+    try:
+        os.remove(matrix_path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_store(index_dir):
+    for path in _paths(index_dir):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _read_meta(meta_path):
+    try:
+        with gzip.open(meta_path, "rt", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if isinstance(meta, dict) and meta.get("version") == VECSTORE_VERSION else None
+
+
+def sync_store(index_dir, col, manifest, max_chunks=NUMPY_MAX_CHUNKS, dtype=VECTOR_DTYPE,
+               chunk_store=None):
+    """
+    Leitet den Speicher ab, wenn er fehlt oder nicht zum Manifest passt: als
+    Verweise, wenn chunk_store alle Dokumente enthält, sonst als eigene Matrix
+    aus der Chroma-Collection. Große oder leere Projekte bekommen keinen (bzw. er
+    wird entfernt). Liefert True, wenn neu geschrieben wurde.
+    """
+    files = manifest["files"]
+    ids = [cid for entry in files.values() for cid in entry.get("chunk_ids", [])]
+    if not ids or len(ids) > max_chunks:
+        remove_store(index_dir)
+        return False
+    stamp = manifest_stamp(manifest)
+    refs = chunk_store is not None and all(
+        e.get("chunk_key") and chunk_store.has(e["chunk_key"]) for e in files.values()
+    )
+    meta = _read_meta(_paths(index_dir)[1])
+    if meta and meta["stamp"] == stamp and meta["mode"] == ("refs" if refs else "copy") \
+            and (refs or meta["dtype"] == dtype):
+        return False
+    if refs:
+        write_refs(index_dir, files, stamp)
+        return True
+    got = col.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+    embeddings = got.get("embeddings")
+    if embeddings is None or len(got.get("ids") or []) != len(ids):
+        remove_store(index_dir)  # Collection unvollständig → Abfragen bleiben bei Chroma
+        return False
+    write_store(index_dir, got["ids"], embeddings, got["documents"], got["metadatas"], stamp, dtype)
+    return True
+
+
+def _row_blocks(matrix, rows=ROW_BLOCK):
+    """(Startzeile, float32-Kopie) je Zeilenblock der (quantisierten) Matrix."""
+    import numpy as np
+
+    for start in range(0, matrix.shape[0], rows):
+        yield start, np.asarray(matrix[start:start + rows], dtype=np.float32)
+
+
+class NumpyCollection:
+    """
+    Nur-Lese-Collection über eine oder mehrere Matrizen (Memory-Maps).
+    blocks: [(Matrix, Skalierung je Zeile oder None, quadrierte Normen)] in ID-Reihenfolge.
+    """
+
+    def __init__(self, blocks, ids, documents, metadatas, stamp):
+        self.blocks = blocks
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.stamp = stamp
+        self._pos = {cid: i for i, cid in enumerate(self.ids)}
+
+    def count(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        return sum(matrix.nbytes for matrix, _, _ in self.blocks)
+
+    def _rows(self, idx, include):
+        out = {}
+        if "documents" in include:
+            out["documents"] = [self.documents[i] for i in idx]
+        if "metadatas" in include:
+            out["metadatas"] = [self.metadatas[i] for i in idx]
+        return out
+
+    def _distances(self, q):
+        import numpy as np
+
+        parts = []
+        for matrix, scales, sq_norms in self.blocks:
+            dots = np.empty((q.shape[0], matrix.shape[0]), dtype=np.float32)
+            for start, rows in _row_blocks(matrix):
+                dots[:, start:start + rows.shape[0]] = q @ rows.T
+            if scales is not None:
+                dots *= scales
+            parts.append(sq_norms[None, :] - 2.0 * dots)
+        return (q * q).sum(axis=1)[:, None] + np.concatenate(parts, axis=1)
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances")):
+        import numpy as np
+
+        dist = self._distances(np.asarray(query_embeddings, dtype=np.float32))
+        k = min(n_results, len(self.ids))
+        res = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row in dist:
+            top = np.argpartition(row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+            top = top[np.argsort(row[top], kind="stable")]
+            res["ids"].append([self.ids[i] for i in top])
+            for key, values in self._rows(top, include).items():
+                res[key].append(values)
+            if "distances" in include:
+                res["distances"].append([float(max(row[i], 0.0)) for i in top])
+        return {key: value for key, value in res.items() if key == "ids" or key in include}
+
+    def get(self, ids=None, include=("documents", "metadatas")):
+        idx = [self._pos[cid] for cid in ids if cid in self._pos] if ids is not None else range(len(self.ids))
+        return {"ids": [self.ids[i] for i in idx], **self._rows(idx, include)}
+
+
+def _sq_norms(matrix):
+    import numpy as np
+
+    norms = np.empty(matrix.shape[0], dtype=np.float32)
+    for start, rows in _row_blocks(matrix):
+        norms[start:start + rows.shape[0]] = (rows * rows).sum(axis=1)
+    return norms
+
+
+def _load_copy(matrix_path, meta):
+    import numpy as np
+
+    try:
+        matrix = np.load(matrix_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if matrix.shape[0] != len(meta["ids"]):
+        return None
+    scales = np.asarray(meta["scales"], dtype=np.float32) if meta["scales"] is not None else None
+    block = (matrix, scales, np.asarray(meta["sq_norms"], dtype=np.float32))
+    return NumpyCollection([block], meta["ids"], meta["documents"], meta["metadatas"], meta["stamp"])
+
+
+def _load_refs(meta, chunk_store):
+    """Setzt die Collection aus Einträgen des Chunk-Speichers zusammen (Texte werden geteilt)."""
+    blocks, ids, documents, metadatas = [], [], [], []
+    for name, key, n in meta["parts"]:
+        entry = chunk_store.load(key)
+        if entry is None or len(entry[0]) != n:
+            return None
+        texts, pages, vecs = entry
+        if not n:
+            continue
+        blocks.append((vecs, None, _sq_norms(vecs)))
+        ids.extend(f"{name}_{i}" for i in range(n))
+        documents.extend(texts)
+        metadatas.extend(chunk_metadata(name, p_from, p_to) for p_from, p_to in pages)
+    return NumpyCollection(blocks, ids, documents, metadatas, meta["stamp"])
+
+
+def load_store(index_dir, chunk_store=None):
+    """NumpyCollection (im Prozess gecacht, bis sich die Metadaten ändern) oder None."""
+    matrix_path, meta_path = _paths(index_dir)
+    try:
+        key = os.path.getmtime(meta_path)
+    except OSError:
+        return None
+    with _cache_lock:
+        hit = _cache.get(index_dir)
+        if hit and hit[0] == key:
+            return hit[1]
+    meta = _read_meta(meta_path)
+    store = None
+    if meta is not None and meta["mode"] == "copy":
+        store = _load_copy(matrix_path, meta)
+    elif meta is not None and chunk_store is not None:
+        store = _load_refs(meta, chunk_store)
+    with _cache_lock:
+        _cache[index_dir] = (key, store)
+    return store
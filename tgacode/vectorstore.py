@@ -0,0 +1,130 @@
+# ==============================================================================
+# Persistenter Vektorindex pro Projekt
+# - ChromaDB auf der Platte unter VAULT/<Firma>/<Projekt>/_index/chroma
+# - Index-Status (fehlt/veraltet/aktuell) aus Manifest + Dateistand der Akte
+# - Abfragen kleiner Projekte über den kompakten NumPy-Speicher (tgacode.vecstore)
+# ==============================================================================
+
+import os
+
+from tgacode.chunking import CHUNK_OVERLAP, CHUNK_WORDS
+from tgacode.indexing import (
+    EMBEDDING_MODEL,
+    chunking_params,
+    collection_name,
+    index_dir,
+    list_project_pdfs,
+    load_manifest,
+)
+from tgacode.chunkstore import ChunkStore
+from tgacode.vecstore import NUMPY_MAX_CHUNKS, load_store, manifest_stamp
+
+CHROMA_DIRNAME = "chroma"
+
+STATUS_OK = "ok"
+STATUS_EMPTY = "empty"
+STATUS_MISSING = "missing"
+STATUS_OUTDATED = "outdated"
+
+
+def store_path(project_path):
+    return os.path.join(index_dir(project_path), CHROMA_DIRNAME)
+
+
+def open_project_store(project_path):
+    """Öffnet (bzw. legt an) den persistenten Chroma-Client eines Projekts."""
+    import chromadb  # schwerer Import, erst beim Öffnen eines Projekts
+
+    path = store_path(project_path)
+    os.makedirs(path, exist_ok=True)
+    return chromadb.PersistentClient(path=path)
+
+
+def open_collection(project_path, p_id, chroma_client=None, max_chunks=NUMPY_MAX_CHUNKS, chunk_store=None):
+    """
+    Collection für die Recherche: der NumPy-Speicher, wenn er zum Manifest passt
+    und höchstens max_chunks Chunks hat, sonst die Chroma-Collection.
+    chunk_store=None nutzt den gemeinsamen Speicher unter VAULT/_cache/chunks.
+    """
+    manifest = load_manifest(project_path)
+    chunk_store = chunk_store if chunk_store is not None else ChunkStore()
+    store = load_store(index_dir(project_path), chunk_store) if manifest is not None else None
+    if store is not None and store.count() <= max_chunks and store.stamp == manifest_stamp(manifest):
+        return store
+    if chroma_client is None:
+        chroma_client = open_project_store(project_path)
+    return chroma_client.get_or_create_collection(collection_name(p_id))
+
+
+def manifest_stale(manifest, model_name=EMBEDDING_MODEL):
+    """True, wenn das Manifest mit anderem Modell oder anderen Chunk-Parametern erstellt wurde."""
+    return (manifest.get("embedding_model") != model_name
+            or manifest.get("chunking") != chunking_params(CHUNK_WORDS, CHUNK_OVERLAP))
+
+
+def index_status(project_path, p_id=None, chroma_client=None, model_name=EMBEDDING_MODEL):
+    """
+    Vergleicht Manifest und Akte, ohne PDFs zu lesen oder zu hashen.
+    Mit chroma_client wird zusätzlich die Chunk-Anzahl der Collection geprüft.
+    Liefert {"state", "new", "changed", "removed"}.
+    """
+    pdfs = list_project_pdfs(project_path)
+    manifest = load_manifest(project_path)
+    result = {"state": STATUS_OK, "new": 0, "changed": 0, "removed": 0}
+
+    if manifest is None or not os.path.isdir(store_path(project_path)):
+        result["state"] = STATUS_MISSING if pdfs else STATUS_EMPTY
+        result["new"] = len(pdfs)
+        return result
+
+    files = manifest.get("files", {})
+    for name, fp in pdfs.items():
+        entry = files.get(name)
+        if entry is None:
+            result["new"] += 1
+            continue
+        st_ = os.stat(fp)
+        if entry.get("mtime") != st_.st_mtime or entry.get("size") != st_.st_size:
+            result["changed"] += 1
+    result["removed"] = sum(1 for name in files if name not in pdfs)
+
+    stale = manifest_stale(manifest, model_name)
+    if chroma_client is not None and p_id is not None and not stale:
+        # Geteilte Dateien liegen nur im Chunk-Speicher, nicht in der Collection
+        expected = sum(len(e.get("chunk_ids", [])) for e in files.values() if not e.get("shared"))
+        try:
+            count = chroma_client.get_or_create_collection(collection_name(p_id)).count()
+        except Exception:
+            count = -1
+        stale = count != expected
+
+    if stale or result["new"] or result["changed"] or result["removed"]:
+        result["state"] = STATUS_OUTDATED
+    elif not pdfs:
+        result["state"] = STATUS_EMPTY
+    return result
+
+
+def scan_vault_status(vault, projects=None):
+    """
+    Startup-Check: Index-Status aller Projekte im VAULT (ohne Chroma zu öffnen).
+    projects: bekannte (Firma, Projekt)-Paare, z. B. aus dem Katalog – erspart das Listen.
+    """
+    result = {}
+    if projects is not None:
+        for firma, projekt in projects:
+            p_path = os.path.join(vault, firma, projekt)
+            if os.path.isdir(p_path):
+                result[(firma, projekt)] = index_status(p_path)
+        return result
+    if not os.path.isdir(vault):
+        return result
+    for firma in sorted(os.listdir(vault)):
+        f_path = os.path.join(vault, firma)
+        if firma.startswith(("_", ".")) or not os.path.isdir(f_path):
+            continue
+        for projekt in sorted(os.listdir(f_path)):
+            p_path = os.path.join(f_path, projekt)
+            if os.path.isdir(p_path):
+                result[(firma, projekt)] = index_status(p_path)
+    return result
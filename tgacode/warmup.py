@@ -0,0 +1,68 @@
+# ==============================================================================
+# Hintergrund-Start teurer Ressourcen (Embedder, Gemini-Modellliste)
+# - Jede Aufgabe läuft einmal in einem eigenen Daemon-Thread
+# - result() wartet nur, wenn ein Codepfad die Ressource tatsächlich braucht
+# - Ladezeiten und Fehler für den Startzeit-Bericht der App
+# ==============================================================================
+
+import time
+import threading
+
+
+class _Task:
+    __slots__ = ("done", "result", "error", "seconds")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.seconds = None
+
+
+class Warmup:
+    """Lädt Ressourcen im Hintergrund; Fehler werden beim Abruf erneut ausgelöst."""
+
+    def __init__(self):
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def start(self, name, fn, *args):
+        with self._lock:
+            if name in self._tasks:
+                return
+            task = self._tasks[name] = _Task()
+
+        def run():
+            t0 = time.perf_counter()
+            try:
+                task.result = fn(*args)
+            except Exception as e:
+                task.error = e
+            finally:
+                task.seconds = time.perf_counter() - t0
+                task.done.set()
+
+        threading.Thread(target=run, name=f"warmup-{name}", daemon=True).start()
+
+    def ready(self, name):
+        task = self._tasks.get(name)
+        return task is not None and task.done.is_set()
+
+    def pending(self):
+        """Namen der noch ladenden Aufgaben."""
+        return [name for name, task in self._tasks.items() if not task.done.is_set()]
+
+    def result(self, name, timeout=None):
+        """Wartet auf die Aufgabe und liefert ihr Ergebnis (bzw. löst ihren Fehler aus)."""
+        task = self._tasks[name]
+        if not task.done.wait(timeout):
+            raise TimeoutError(f"{name} ist nach {timeout} s noch nicht geladen.")
+        if task.error is not None:
+            raise task.error
+        return task.result
+
+    def stats(self):
+        return {
+            name: {"done": task.done.is_set(), "seconds": task.seconds, "error": task.error}
+            for name, task in self._tasks.items()
+        }